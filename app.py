@@ -1,12 +1,31 @@
 from flask import (
     Flask, render_template, request, redirect,
-    url_for, abort, session, flash, jsonify, Response
+    url_for, abort, session, flash, jsonify, Response, g, make_response,
+    has_request_context, stream_with_context
 )
 from werkzeug.utils import secure_filename
 # pip install Werkzeug if missing
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timezone
-import json, os, functools, re, time, shutil
+from werkzeug.middleware.proxy_fix import ProxyFix
+from markupsafe import Markup, escape
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, date
+import json, os, functools, re, time, shutil, contextlib, bisect, heapq, math
+import hashlib, tempfile, threading, queue, mmap, struct
+import cProfile, pstats, marshal, random, sys
+import base64, urllib.parse, urllib.request, urllib.error, zlib, atexit
+import click
+from flask.cli import AppGroup
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev boxes: cross-process locks become no-ops
+    fcntl = None
+from jinja2 import FileSystemBytecodeCache
+
+_IMPORT_STARTED = time.perf_counter()
+# Seconds spent importing this module, in startup(), and in warm_caches()
+BOOT_TIMES = {"import": None, "startup": None, "warm": None}
 
 # -----------------------------------------------------------------------------
 # Flask setup
@@ -15,6 +34,21 @@ app = Flask(__name__, template_folder="templates", static_folder="static")
 app.config["SECRET_KEY"] = os.environ.get("MUNIVERSE_SECRET", "dev-change-me")
 app.config["MAX_CONTENT_LENGTH"] = 25 * 1024 * 1024  # 25MB uploads
 
+# Compiled templates are cached on disk so new instances skip Jinja's parser.
+# `flask --app app precompile-templates` fills it at build time.
+JINJA_CACHE_DIR = os.environ.get("MUNIVERSE_JINJA_CACHE_DIR") or os.path.join(app.root_path, ".jinja_cache")
+with contextlib.suppress(OSError):
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+if os.access(JINJA_CACHE_DIR, os.W_OK):
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(JINJA_CACHE_DIR)}
+
+# X-Forwarded-For is only trusted when a known number of proxies sits in front
+# (hosted deploys set MUNIVERSE_PROXY_HOPS=1); otherwise any client could spoof
+# its IP past the per-IP throttles.
+PROXY_HOPS = int(os.environ.get("MUNIVERSE_PROXY_HOPS", "0"))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
+
 # Site URL for sitemaps / SEO
 SITE_URL = os.environ.get("MUNIVERSE_SITE_URL", "https://www.muniverse.social")
 
@@ -34,11 +68,91 @@ CONF_FILE       = os.path.join(DATA_DIR, "conferences.json")
 FORUM_THREADS   = os.path.join(DATA_DIR, "forum_threads.json")
 FORUM_REPLIES   = os.path.join(DATA_DIR, "forum_replies.json")
 
+# Comments live outside posts.json: data/comments/<post_id>/<page>.json
+COMMENTS_DIR      = os.path.join(DATA_DIR, "comments")
+COMMENTS_PER_PAGE = 20
+
+# Forum replies: data/replies/<thread_id>/<page>.json (forum_replies.json is legacy)
+REPLIES_DIR       = os.path.join(DATA_DIR, "replies")
+REPLIES_PER_PAGE  = 25
+
+# Likes: {"<post_id>": [usernames]}; counts and per-user index are derived
+LIKES_FILE        = os.path.join(DATA_DIR, "likes.json")
+
+# Explore grid and search API pages (posts and conferences)
+EXPLORE_PER_PAGE  = 24
+SEARCH_MAX_LIMIT  = 100
+
+# Conference attendance: {"<conf_id>": [usernames]} (same shape as likes)
+ATTENDANCE_FILE   = os.path.join(DATA_DIR, "attendance.json")
+CONFS_PER_PAGE    = 12
+
+# Tag -> ids index per taggable collection (posts: #hashtags in captions)
+TAG_INDEX_FILE    = os.path.join(DATA_DIR, "tag_index.json")
+TAG_PER_PAGE      = 24
+
+# @mentions: mentions/<username>.json = [{"ref", "by", "ts", "text"}, ...] oldest
+# first, plus mentions/items/<kind>-<id>.json = usernames that item mentions
+MENTIONS_DIR      = os.path.join(DATA_DIR, "mentions")
+LEGACY_MENTIONS_FILE = os.path.join(DATA_DIR, "mentions.json")
+# What each user wrote: authored/<username>.ndjson, one {"ref"} per thread,
+# comment or reply (same refs as mentions), so deleting a user finds their pages
+AUTHORED_DIR      = os.path.join(DATA_DIR, "authored")
+MENTIONS_PER_PAGE = 20
+MENTIONS_KEEP     = int(os.environ.get("MUNIVERSE_MENTIONS_KEEP", "1000"))
+
+# Trending: bounded top-K of time-decayed hotness scores per kind
+TRENDING_FILE     = os.path.join(DATA_DIR, "trending.json")
+TRENDING_HALF_LIFE = float(os.environ.get("MUNIVERSE_TRENDING_HALF_LIFE_HOURS", "12")) * 3600
+TRENDING_TOP_K    = int(os.environ.get("MUNIVERSE_TRENDING_TOP_K", "200"))
+
+# Unique viewers / hits per post and thread: data/views/<kind>.json, flushed from memory
+VIEWS_DIR         = os.path.join(DATA_DIR, "views")
+VIEWS_FLUSH_SECONDS = float(os.environ.get("MUNIVERSE_VIEWS_FLUSH_SECONDS", "30"))
+
+# Id sequences: {"posts": last id handed out, ...}
+SEQUENCES_FILE    = os.path.join(DATA_DIR, "sequences.json")
+# ids each worker reserves per trip to the file; >1 trades id gaps on restart for fewer locks
+SEQ_BATCH         = max(int(os.environ.get("MUNIVERSE_SEQ_BATCH", "1")), 1)
+
+# Change feed: every write under data/ is journaled to data/journal/<segment>.ndjson.
+# Replicas (MUNIVERSE_ROLE=replica) apply that journal and forward writes upstream.
+JOURNAL_DIR       = os.path.join(DATA_DIR, "journal")
+JOURNAL_SEGMENT_BYTES = int(float(os.environ.get("MUNIVERSE_JOURNAL_SEGMENT_MB", "8")) * 1024 * 1024)
+# every this many segments the next one opens with a checkpoint (a fresh baseline)
+# and segments older than the previous checkpoint are deleted
+JOURNAL_CHECKPOINT_SEGMENTS = max(int(os.environ.get("MUNIVERSE_JOURNAL_CHECKPOINT_SEGMENTS", "4")), 1)
+# rewrites are journaled as diffs against the bytes this worker last wrote (kept
+# up to this budget); a file someone else wrote is only re-read if it is small
+JOURNAL_DIFF_CACHE_BYTES = int(float(os.environ.get("MUNIVERSE_JOURNAL_DIFF_CACHE_MB", "32")) * 1024 * 1024)
+JOURNAL_DIFF_READ_BYTES = 64 * 1024
+ROLE              = os.environ.get("MUNIVERSE_ROLE", "primary")
+JOURNAL_ENABLED   = ROLE == "primary" and os.environ.get("MUNIVERSE_JOURNAL", "1") != "0"
+PRIMARY_URL       = os.environ.get("MUNIVERSE_PRIMARY_URL", "").rstrip("/")
+REPLICATION_TOKEN = os.environ.get("MUNIVERSE_REPLICATION_TOKEN", "")
+# replicas on the primary's host/volume read its journal directly instead of over HTTP
+JOURNAL_SOURCE    = os.environ.get("MUNIVERSE_JOURNAL_SOURCE", "")
+REPLICA_CURSOR_FILE = os.path.join(DATA_DIR, "replica.json")
+
+# Uploaded files under static/img: owner, size, hash and who references them
+MEDIA_FILE        = os.path.join(DATA_DIR, "media.json")
+
 # New: pending conferences + admin notifications
 CONF_PENDING_FILE = os.path.join(DATA_DIR, "pending_conferences.json")
-NOTIFS_FILE       = os.path.join(DATA_DIR, "admin_notifications.json")
-
-os.makedirs(DATA_DIR, exist_ok=True)
+NOTIFS_FILE       = os.path.join(DATA_DIR, "admin_notifications.json")  # legacy, migrated to the log
+
+# Admin notifications: append-only log + fixed-width offset index (id n at byte 8*(n-1))
+NOTIFS_LOG        = os.path.join(DATA_DIR, "admin_notifications.ndjson")
+NOTIFS_INDEX      = os.path.join(DATA_DIR, "admin_notifications.idx")
+NOTIF_CURSORS_FILE = os.path.join(DATA_DIR, "notification_cursors.json")
+NOTIFS_PER_PAGE   = 20
+
+# Per-host scratch space shared by all workers (page cache, event fan-out).
+# Lives in shared memory when the platform has it; never backed up.
+RUNTIME_DIR = os.environ.get("MUNIVERSE_RUNTIME_DIR") or os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    "muniverse-" + hashlib.sha1(os.path.abspath(DATA_DIR).encode("utf-8")).hexdigest()[:10]
+)
 
 # -----------------------------------------------------------------------------
 # Upload dirs (absolute under /static)
@@ -49,9 +163,6 @@ CONF_UPLOAD_DIR = os.path.join(app.static_folder, "img", "conferences")
 # New: where pending conference banners are staged before approval
 PENDING_UPLOAD_DIR = os.path.join(CONF_UPLOAD_DIR, "pending")
 
-for d in (POST_UPLOAD_DIR, USER_UPLOAD_DIR, CONF_UPLOAD_DIR, PENDING_UPLOAD_DIR):
-    os.makedirs(d, exist_ok=True)
-
 ALLOWED_EXT = {"png", "jpg", "jpeg", "gif", "webp"}
 
 
@@ -61,18 +172,6 @@ def allowed_file(filename: str) -> bool:
 # -----------------------------------------------------------------------------
 # General Helpers
 # -----------------------------------------------------------------------------
-def delete_static_file(path_suffix: str):
-    """Safely delete a file from the static folder, avoiding defaults."""
-    if not path_suffix or "default.png" in path_suffix:
-        return
-    try:
-        abs_path = os.path.join(app.static_folder, path_suffix)
-        if os.path.exists(abs_path):
-            os.remove(abs_path)
-    except Exception as e:
-        app.logger.error(f"Error deleting file {path_suffix}: {e}")
-
-
 def slugify(s: str) -> str:
     s = (s or "").strip().lower()
     s = re.sub(r"[^a-z0-9\s-]", "", s)
@@ -81,30 +180,193 @@ def slugify(s: str) -> str:
     return s[:80] or "topic"
 
 
-def add_notification(kind: str, payload: dict):
-    notifs = load_json(NOTIFS_FILE)
-    nid = (max([n.get("id", 0) for n in notifs], default=0) + 1) if notifs else 1
-    notifs.append({"id": nid, "kind": kind, "payload": payload, "ts": int(time.time())})
-    save_json(NOTIFS_FILE, notifs)
-
 # -----------------------------------------------------------------------------
 # JSON helpers
 # -----------------------------------------------------------------------------
+# Codecs turn documents into bytes and back. Files are written compact by
+# default; the reader accepts anything a codec ever wrote (compact, the old
+# indent=2 files, or NDJSON records), so switching codecs needs no migration.
+try:
+    import orjson  # optional: pip install orjson for faster (de)serialization
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _pretty_dumps(data) -> bytes:
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+CODECS = {
+    "json": (_json_dumps, json.loads),
+    "pretty": (_pretty_dumps, json.loads),
+}
+if orjson is not None:
+    CODECS["orjson"] = (
+        lambda data: orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS),
+        orjson.loads,
+    )
+
+JSON_CODEC = os.environ.get("MUNIVERSE_JSON_CODEC", "auto")
+if JSON_CODEC not in CODECS:  # "auto", or a codec that isn't installed here
+    JSON_CODEC = "orjson" if orjson is not None else "json"
+dumps_json, loads_json = CODECS[JSON_CODEC]
+
+
+def decode_json(raw: bytes):
+    """Decode one JSON document, falling back to NDJSON (one record per line)."""
+    try:
+        return loads_json(raw)
+    except json.JSONDecodeError:
+        lines = [line for line in raw.splitlines() if line.strip()]
+        if len(lines) < 2:
+            raise
+        return [loads_json(line) for line in lines]
+
+
+class CorruptDataFile(Exception):
+    """A data file exists but doesn't decode; never treat it as empty."""
+
+
 def load_json(path):
     if not os.path.exists(path) or os.path.getsize(path) == 0:
         return []
+    if path.endswith(".ndjson"):
+        return list(iter_records(path))
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return []
+        with open(path, "rb") as f:
+            return decode_json(f.read())
+    except ValueError as e:
+        # returning [] here would let the next save wipe the collection
+        raise CorruptDataFile(path) from e
 
 
 def save_json(path, data):
+    """Atomically replace `path` and journal what changed.
+
+    The change is diffed against the previous version before taking the
+    journal lock, so the lock only covers the rename and one short journal
+    line. The line carries the version ("v") it produced, which lets a
+    snapshot restore skip changes its copy of the file already has.
+    """
+    raw = dumps_json(data)
+    journaled = JOURNAL_ENABLED and _journal_rel(path) is not None
+    base = _journal_base(path) if journaled else None
+    patch = json_patch(base[1], data, len(raw)) if base else None
     tmp = f"{path}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    os.replace(tmp, path)
+    with open(tmp, "wb") as f:
+        f.write(raw)
+    with journal_write(path) as journal:
+        if patch is not None and _stat_key(path) != base[0]:
+            patch = None  # rewritten by someone else since we diffed
+        if patch == {}:
+            os.remove(tmp)  # nothing changed; keep the version on disk
+            return
+        os.replace(tmp, path)
+        if journaled:
+            version = _remember_written(path, raw)
+            if patch is None:
+                journal("put", data=data, v=version)
+            else:
+                journal("patch", v=version, **patch)
+
+# --- line-delimited record files (append one entry without a rewrite) ---
+def append_record(path, record) -> int:
+    """Append one record to an NDJSON file; returns its byte offset."""
+    line = dumps_json(record) + b"\n"
+    with journal_write(path) as journal:
+        with open(path, "ab") as f:
+            offset = os.fstat(f.fileno()).st_size
+            f.write(line)
+        journal("append", data=record)
+    return offset
+
+
+def append_bytes(path, data: bytes):
+    """Append raw bytes (fixed-width index files)."""
+    with journal_write(path) as journal:
+        with open(path, "ab") as f:
+            f.write(data)
+        journal("append", b64=base64.b64encode(data).decode("ascii"))
+
+
+def iter_records(path, offset=0):
+    """Yield (lazily) the records of an NDJSON file starting at a byte offset.
+
+    A trailing line without a newline is an append still in progress (or
+    torn by a crash) and is skipped.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if not line.strip():
+                continue
+            try:
+                record = loads_json(line)
+            except ValueError as e:
+                raise CorruptDataFile(path) from e
+            yield record
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive cross-process lock for a read-modify-write of `path`."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# --- in-process read cache, revalidated against the file on every access ---
+_file_cache = {}
+
+
+def file_version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def cached_json(path, build=None):
+    """Parsed contents of `path` (optionally passed through `build`).
+
+    The file is only re-read when its mtime/size change, so repeated
+    requests share one parsed copy. Callers must treat it as read-only
+    unless they hold file_lock(path) and hand it back via cache_put().
+    """
+    key = (path, build)
+    version = file_version(path)
+    hit = _file_cache.get(key)
+    if hit and hit[0] == version:
+        return hit[1]
+    data = load_json(path)
+    if build:
+        data = build(data)
+    _file_cache[key] = (version, data)
+    return data
+
+
+def cache_put(path, build, data):
+    """Record `data` as the current cached value after we rewrote `path`."""
+    _file_cache[(path, build)] = (file_version(path), data)
+
+
+def index_by_id(items):
+    return {item.get("id"): item for item in items if isinstance(item, dict)}
 
 
 def next_id(items):
@@ -121,6 +383,196 @@ def next_id(items):
             continue
     return max_id + 1
 
+# --- id sequences (never reused, unique across workers) ---
+# Collections a sequence is seeded from the first time it is used
+SEQUENCE_SOURCES = {
+    "posts": POSTS_FILE,
+    "threads": FORUM_THREADS,
+    "conferences": CONF_FILE,
+    "pending_conferences": CONF_PENDING_FILE,
+}
+_seq_ranges = {}  # (pid, name) -> [next id, last reserved id]
+_seq_lock = threading.Lock()
+
+
+def allocate_id(name: str) -> int:
+    """Next id of sequence `name`.
+
+    Ids come from data/sequences.json under file_lock, SEQ_BATCH at a time
+    per worker, so deleting the newest item never lets its id be handed out
+    again and two workers can never pick the same one. Ids at or below the
+    floor an import left (bump_sequence) are skipped even if this worker
+    had already reserved them.
+    """
+    key = (os.getpid(), name)
+    with _seq_lock:
+        rng = _seq_ranges.get(key)
+        if rng and SEQ_BATCH > 1:
+            seqs = cached_json(SEQUENCES_FILE)
+            floors = seqs.get("floors") or {} if isinstance(seqs, dict) else {}
+            rng[0] = max(rng[0], floors.get(name, 0) + 1)
+        if not rng or rng[0] > rng[1]:
+            with file_lock(SEQUENCES_FILE):
+                seqs = load_json(SEQUENCES_FILE)
+                if not isinstance(seqs, dict):
+                    seqs = {}
+                last = seqs.get(name)
+                if last is None:
+                    last = next_id(load_json(SEQUENCE_SOURCES[name])) - 1
+                seqs[name] = last + SEQ_BATCH
+                save_json(SEQUENCES_FILE, seqs)
+            rng = _seq_ranges[key] = [last + 1, last + SEQ_BATCH]
+        rng[0] += 1
+        return rng[0] - 1
+
+def bump_sequence(name: str, at_least: int):
+    """Make sure sequence `name` never hands out ids <= at_least (after imports).
+
+    Besides raising the persisted value, this records a floor that every
+    worker checks against its reserved range, since imported ids may fall
+    inside a batch another worker reserved earlier.
+    """
+    with _seq_lock:
+        _seq_ranges.pop((os.getpid(), name), None)
+        with file_lock(SEQUENCES_FILE):
+            seqs = load_json(SEQUENCES_FILE)
+            if not isinstance(seqs, dict):
+                seqs = {}
+            last = seqs.get(name)
+            if last is None:
+                last = next_id(load_json(SEQUENCE_SOURCES[name])) - 1
+            floors = seqs.get("floors") or {}
+            if at_least > last or (SEQ_BATCH > 1 and at_least > floors.get(name, 0)):
+                seqs[name] = max(last, at_least)
+                if SEQ_BATCH > 1:
+                    seqs["floors"] = {**floors, name: at_least}
+                save_json(SEQUENCES_FILE, seqs)
+
+# --- paged collections (one small file per page, grouped by parent id) ---
+def page_path(base_dir, key, page):
+    return os.path.join(base_dir, str(key), f"{page}.json")
+
+
+def page_count(total, per_page):
+    return max(1, -(-int(total) // per_page))
+
+
+def load_page(base_dir, key, page):
+    return load_json(page_path(base_dir, key, page))
+
+
+def append_paged(base_dir, key, item, seq, per_page):
+    """Store item as the seq-th (1-based) entry of a paged collection.
+
+    Only the page file that holds `seq` is read and rewritten, so inserts
+    cost one page regardless of how long the discussion gets.
+    """
+    path = page_path(base_dir, key, (seq - 1) // per_page + 1)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    items = load_json(path)
+    items.append(item)
+    save_json(path, items)
+
+
+def save_paged(base_dir, key, items, per_page):
+    drop_paged(base_dir, key)
+    if not items:
+        return
+    os.makedirs(os.path.join(base_dir, str(key)), exist_ok=True)
+    for start in range(0, len(items), per_page):
+        save_json(page_path(base_dir, key, start // per_page + 1), items[start:start + per_page])
+
+
+def drop_paged(base_dir, key):
+    remove_path(os.path.join(base_dir, str(key)))
+
+
+def remove_path(path):
+    """Delete a data file or directory, journaled so replicas follow."""
+    with journal_write(path) as journal:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        journal("rmtree")
+
+
+# An entry's id is its slot (it picks the page) and the parent's counter is
+# both the id sequence and the shown count, so entries are never removed from
+# a page; ones whose author is gone are blanked in place instead.
+DELETED_USER = "[deleted]"
+
+
+def blank_entry(item, author_field) -> dict:
+    """Placeholder for a comment or reply whose author was deleted."""
+    return {**item, author_field: DELETED_USER, "text": DELETED_USER}
+
+# --- membership stores (a set of usernames per item + per-user index) ---
+def build_membership(raw):
+    by_item, by_user = {}, {}
+    if isinstance(raw, dict):
+        for key, members in raw.items():
+            try:
+                item_id = int(key)
+            except (ValueError, TypeError):
+                continue
+            by_item[item_id] = set(members or [])
+            for uname in by_item[item_id]:
+                by_user.setdefault(uname, set()).add(item_id)
+    return {"by_item": by_item, "by_user": by_user}
+
+
+def membership(path):
+    return cached_json(path, build_membership)
+
+
+def member_count(path, item_id) -> int:
+    return len(membership(path)["by_item"].get(item_id, ()))
+
+
+def member_items(path, username) -> set:
+    if not username:
+        return set()
+    return membership(path)["by_user"].get(username, set())
+
+
+def _save_membership(path, idx):
+    save_json(path, {str(k): sorted(v) for k, v in idx["by_item"].items() if v})
+    cache_put(path, build_membership, idx)
+
+
+def toggle_membership(path, item_id, username):
+    """Add or remove `username` on `item_id`; returns (is_member, count)."""
+    with file_lock(path):
+        idx = membership(path)
+        members = idx["by_item"].setdefault(item_id, set())
+        mine = idx["by_user"].setdefault(username, set())
+        if username in members:
+            members.discard(username)
+            mine.discard(item_id)
+        else:
+            members.add(username)
+            mine.add(item_id)
+        _save_membership(path, idx)
+        return username in members, len(members)
+
+
+def drop_membership(path, item_ids=(), usernames=()):
+    """Forget deleted items and/or users in one rewrite."""
+    item_ids, usernames = set(item_ids), set(usernames)
+    if not item_ids and not usernames:
+        return
+    with file_lock(path):
+        idx = membership(path)
+        for item_id in item_ids:
+            for uname in idx["by_item"].pop(item_id, set()):
+                idx["by_user"].get(uname, set()).discard(item_id)
+        for uname in usernames:
+            for item_id in idx["by_user"].pop(uname, set()):
+                idx["by_item"].get(item_id, set()).discard(uname)
+        _save_membership(path, idx)
+
 # --- users helpers ---
 def find_user(users, username):
     return next((u for u in users if u.get("username") == username), None)
@@ -137,12 +589,23 @@ def save_user(users, user):
 
 # --- posts helpers ---
 def normalize_post(post: dict) -> dict:
-    post.setdefault("likes", 0)
-    post.setdefault("liked_by", [])
-    post.setdefault("comments", [])
+    # likes live in the like store; with_like_counts() fills them in for display
+    post.setdefault("comment_count", 0)
     return post
 
 
+def with_like_counts(posts):
+    """Fill each post's `likes` from the cached like index."""
+    by_item = membership(LIKES_FILE)["by_item"]
+    for p in posts:
+        p["likes"] = len(by_item.get(p.get("id"), ()))
+    return posts
+
+
+def liked_post_ids(username) -> set:
+    return member_items(LIKES_FILE, username)
+
+
 def get_post_by_id(post_id: int):
     posts = load_json(POSTS_FILE)
     for p in posts:
@@ -154,6 +617,2470 @@ def get_post_by_id(post_id: int):
 def save_posts(posts):
     save_json(POSTS_FILE, posts)
 
+
+def load_comments(post: dict, page: int):
+    """One page of a post's comments (oldest first) plus the page count."""
+    pages = page_count(post.get("comment_count", 0), COMMENTS_PER_PAGE)
+    page = min(max(page, 1), pages)
+    return load_page(COMMENTS_DIR, post["id"], page), page, pages
+
+
+def delete_post_data(post: dict):
+    """Remove everything stored alongside a post except its likes and image.
+
+    Likes are dropped with drop_membership() and the image released with
+    unlink_media() so bulk deletes rewrite each index once.
+    """
+    drop_paged(COMMENTS_DIR, post.get("id"))
+
+# -----------------------------------------------------------------------------
+# Change feed (ordered journal of every write under data/)
+# -----------------------------------------------------------------------------
+# Each change is one NDJSON line {"op", "path", "ts", "data"|"b64"} in
+# data/journal/<segment>.ndjson. A position in the feed is the cursor
+# "<segment>:<byte offset>", so cursors sort in write order and appending
+# needs no counter. The file write and its journal line happen under one
+# lock, so the journal order is the order the files actually changed in.
+# The first segment starts with a baseline "put" of every data file, so
+# replaying the journal from the beginning rebuilds the whole directory.
+JOURNAL_LOCK = os.path.join(DATA_DIR, "journal")
+
+
+def _journal_rel(path, data_dir=DATA_DIR):
+    """Path relative to `data_dir` if writes to it belong in the journal."""
+    rel = os.path.relpath(path, data_dir).replace(os.sep, "/")
+    if rel.startswith("../") or rel.split("/", 1)[0] in ("journal", "profiles"):
+        return None
+    if rel.endswith((".lock", ".tmp", ".part")) or rel == os.path.basename(REPLICA_CURSOR_FILE):
+        return None
+    return rel
+
+
+def parse_cursor(cursor) -> tuple:
+    seg, _, off = str(cursor or "0:0").partition(":")
+    return int(seg or 0), int(off or 0)
+
+
+def format_cursor(seg, off) -> str:
+    return f"{seg:08d}:{off}"
+
+
+def journal_segments(journal_dir=JOURNAL_DIR) -> list:
+    try:
+        return sorted(int(n[:-len(".ndjson")]) for n in os.listdir(journal_dir) if n.endswith(".ndjson"))
+    except OSError:
+        return []
+
+
+def _segment_path(seg, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, f"{seg:08d}.ndjson")
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+_journal_last = {}  # path -> (stat key, bytes this worker last wrote there), oldest first
+_journal_last_bytes = 0
+
+
+def _journal_base(path):
+    """(stat key, parsed document) of the version on disk, or None to journal a put.
+
+    Comes from memory when this worker wrote that version; otherwise the
+    file is only read back when it is small.
+    """
+    key = _stat_key(path)
+    if key is None:
+        return None
+    hit = _journal_last.get(path)
+    try:
+        if hit and hit[0] == key:
+            return key, decode_json(hit[1])
+        if key[2] > JOURNAL_DIFF_READ_BYTES:
+            return None
+        with open(path, "rb") as f:
+            return key, decode_json(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _remember_written(path, raw) -> list:
+    """Keep what was just written to `path` (caller holds the journal lock); returns its version."""
+    global _journal_last_bytes
+    key = _stat_key(path)
+    old = _journal_last.pop(path, None)
+    if old:
+        _journal_last_bytes -= len(old[1])
+    if len(raw) * 4 <= JOURNAL_DIFF_CACHE_BYTES:
+        _journal_last[path] = (key, raw)
+        _journal_last_bytes += len(raw)
+        while _journal_last_bytes > JOURNAL_DIFF_CACHE_BYTES:
+            _journal_last_bytes -= len(_journal_last.pop(next(iter(_journal_last)))[1])
+    return [key[0], key[1]]
+
+
+def _diff(old, new):
+    """Change from `old` to `new` ({} if equal), or None if they can't be diffed."""
+    if isinstance(old, list) and isinstance(new, list):
+        start, end_old, end_new = 0, len(old), len(new)
+        while start < min(end_old, end_new) and old[start] == new[start]:
+            start += 1
+        while end_old > start and end_new > start and old[end_old - 1] == new[end_new - 1]:
+            end_old, end_new = end_old - 1, end_new - 1
+        if start == end_old == end_new:
+            return {}
+        return {"splice": [start, end_old, new[start:end_new]]}
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed, nested = {}, {}
+        for key, value in new.items():
+            if key in old and old[key] == value:
+                continue
+            sub = _diff(old[key], value) if key in old else None
+            if sub is not None and len(dumps_json(sub)) < len(dumps_json(value)):
+                nested[key] = sub
+            else:
+                changed[key] = value
+        removed = [k for k in old if k not in new]
+        patch = {k: v for k, v in (("set", changed), ("del", removed), ("sub", nested)) if v}
+        return patch
+    return None
+
+
+def json_patch(old, new, new_size):
+    """Change from `old` to `new` for the journal: {} if equal, None if a full put is as small.
+
+    A list becomes one splice (the run between the common head and tail), so
+    an append, edit or delete of one record costs one record. A dict becomes
+    its changed keys, recursing into nested lists and dicts.
+    """
+    patch = _diff(old, new)
+    if patch is None or not patch:
+        return patch
+    return patch if len(dumps_json(patch)) * 2 < new_size else None
+
+
+def apply_patch(doc, change):
+    if "splice" in change:
+        start, end, items = change["splice"]
+        doc[start:end] = items
+        return doc
+    for key in change.get("del", ()):
+        doc.pop(key, None)
+    doc.update(change.get("set", {}))
+    for key, sub in change.get("sub", {}).items():
+        apply_patch(doc[key], sub)
+    return doc
+
+
+def _journal_line(seg, change) -> str:
+    line = dumps_json(change) + b"\n"
+    with open(_segment_path(seg), "ab") as f:
+        offset = os.fstat(f.fileno()).st_size
+        f.write(line)
+    return format_cursor(seg, offset + len(line))
+
+
+def _journal_checkpoint(seg):
+    """Open segment `seg` with a reset plus a put of every data file.
+
+    Checkpoint lines are flagged "baseline"; readers that follow the feed
+    continuously skip them, readers that start or land past a deleted
+    segment replay them to rebuild the whole directory.
+    """
+    _journal_line(seg, {"op": "reset", "path": ".", "ts": time.time(), "baseline": True})
+    for rel, path in _data_files():
+        if path.endswith(".json"):
+            change = {"op": "put", "path": rel, "data": load_json(path)}
+        else:
+            with open(path, "rb") as f:
+                change = {"op": "put", "path": rel, "b64": base64.b64encode(f.read()).decode("ascii")}
+        _journal_line(seg, {**change, "ts": time.time(), "baseline": True})
+
+
+def _is_baseline(line) -> bool:
+    return line.endswith(b"\n") and bool(loads_json(line).get("baseline"))
+
+
+def is_checkpoint(seg, journal_dir=JOURNAL_DIR) -> bool:
+    try:
+        with open(_segment_path(seg, journal_dir), "rb") as f:
+            return _is_baseline(f.readline())
+    except OSError:
+        return False
+
+
+def _journal_append(change) -> str:
+    """Append a change (caller holds the journal lock); returns the cursor after it.
+
+    A full segment is rolled over after the change is written, never before:
+    the data file already holds the change, so a checkpoint taken ahead of
+    its line would replay it twice. Every JOURNAL_CHECKPOINT_SEGMENTS the new
+    segment opens with a checkpoint, which bounds the journal to about
+    2 x JOURNAL_CHECKPOINT_SEGMENTS segments.
+    """
+    segs = journal_segments()
+    seg = segs[-1] if segs else 1
+    cursor = _journal_line(seg, change)
+    if os.path.getsize(_segment_path(seg)) >= JOURNAL_SEGMENT_BYTES:
+        checkpoints = [s for s in segs if is_checkpoint(s)]
+        if not checkpoints or seg + 1 - checkpoints[-1] >= JOURNAL_CHECKPOINT_SEGMENTS:
+            _journal_checkpoint(seg + 1)
+            for old in segs:
+                if checkpoints and old < checkpoints[-1]:
+                    os.remove(_segment_path(old))
+        else:
+            open(_segment_path(seg + 1), "ab").close()
+    return cursor
+
+
+@contextlib.contextmanager
+def journal_write(path):
+    """Run a write to `path` and journal it atomically with respect to other writes.
+
+    Yields journal(op, **payload); a no-op for paths outside the feed or
+    when journaling is off (replicas, MUNIVERSE_JOURNAL=0).
+    """
+    rel = _journal_rel(path) if JOURNAL_ENABLED else None
+    if rel is None:
+        yield lambda op, **payload: None
+        return
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+
+    def journal(op, **payload):
+        cursor = _journal_append({"op": op, "path": rel, "ts": time.time(), **payload})
+        if has_request_context():
+            g.journal_cursor = cursor  # lets a forwarding replica wait for this write
+
+    with file_lock(JOURNAL_LOCK):
+        yield journal
+
+
+def journal_head(journal_dir=JOURNAL_DIR) -> str:
+    segs = journal_segments(journal_dir)
+    if not segs:
+        return format_cursor(0, 0)
+    return format_cursor(segs[-1], os.path.getsize(_segment_path(segs[-1], journal_dir)))
+
+
+def journal_baseline():
+    """Start an empty journal with a checkpoint of every existing data file."""
+    if not JOURNAL_ENABLED or journal_segments():
+        return
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    with file_lock(JOURNAL_LOCK):
+        if not journal_segments():
+            _journal_checkpoint(1)
+
+
+def read_changes(after=None, limit=500, journal_dir=JOURNAL_DIR):
+    """Yield (cursor after the change, change) for up to `limit` (None: all) changes past `after`.
+
+    A reader whose position was deleted (or that has none) restarts at the
+    oldest segment, a checkpoint, and gets its baseline; everyone else
+    already has those files and skips it. Only such a reader is ever handed
+    a cursor inside a baseline, so one that stopped part way resumes it.
+    """
+    seg, off = parse_cursor(after)
+    segs = [s for s in journal_segments(journal_dir) if s >= seg]
+    landed = bool(segs) and segs[0] != seg
+    if landed:
+        seg, off = segs[0], 0
+    elif segs and off:
+        with open(_segment_path(seg, journal_dir), "rb") as f:
+            f.seek(off)
+            landed = _is_baseline(f.readline())
+    for s in segs:
+        if s != seg:
+            off, landed = 0, False
+        with open(_segment_path(s, journal_dir), "rb") as f:
+            f.seek(off)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return  # append in progress
+                off += len(line)
+                change = loads_json(line)
+                if change.get("baseline") and not landed:
+                    continue
+                yield format_cursor(s, off), change
+                if limit is not None:
+                    limit -= 1
+                    if limit <= 0:
+                        return
+
+
+def apply_change(change, data_dir=DATA_DIR):
+    """Replay one journaled change into `data_dir`."""
+    rel = change["path"]
+    if rel.startswith(("/", "..")) or "/../" in rel:
+        raise ValueError(f"refusing to apply change outside the data dir: {rel}")
+    path = os.path.join(data_dir, *rel.split("/"))
+    op = change["op"]
+    if op == "rmtree":
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+        return
+    if op == "reset":  # a checkpoint follows with every file that should exist
+        for _rel, old in list(_data_files(data_dir)):
+            os.remove(old)
+        return
+    if op == "patch":
+        save_json(path, apply_patch(load_json(path), change))
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    raw = base64.b64decode(change["b64"]) if "b64" in change else None
+    if op == "put":
+        if raw is None:
+            save_json(path, change["data"])
+        else:
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(raw)
+            os.replace(f"{path}.tmp", path)
+    elif op == "append":
+        with open(path, "ab") as f:
+            f.write(raw if raw is not None else dumps_json(change["data"]) + b"\n")
+    else:
+        raise ValueError(f"unknown change op: {op}")
+
+# -----------------------------------------------------------------------------
+# Tag & text indexes (forums + conferences + post hashtags)
+# -----------------------------------------------------------------------------
+TAG_KINDS = {"forums": FORUM_THREADS, "conferences": CONF_FILE, "posts": POSTS_FILE}
+# field whose #hashtags count as tags, on top of the item's own "tags"
+HASHTAG_FIELDS = {"forums": "body", "posts": "caption"}
+SEARCH_FIELDS = ("title", "name", "body", "location", "caption")
+TERM_RE = re.compile(r"[a-z0-9]+")
+# "#committee" but not "#1", "a#b" or "&#39;"
+HASHTAG_RE = re.compile(r"(?<![\w&#])#(\w*[^\W\d]\w*)")
+# same shape mentions.js completes
+MENTION_RE = re.compile(r"(?<![\w.@])@([\w.-]{1,30})")
+
+
+def norm_tag(tag) -> str:
+    return str(tag or "").strip().lstrip("#").lower()
+
+
+def extract_hashtags(text) -> list:
+    """Normalized #hashtags of `text`, first occurrence order, no repeats."""
+    return list(dict.fromkeys(norm_tag(t) for t in HASHTAG_RE.findall(text or "")))
+
+
+def item_tags(kind, item) -> set:
+    """Every tag `item` is indexed under: its tags plus hashtags in its text."""
+    tags = {norm_tag(t) for t in item.get("tags", [])}
+    if kind in HASHTAG_FIELDS:
+        tags.update(extract_hashtags(item.get(HASHTAG_FIELDS[kind])))
+    return tags - {""}
+
+
+def build_tag_sets(raw):
+    raw = raw if isinstance(raw, dict) else {}
+    return {
+        kind: {tag: set(ids) for tag, ids in (raw.get(kind) or {}).items()}
+        for kind in TAG_KINDS
+    }
+
+
+def tag_index(kind) -> dict:
+    return cached_json(TAG_INDEX_FILE, build_tag_sets)[kind]
+
+
+def _save_tag_index(idx):
+    save_json(TAG_INDEX_FILE, {
+        kind: {tag: sorted(ids) for tag, ids in sorted(tags.items()) if ids}
+        for kind, tags in idx.items()
+    })
+    cache_put(TAG_INDEX_FILE, build_tag_sets, idx)
+
+
+def index_tags(kind, item_id, tags):
+    """(Re)index one item's tags; pass tags=[] to drop the item."""
+    index_tags_many(kind, [(item_id, tags)])
+
+
+def index_item_tags(kind, item):
+    index_tags(kind, item["id"], item_tags(kind, item))
+
+
+def index_tags_many(kind, items):
+    """(Re)index many (item_id, tags) pairs with one write."""
+    items = list(items)
+    if not items:
+        return
+    with file_lock(TAG_INDEX_FILE):
+        idx = cached_json(TAG_INDEX_FILE, build_tag_sets)
+        item_ids = {item_id for item_id, _tags in items}
+        for ids in idx[kind].values():
+            ids -= item_ids
+        for item_id, tags in items:
+            for tag in {norm_tag(t) for t in tags} - {""}:
+                idx[kind].setdefault(tag, set()).add(item_id)
+        _save_tag_index(idx)
+
+
+def rebuild_tag_index():
+    idx = {kind: {} for kind in TAG_KINDS}
+    for kind, path in TAG_KINDS.items():
+        for item in load_json(path):
+            for tag in item_tags(kind, item):
+                idx[kind].setdefault(tag, set()).add(item.get("id"))
+    with file_lock(TAG_INDEX_FILE):
+        _save_tag_index(idx)
+
+
+def tag_cloud(kind, limit=50):
+    """Most used tags of a collection as [{"tag", "count"}]."""
+    counts = ((tag, len(ids)) for tag, ids in tag_index(kind).items() if ids)
+    top = heapq.nsmallest(limit, counts, key=lambda x: (-x[1], x[0]))
+    return [{"tag": tag, "count": n} for tag, n in top]
+
+
+def build_term_index(items):
+    postings = {}
+    for item in items:
+        text = " ".join(
+            [str(item.get(f) or "") for f in SEARCH_FIELDS] + list(item.get("tags", []))
+        ).lower()
+        for term in set(TERM_RE.findall(text)):
+            postings.setdefault(term, set()).add(item.get("id"))
+    return {"postings": postings, "terms": sorted(postings)}
+
+
+def prefix_postings(idx, token) -> set:
+    """Ids of items containing a word that starts with `token`."""
+    terms, postings = idx["terms"], idx["postings"]
+    hits = set()
+    i = bisect.bisect_left(terms, token)
+    while i < len(terms) and terms[i].startswith(token):
+        hits |= postings[terms[i]]
+        i += 1
+    return hits
+
+
+def filter_ids(kind, q="", tag=""):
+    """Ids matching a tag and/or query by intersecting index posting sets.
+
+    Returns None when there is nothing to filter on (i.e. "everything").
+    """
+    sets = []
+    if norm_tag(tag):
+        sets.append(tag_index(kind).get(norm_tag(tag), set()))
+    if q:
+        terms = cached_json(TAG_KINDS[kind], build_term_index)
+        sets.extend(prefix_postings(terms, tok) for tok in TERM_RE.findall(q.lower()))
+    if not sets:
+        return None
+    sets.sort(key=len)
+    result = set(sets[0])
+    for other in sets[1:]:
+        result &= other
+    return result
+
+
+def filter_items(kind, q="", tag=""):
+    """Items of a taggable collection matching tag + query (read-only dicts)."""
+    by_id = cached_json(TAG_KINDS[kind], index_by_id)
+    ids = filter_ids(kind, q, tag)
+    if ids is None:
+        return list(by_id.values())
+    return [by_id[i] for i in ids if i in by_id]
+
+# --- @mentions (extracted at write time, one list per mentioned user) ---
+# An entry's "ref" names where the mention is: "post:<id>", "post:<id>:<comment>",
+# "thread:<id>" or "thread:<id>:<reply>". Entries carry a short excerpt so the
+# mentions page renders from this file alone.
+MENTION_EXCERPT = 140
+
+
+def extract_mentions(text) -> list:
+    """Existing usernames @mentioned in `text`, first occurrence order."""
+    users = user_index()["users"]
+    found = []
+    for name in MENTION_RE.findall(text or ""):
+        if name not in users:
+            name = name.rstrip(".-")  # "thanks @bob." ends a sentence
+        if name in users and name not in found:
+            found.append(name)
+    return found
+
+
+def _mention_item(ref) -> str:
+    return ":".join(ref.split(":", 2)[:2])
+
+
+def mentions_path(username):
+    return os.path.join(MENTIONS_DIR, f"{username}.json")
+
+
+def mention_item_path(item):
+    return os.path.join(MENTIONS_DIR, "items", f"{item.replace(':', '-')}.json")
+
+
+def build_mention_list(raw) -> list:
+    return [e for e in raw if isinstance(e, dict) and e.get("ref")] if isinstance(raw, list) else []
+
+
+def mentions_of(username) -> list:
+    return cached_json(mentions_path(username), build_mention_list)
+
+
+def mention_entry(ref, by, text, ts=None) -> dict:
+    """Index entry for a mention; `ts` is epoch seconds or an ISO string (default now)."""
+    if not isinstance(ts, str):
+        ts = datetime.fromtimestamp(ts or time.time(), timezone.utc).isoformat(timespec="seconds")
+    text = " ".join((text or "").split())
+    if len(text) > MENTION_EXCERPT:
+        text = text[:MENTION_EXCERPT - 1].rstrip() + "…"
+    return {"ref": ref, "by": by, "ts": ts, "text": text}
+
+
+def _save_or_remove(path, data):
+    if data:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_json(path, data)
+    elif os.path.exists(path):
+        remove_path(path)
+
+
+def update_mentions(add=(), refs=(), items=(), usernames=()):
+    """Change the mention index, rewriting only the files of the users involved.
+
+    Drops entries at `refs`, entries under `items` (a post or thread with
+    its comments/replies) and whole lists of `usernames`, then indexes each
+    (entry, text) of `add` under the users its text mentions. The item files
+    say whose lists a drop has to visit; they are kept in step here.
+    """
+    add = [(entry, names) for entry, text in add
+           if (names := [u for u in extract_mentions(text) if u != entry["by"]])]
+    refs, items, usernames = set(refs), set(items), set(usernames)
+    if not (add or refs or items or usernames):
+        return
+    with file_lock(MENTIONS_DIR):
+        old, lists = {}, {}
+
+        def entries(uname):
+            if uname not in lists:
+                old[uname] = build_mention_list(load_json(mentions_path(uname)))
+                lists[uname] = list(old[uname])
+            return lists[uname]
+
+        for item in items | {_mention_item(r) for r in refs}:
+            for uname in load_json(mention_item_path(item)):
+                lists[uname] = [e for e in entries(uname)
+                                if e["ref"] not in refs and _mention_item(e["ref"]) not in items]
+        for uname in usernames:
+            entries(uname)
+            lists[uname] = []
+        for entry, names in add:
+            for uname in names:
+                entries(uname).append(entry)
+
+        item_users = {}
+        for uname, new in lists.items():
+            new = lists[uname] = new[-MENTIONS_KEEP:]
+            if new == old[uname]:
+                continue
+            _save_or_remove(mentions_path(uname), new)
+            before = {_mention_item(e["ref"]) for e in old[uname]}
+            after = {_mention_item(e["ref"]) for e in new}
+            for item in before ^ after:
+                if item not in item_users:
+                    item_users[item] = set(load_json(mention_item_path(item)))
+                if item in after:
+                    item_users[item].add(uname)
+                else:
+                    item_users[item].discard(uname)
+        for item, unames in item_users.items():
+            _save_or_remove(mention_item_path(item), sorted(unames))
+
+
+def rebuild_mention_index():
+    """Re-extract every mention from posts, comments, threads and replies."""
+    sources = (
+        ("posts", "post:{id}", "username", "caption", None),
+        ("comments", "post:{post_id}:{id}", "username", "text", "ts"),
+        ("threads", "thread:{id}", "author", "body", "created_ts"),
+        ("replies", "thread:{thread_id}:{id}", "author", "text", "created_ts"),
+    )
+    add = [
+        (mention_entry(ref.format(**r), r.get(by), r.get(field), r.get(ts) if ts else None), r.get(field))
+        for collection, ref, by, field, ts in sources
+        for r in export_records(collection)
+        if "@" in (r.get(field) or "")
+    ]
+    add.sort(key=lambda pair: pair[0]["ts"])
+    with file_lock(MENTIONS_DIR):
+        remove_path(MENTIONS_DIR)
+        remove_path(LEGACY_MENTIONS_FILE)
+        os.makedirs(MENTIONS_DIR)  # built, even if nobody has been mentioned yet
+    update_mentions(add=add)
+
+# --- authored index (what each user wrote, appended at write time) ---
+def authored_path(username):
+    return os.path.join(AUTHORED_DIR, urllib.parse.quote(username, safe="") + ".ndjson")
+
+
+def note_authored(username, ref):
+    os.makedirs(AUTHORED_DIR, exist_ok=True)
+    append_record(authored_path(username), {"ref": ref})
+
+
+def authored_refs(username) -> list:
+    """Refs of the threads, comments and replies `username` wrote (some may be gone)."""
+    path = authored_path(username)
+    return [r["ref"] for r in iter_records(path) if r.get("ref")] if os.path.exists(path) else []
+
+
+def rebuild_authored_index():
+    """Re-list every thread, comment and reply under its author."""
+    sources = (
+        ("comments", "post:{post_id}:{id}", "username"),
+        ("threads", "thread:{id}", "author"),
+        ("replies", "thread:{thread_id}:{id}", "author"),
+    )
+    by_user = {}
+    for collection, ref, by in sources:
+        for r in export_records(collection):
+            if r.get(by) and r.get(by) != DELETED_USER:
+                by_user.setdefault(r[by], []).append(dumps_json({"ref": ref.format(**r)}) + b"\n")
+    with file_lock(AUTHORED_DIR):
+        remove_path(AUTHORED_DIR)
+        os.makedirs(AUTHORED_DIR)
+        for uname, lines in by_user.items():
+            append_bytes(authored_path(uname), b"".join(lines))
+
+# --- user prefix index (usernames, names, schools) ---
+USER_SUGGEST_LIMIT = 8
+
+
+def build_user_index(users):
+    """Sorted words of every user's username, name and school -> usernames.
+
+    Rebuilt by cached_json whenever users.json changes, so signups, profile
+    edits and deletes are reflected on the next lookup.
+    """
+    postings, by_name = {}, {}
+    for u in users:
+        uname = u.get("username") if isinstance(u, dict) else None
+        if not uname:
+            continue
+        by_name[uname] = u
+        text = f"{uname} {u.get('name') or ''} {u.get('school') or ''}".lower()
+        for term in set(TERM_RE.findall(text)) | {uname.lower()}:
+            postings.setdefault(term, set()).add(uname)
+    return {"postings": postings, "terms": sorted(postings), "users": by_name}
+
+
+def user_index():
+    return cached_json(USERS_FILE, build_user_index)
+
+
+def search_users(q) -> set:
+    """Usernames with a word starting with every word of `q`."""
+    idx = user_index()
+    q = (q or "").strip().lstrip("@").lower()
+    tokens = TERM_RE.findall(q)
+    if not tokens:
+        return set()
+    # a whole username ("jane_doe") is indexed too, so the raw query can match it
+    sets = [prefix_postings(idx, tok) for tok in tokens]
+    result = set.intersection(*sets) if len(tokens) > 1 else sets[0]
+    return result | prefix_postings(idx, q)
+
+
+def suggest_users(q, limit=USER_SUGGEST_LIMIT) -> list:
+    """Top `limit` matches for `q`, most followed first."""
+    by_name = user_index()["users"]
+    return heapq.nsmallest(limit, search_users(q),
+                           key=lambda u: (-len(by_name[u].get("followers") or ()), u))
+
+# --- post search (caption words and usernames) ---
+def build_post_index(posts):
+    postings = {}
+    for p in posts:
+        if not isinstance(p, dict):
+            continue
+        text = f"{p.get('caption') or ''} {p.get('username') or ''}".lower()
+        for term in set(TERM_RE.findall(text)):
+            postings.setdefault(term, set()).add(p.get("id"))
+    ids = sorted(p.get("id") for p in posts if isinstance(p, dict) and isinstance(p.get("id"), int))
+    return {"postings": postings, "terms": sorted(postings), "ids": ids}
+
+
+def search_posts(q="", sort="latest", cursor=None, limit=EXPLORE_PER_PAGE):
+    """One page of matching post ids, the next page's cursor (or None) and the total.
+
+    Latest pages are keyed by the last id shown, so new posts don't shift
+    the pages being scrolled; trending pages by position in the ranking.
+    """
+    idx = cached_json(POSTS_FILE, build_post_index)
+    # "#tag" is an exact hashtag lookup; other words match caption/username prefixes
+    tags = extract_hashtags(q)
+    tokens = TERM_RE.findall(HASHTAG_RE.sub(" ", q or "").lower())
+    hits = None
+    if tags or tokens:
+        sets = [tag_index("posts").get(tag, set()) for tag in tags]
+        sets = sorted(sets + [prefix_postings(idx, tok) for tok in tokens], key=len)
+        hits = sets[0].intersection(*sets[1:])
+    if sort == "trending":
+        live = cached_json(POSTS_FILE, index_by_id)
+        ranked = [i for i in trending_ids("posts") if i in live and (hits is None or i in hits)]
+        start = max(int(cursor or 0), 0)
+        end = start + limit
+        return ranked[start:end], (end if end < len(ranked) else None), len(ranked)
+    ids = idx["ids"] if hits is None else sorted(hits)
+    end = bisect.bisect_left(ids, int(cursor)) if cursor else len(ids)
+    page = ids[max(end - limit, 0):end][::-1]
+    return page, (page[-1] if end > limit else None), len(ids)
+
+# -----------------------------------------------------------------------------
+# Conference catalog (date-ordered, split into upcoming / past)
+# -----------------------------------------------------------------------------
+CONF_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d %B %Y", "%B %d, %Y",
+                     "%b %d, %Y", "%d %b %Y", "%B %Y", "%Y-%m")
+
+
+def parse_conf_date(raw):
+    """Best-effort start date of a free-text conference date (None if unknown)."""
+    raw = str(raw or "").strip()
+    iso = re.match(r"\d{4}-\d{2}-\d{2}", raw)
+    if iso:
+        raw = iso.group(0)
+    for fmt in CONF_DATE_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def build_conf_catalog(confs):
+    dated, undated, locations = [], [], {}
+    for c in confs:
+        cid = c.get("id")
+        when = parse_conf_date(c.get("date"))
+        if when:
+            dated.append((when.toordinal(), cid))
+        else:
+            undated.append(cid)
+        for term in set(TERM_RE.findall(str(c.get("location") or "").lower())):
+            locations.setdefault(term, set()).add(cid)
+    dated.sort()
+    return {
+        "days": [d for d, _ in dated],
+        "ids": [cid for _, cid in dated],
+        "undated": undated,
+        "locations": {"postings": locations, "terms": sorted(locations)},
+    }
+
+
+def conference_ids(when="upcoming", q="", tag="", location=""):
+    """Conference ids for one partition, soonest (upcoming) or latest (past) first."""
+    cat = cached_json(CONF_FILE, build_conf_catalog)
+    split = bisect.bisect_left(cat["days"], date.today().toordinal())
+    if when == "past":
+        ids = cat["ids"][:split][::-1]
+    else:
+        ids = cat["ids"][split:] + cat["undated"]
+
+    allowed = filter_ids("conferences", q, tag)
+    for tok in TERM_RE.findall(location.lower()):
+        hits = prefix_postings(cat["locations"], tok)
+        allowed = hits if allowed is None else allowed & hits
+    if allowed is not None:
+        ids = [cid for cid in ids if cid in allowed]
+    return ids
+
+# -----------------------------------------------------------------------------
+# Trending (time-decayed hotness for posts + threads)
+# -----------------------------------------------------------------------------
+# Scores use forward decay: an event at time t adds weight * 2^((t - EPOCH) / half_life),
+# stored as a log. Newer events simply count for more, so relative order
+# already reflects decay and stored scores never need to be rescaled.
+TRENDING_EPOCH = 1735689600  # 2025-01-01 UTC
+EVENT_WEIGHTS = {"create": 1.0, "view": 0.25, "like": 3.0, "comment": 4.0, "reply": 4.0}
+
+
+def _logaddexp(a: float, b: float) -> float:
+    hi, lo = max(a, b), min(a, b)
+    return hi + math.log1p(math.exp(lo - hi))
+
+
+def trending_delta(event, now=None) -> float:
+    """Log-score one event adds; several combine with _logaddexp."""
+    now = time.time() if now is None else now
+    return math.log(EVENT_WEIGHTS[event]) + (now - TRENDING_EPOCH) * math.log(2) / TRENDING_HALF_LIFE
+
+
+def fold_trending(deltas):
+    """Fold {(kind, item_id): log delta} into the board with one write, keeping the top K."""
+    if not deltas:
+        return
+    with file_lock(TRENDING_FILE):
+        board = load_json(TRENDING_FILE)
+        if not isinstance(board, dict):
+            board = {}
+        for (kind, item_id), delta in deltas.items():
+            scores = board.setdefault(kind, {})
+            key = str(item_id)
+            scores[key] = _logaddexp(scores[key], delta) if key in scores else delta
+        for scores in board.values():
+            while len(scores) > TRENDING_TOP_K:
+                del scores[min(scores, key=scores.get)]
+        save_json(TRENDING_FILE, board)
+
+
+def bump_trending(kind, item_id, event, now=None):
+    """Fold one event into an item's score and keep only the top K items."""
+    fold_trending({(kind, item_id): trending_delta(event, now)})
+
+
+def drop_trending(kind, item_ids):
+    item_ids = {str(i) for i in item_ids}
+    if not item_ids:
+        return
+    with file_lock(TRENDING_FILE):
+        board = load_json(TRENDING_FILE)
+        if not isinstance(board, dict) or not item_ids & set(board.get(kind, {})):
+            return
+        for key in item_ids:
+            board[kind].pop(key, None)
+        save_json(TRENDING_FILE, board)
+
+
+def build_rankings(board):
+    board = board if isinstance(board, dict) else {}
+    return {
+        kind: [int(k) for k, _ in sorted(scores.items(), key=lambda kv: kv[1], reverse=True)]
+        for kind, scores in board.items()
+    }
+
+
+def trending_ids(kind, limit=None) -> list:
+    """Hottest item ids first, straight from the cached top-K board."""
+    ids = cached_json(TRENDING_FILE, build_rankings).get(kind, [])
+    return ids[:limit] if limit else ids
+
+# -----------------------------------------------------------------------------
+# Request profiling (opt-in, sampled, aggregated per route)
+# -----------------------------------------------------------------------------
+# A sampled request runs under cProfile while a helper thread snapshots its
+# stack every few ms. Results are merged per endpoint in memory and flushed
+# to data/profiles/<endpoint>.<pid>.{prof,json}; the admin endpoints merge
+# every worker's files into one pstats dump or one collapsed-stack file.
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+PROFILE_ROUTES = {r.strip() for r in os.environ.get("MUNIVERSE_PROFILE_ROUTES", "").split(",") if r.strip()}
+# fraction of (matching) requests to profile; naming routes alone means "all of them"
+PROFILE_RATE = float(os.environ.get("MUNIVERSE_PROFILE_RATE", "1" if PROFILE_ROUTES else "0"))
+# requests sending this value in X-Muniverse-Profile are always profiled
+PROFILE_TOKEN = os.environ.get("MUNIVERSE_PROFILE_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_FLUSH_SECONDS = 10
+PROFILE_SKIP = {"static", "events", "changes_feed"}
+
+_profiles = {}  # endpoint -> {"stats", "stacks", "requests", "wall", "flushed"}
+_profiles_lock = threading.Lock()
+# cProfile is one-per-process on newer Pythons; concurrent requests just aren't sampled
+_cprofile_busy = threading.Lock()
+
+
+def _want_profile() -> bool:
+    if request.endpoint in PROFILE_SKIP or request.endpoint is None:
+        return False
+    if PROFILE_TOKEN and request.headers.get("X-Muniverse-Profile") == PROFILE_TOKEN:
+        return True
+    if PROFILE_ROUTES and request.endpoint not in PROFILE_ROUTES:
+        return False
+    return PROFILE_RATE > 0 and random.random() < PROFILE_RATE
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample_stacks(thread_id, stop, stacks):
+    while not stop.wait(PROFILE_SAMPLE_INTERVAL):
+        frame = sys._current_frames().get(thread_id)
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        if labels:
+            key = ";".join(reversed(labels))
+            stacks[key] = stacks.get(key, 0) + 1
+
+
+@app.before_request
+def start_profile():
+    if not (PROFILE_RATE or PROFILE_TOKEN) or not _want_profile():
+        return
+    if not _cprofile_busy.acquire(blocking=False):
+        return
+    stop, stacks = threading.Event(), {}
+    sampler = threading.Thread(target=_sample_stacks, name="profile-sampler", daemon=True,
+                               args=(threading.get_ident(), stop, stacks))
+    profiler = cProfile.Profile()
+    g.profile = (profiler, sampler, stop, stacks, time.perf_counter())
+    sampler.start()
+    profiler.enable()
+
+
+@app.teardown_request
+def stop_profile(exc=None):
+    prof = g.pop("profile", None)
+    if prof is None:
+        return
+    profiler, sampler, stop, stacks, t0 = prof
+    profiler.disable()
+    _cprofile_busy.release()
+    stop.set()
+    sampler.join()
+    endpoint = request.endpoint
+    with _profiles_lock:
+        agg = _profiles.setdefault(endpoint, {"stats": None, "stacks": {}, "requests": 0,
+                                              "wall": 0.0, "flushed": time.time()})
+        if agg["stats"] is None:
+            agg["stats"] = pstats.Stats(profiler)
+        else:
+            agg["stats"].add(profiler)
+        for key, n in stacks.items():
+            agg["stacks"][key] = agg["stacks"].get(key, 0) + n
+        agg["requests"] += 1
+        agg["wall"] += time.perf_counter() - t0
+        if time.time() - agg["flushed"] >= PROFILE_FLUSH_SECONDS:
+            _flush_profile(endpoint, agg)
+
+
+def _flush_profile(endpoint, agg):
+    """Write one endpoint's aggregate for this pid (caller holds _profiles_lock)."""
+    base = os.path.join(PROFILE_DIR, f"{endpoint}.{os.getpid()}")
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        agg["stats"].dump_stats(f"{base}.prof.tmp")
+        os.replace(f"{base}.prof.tmp", f"{base}.prof")
+        save_json(f"{base}.json", {"endpoint": endpoint, "pid": os.getpid(),
+                                   "requests": agg["requests"], "wall_seconds": round(agg["wall"], 6),
+                                   "stacks": agg["stacks"]})
+        agg["flushed"] = time.time()
+    except OSError as e:
+        app.logger.warning(f"Could not write profile for {endpoint}: {e}")
+
+
+def flush_profiles():
+    with _profiles_lock:
+        for endpoint, agg in _profiles.items():
+            _flush_profile(endpoint, agg)
+
+
+def profile_files(endpoint=None) -> dict:
+    """endpoint -> [(pid, base path)] for every flushed profile on disk."""
+    found = {}
+    if not os.path.isdir(PROFILE_DIR):
+        return found
+    for name in sorted(os.listdir(PROFILE_DIR)):
+        if not name.endswith(".json"):
+            continue
+        ep, _, pid = name[:-len(".json")].rpartition(".")
+        if ep and (endpoint is None or ep == endpoint):
+            found.setdefault(ep, []).append((pid, os.path.join(PROFILE_DIR, name[:-len(".json")])))
+    return found
+
+
+def merged_profile(endpoint):
+    """(pstats.Stats or None, {stack: count}, requests, wall seconds) across workers."""
+    stats, stacks, requests, wall = None, {}, 0, 0.0
+    for _pid, base in profile_files(endpoint).get(endpoint, []):
+        meta = load_json(f"{base}.json")
+        if not isinstance(meta, dict):
+            continue
+        requests += meta.get("requests", 0)
+        wall += meta.get("wall_seconds", 0.0)
+        for key, n in meta.get("stacks", {}).items():
+            stacks[key] = stacks.get(key, 0) + n
+        if os.path.exists(f"{base}.prof"):
+            if stats is None:
+                stats = pstats.Stats(f"{base}.prof")
+            else:
+                stats.add(f"{base}.prof")
+    return stats, stacks, requests, wall
+
+# -----------------------------------------------------------------------------
+# Media catalog (uploads, their references, orphan sweeping)
+# -----------------------------------------------------------------------------
+# Uploads are stored under a content-hash name, so re-uploads dedupe and a new
+# file never overwrites one something else still points at. Every entry keeps
+# the refs ("post:3", "user:alice", "conf:7", "pending:2") that use it; once an
+# entry has no refs it is an orphan and the sweeper reclaims it after a grace
+# period. The sweeper only ever looks at catalog entries, never the directories.
+MEDIA_DIRS = {
+    "posts": POST_UPLOAD_DIR,
+    "users": USER_UPLOAD_DIR,
+    "conferences": CONF_UPLOAD_DIR,
+    "pending": PENDING_UPLOAD_DIR,
+}
+MEDIA_PROTECTED = {"img/users/default.png"}
+MEDIA_PER_PAGE = 50
+MEDIA_ORPHAN_GRACE = int(os.environ.get("MUNIVERSE_MEDIA_GRACE_SECONDS", "3600"))
+MEDIA_SWEEP_SECONDS = int(os.environ.get("MUNIVERSE_MEDIA_SWEEP_SECONDS", "600"))
+MEDIA_SWEEP_BATCH = 200
+
+
+def build_media(raw) -> dict:
+    return raw if isinstance(raw, dict) else {}
+
+
+def media_catalog() -> dict:
+    return cached_json(MEDIA_FILE, build_media)
+
+
+def _save_media(catalog):
+    save_json(MEDIA_FILE, catalog)
+    cache_put(MEDIA_FILE, build_media, catalog)
+
+
+def _media_rel(abs_path) -> str:
+    return os.path.relpath(abs_path, app.static_folder).replace(os.sep, "/")
+
+
+def store_upload(file, kind: str, owner: str) -> str:
+    """Save an uploaded file into MEDIA_DIRS[kind] and catalog it.
+
+    Returns the static-relative path. The entry starts without refs; callers
+    attach one with link_media() once the record that uses it is saved, so an
+    abandoned request leaves a sweepable orphan rather than a stray file.
+    """
+    ext = secure_filename(file.filename).rsplit(".", 1)[1].lower()
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=MEDIA_DIRS[kind], suffix=".part")
+    try:
+        size = 0
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: file.stream.read(64 * 1024), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha = digest.hexdigest()
+        dst = os.path.join(MEDIA_DIRS[kind], f"{sha[:24]}.{ext}")
+        rel = _media_rel(dst)
+        with file_lock(MEDIA_FILE):
+            catalog = media_catalog()
+            os.replace(tmp, dst)
+            entry = catalog.get(rel)
+            now = int(time.time())
+            if entry is None:
+                catalog[rel] = {"kind": kind, "owner": owner, "size": size, "sha256": sha,
+                                "refs": [], "ts": now, "orphaned": now}
+                _save_media(catalog)
+            elif entry.get("orphaned") is not None:
+                # Same content as an orphan waiting to be swept: restart its grace
+                # period so the sweeper can't delete it before link_media() runs.
+                entry.update(size=size, orphaned=now if not entry["refs"] else None)
+                _save_media(catalog)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+    return rel
+
+
+def link_media(ref: str, add=(), remove=()):
+    """Attach `ref` to the `add` paths and detach it from `remove` (one write)."""
+    add = [p for p in add if p]
+    remove = [p for p in remove if p and p not in add]
+    if not add and not remove:
+        return
+    now = int(time.time())
+    with file_lock(MEDIA_FILE):
+        catalog = media_catalog()
+        for rel in add:
+            entry = catalog.get(rel)
+            if entry is not None and ref not in entry["refs"]:
+                entry["refs"].append(ref)
+                entry["orphaned"] = None
+        for rel in remove:
+            entry = catalog.get(rel)
+            if entry is not None and ref in entry["refs"]:
+                entry["refs"].remove(ref)
+                if not entry["refs"]:
+                    entry["orphaned"] = now
+        _save_media(catalog)
+
+
+def unlink_media(pairs):
+    """Detach many (ref, path) pairs at once, e.g. when a user and their posts go."""
+    pairs = [(ref, rel) for ref, rel in pairs if rel]
+    if not pairs:
+        return
+    now = int(time.time())
+    with file_lock(MEDIA_FILE):
+        catalog = media_catalog()
+        for ref, rel in pairs:
+            entry = catalog.get(rel)
+            if entry is not None and ref in entry["refs"]:
+                entry["refs"].remove(ref)
+                if not entry["refs"]:
+                    entry["orphaned"] = now
+        _save_media(catalog)
+
+
+def move_media(moves) -> list:
+    """Move cataloged files into MEDIA_DIRS[kind], swapping `old_ref` for `ref`.
+
+    `moves` is a list of (rel, kind, ref, old_ref); all of them share one
+    catalog write. Returns the new paths in the same order.
+    """
+    now = int(time.time())
+    out = []
+    with file_lock(MEDIA_FILE):
+        catalog = media_catalog()
+        for rel, kind, ref, old_ref in moves:
+            src = os.path.join(app.static_folder, rel)
+            dst = os.path.join(MEDIA_DIRS[kind], os.path.basename(rel))
+            new_rel = _media_rel(dst)
+            entry = catalog.get(rel) or {"owner": None, "sha256": None, "refs": [], "ts": now}
+            remaining = [r for r in entry["refs"] if r != old_ref]
+            if os.path.exists(dst):
+                pass  # the same content is already live
+            elif remaining:
+                shutil.copy2(src, dst)  # another submission still uses the original
+            else:
+                shutil.move(src, dst)
+            moved = catalog.setdefault(new_rel, {**entry, "refs": []})
+            moved.update(kind=kind, size=os.path.getsize(dst), orphaned=None)
+            if ref not in moved["refs"]:
+                moved["refs"].append(ref)
+            if rel in catalog:
+                entry["refs"] = remaining
+                if not remaining:
+                    entry["orphaned"] = now
+            out.append(new_rel)
+        if out:
+            _save_media(catalog)
+    return out
+
+
+def sweep_media(limit=MEDIA_SWEEP_BATCH, grace=None) -> list:
+    """Delete up to `limit` files that have been orphans for longer than `grace`."""
+    grace = MEDIA_ORPHAN_GRACE if grace is None else grace
+    cutoff = time.time() - grace
+    with file_lock(MEDIA_FILE):
+        catalog = media_catalog()
+        due = heapq.nsmallest(limit, (
+            (e["orphaned"], rel) for rel, e in catalog.items()
+            if not e["refs"] and e.get("orphaned") is not None
+            and e["orphaned"] <= cutoff and rel not in MEDIA_PROTECTED
+        ))
+        for _, rel in due:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(app.static_folder, rel))
+            del catalog[rel]
+        if due:
+            _save_media(catalog)
+    return [rel for _, rel in due]
+
+
+def media_page(page=1, kind=None, owner=None, orphans=False):
+    """Newest-first slice of the catalog for the admin listing."""
+    rows = [
+        {"path": rel, **e} for rel, e in media_catalog().items()
+        if (not kind or e.get("kind") == kind)
+        and (not owner or e.get("owner") == owner)
+        and (not orphans or not e["refs"])
+    ]
+    rows.sort(key=lambda r: (r.get("ts") or 0, r["path"]), reverse=True)
+    pages = page_count(len(rows), MEDIA_PER_PAGE)
+    page = min(max(page, 1), pages)
+    start = (page - 1) * MEDIA_PER_PAGE
+    return rows[start:start + MEDIA_PER_PAGE], page, pages, len(rows)
+
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep_media_forever():
+    while True:
+        time.sleep(MEDIA_SWEEP_SECONDS)
+        try:
+            swept = sweep_media()
+            if swept:
+                app.logger.info(f"Media sweeper reclaimed {len(swept)} orphaned file(s)")
+        except Exception as e:
+            app.logger.error(f"Media sweep failed: {e}")
+
+
+@app.before_request
+def start_media_sweeper():
+    # threads don't survive fork, so each worker process starts its own
+    global _sweeper_pid
+    if _sweeper_pid == os.getpid() or not MEDIA_SWEEP_SECONDS:
+        return
+    with _sweeper_lock:
+        if _sweeper_pid != os.getpid():
+            threading.Thread(target=_sweep_media_forever, name="media-sweeper", daemon=True).start()
+            _sweeper_pid = os.getpid()
+
+# -----------------------------------------------------------------------------
+# Admin notifications (append-only log, offset index, per-admin read cursors)
+# -----------------------------------------------------------------------------
+# Ids are dense and monotonic: the id of the newest notification is simply the
+# number of 8-byte offsets in NOTIFS_INDEX, so adding one is two appends and
+# counting unread ones is a stat() and a subtraction.
+_OFFSET = struct.Struct("<Q")
+
+
+def notif_last_id() -> int:
+    try:
+        return os.path.getsize(NOTIFS_INDEX) // _OFFSET.size
+    except OSError:
+        return 0
+
+
+def add_notification(kind: str, payload: dict) -> int:
+    with file_lock(NOTIFS_LOG):
+        nid = notif_last_id() + 1
+        offset = append_record(NOTIFS_LOG, {"id": nid, "kind": kind, "payload": payload,
+                                            "ts": int(time.time())})
+        append_bytes(NOTIFS_INDEX, _OFFSET.pack(offset))
+    return nid
+
+
+def load_notifications(page=1, per_page=NOTIFS_PER_PAGE):
+    """Newest-first page of notifications plus (page, pages), read via the index."""
+    last = notif_last_id()
+    pages = page_count(last, per_page)
+    page = min(max(page, 1), pages)
+    hi = last - (page - 1) * per_page
+    lo = max(hi - per_page + 1, 1)
+    if hi < 1:
+        return [], page, pages
+    with open(NOTIFS_INDEX, "rb") as f:
+        f.seek((lo - 1) * _OFFSET.size)
+        raw = f.read((hi - lo + 1) * _OFFSET.size)
+    out = []
+    with open(NOTIFS_LOG, "rb") as log:
+        for (offset,) in reversed(list(_OFFSET.iter_unpack(raw))):
+            log.seek(offset)
+            out.append(loads_json(log.readline()))
+    return out, page, pages
+
+
+def notif_cursor(username) -> int:
+    """Id of the newest notification `username` has marked read."""
+    cursors = cached_json(NOTIF_CURSORS_FILE)
+    return cursors.get(username, 0) if isinstance(cursors, dict) else 0
+
+
+def unread_notifications(username) -> int:
+    return max(notif_last_id() - notif_cursor(username), 0)
+
+
+def mark_notifications_read(username, up_to=None):
+    up_to = notif_last_id() if up_to is None else min(int(up_to), notif_last_id())
+    with file_lock(NOTIF_CURSORS_FILE):
+        cursors = load_json(NOTIF_CURSORS_FILE)
+        if not isinstance(cursors, dict):
+            cursors = {}
+        if up_to > cursors.get(username, 0):  # cursors only move forward
+            cursors[username] = up_to
+            save_json(NOTIF_CURSORS_FILE, cursors)
+
+# -----------------------------------------------------------------------------
+# Replica mode (apply the primary's change feed, forward writes to it)
+# -----------------------------------------------------------------------------
+REPLICA_POLL_SECONDS = 0.5
+REPLICA_BATCH = 500
+REPLICA_WAIT_SECONDS = 2.0  # how long a forwarded write waits to be applied locally
+# headers that describe one hop, not the request
+HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te",
+               "trailers", "transfer-encoding", "upgrade", "host", "content-length"}
+
+_replica_pid = None
+_replica_lock = threading.Lock()
+
+
+class _NoRedirects(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # hand redirects back to the browser untouched
+
+
+_forwarder = urllib.request.build_opener(_NoRedirects)
+
+
+def replica_cursor() -> str:
+    state = cached_json(REPLICA_CURSOR_FILE)
+    return state.get("cursor") if isinstance(state, dict) else None
+
+
+def _fetch_changes(after):
+    if JOURNAL_SOURCE:
+        return list(read_changes(after, REPLICA_BATCH, journal_dir=JOURNAL_SOURCE))
+    query = urllib.parse.urlencode({"after": after or "", "limit": REPLICA_BATCH})
+    req = urllib.request.Request(f"{PRIMARY_URL}/_changes?{query}",
+                                 headers={"X-Muniverse-Replication-Token": REPLICATION_TOKEN})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return [(item["cursor"], item["change"]) for item in map(loads_json, resp) if item]
+
+
+def replicate_once() -> int:
+    """Apply the next batch of upstream changes; returns how many were applied."""
+    with file_lock(REPLICA_CURSOR_FILE):
+        cursor = replica_cursor()
+        batch = _fetch_changes(cursor)
+        for cursor, change in batch:
+            apply_change(change)
+        if batch:
+            save_json(REPLICA_CURSOR_FILE, {"cursor": cursor, "ts": time.time()})
+    return len(batch)
+
+
+def _replicate_forever():
+    while True:
+        try:
+            if replicate_once():
+                continue
+        except Exception as e:  # primary restarting, network blips
+            app.logger.warning(f"Replication paused: {e}")
+        time.sleep(REPLICA_POLL_SECONDS)
+
+
+def wait_for_cursor(cursor, timeout=REPLICA_WAIT_SECONDS) -> bool:
+    """Block (briefly) until this replica has applied the change feed up to `cursor`."""
+    target = parse_cursor(cursor)
+    deadline = time.monotonic() + timeout
+    while parse_cursor(replica_cursor()) < target:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def forward_to_primary():
+    """Replay the current request against the primary and relay its response."""
+    url = PRIMARY_URL + request.full_path.rstrip("?")
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+    headers["X-Forwarded-For"] = request.remote_addr or ""
+    req = urllib.request.Request(url, data=request.get_data(), method=request.method, headers=headers)
+    try:
+        upstream = _forwarder.open(req, timeout=60)
+    except urllib.error.HTTPError as e:  # 3xx/4xx/5xx still carry a usable response
+        upstream = e
+    with upstream:
+        body = upstream.read()
+        resp = Response(body, status=upstream.status)
+        for key, value in upstream.headers.items():
+            if key.lower() not in HOP_HEADERS and key.lower() != "set-cookie":
+                resp.headers[key] = value
+        for cookie in upstream.headers.get_all("Set-Cookie") or []:
+            resp.headers.add("Set-Cookie", cookie)
+    cursor = upstream.headers.get("X-Muniverse-Cursor")
+    if cursor:
+        wait_for_cursor(cursor)  # read-your-writes for the redirect that follows
+    return resp
+
+
+@app.before_request
+def replica_gateway():
+    global _replica_pid
+    if ROLE != "replica":
+        return None
+    if _replica_pid != os.getpid():
+        # threads don't survive fork, so each worker process starts its own
+        with _replica_lock:
+            if _replica_pid != os.getpid():
+                threading.Thread(target=_replicate_forever, name="replica", daemon=True).start()
+                _replica_pid = os.getpid()
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        return forward_to_primary()
+    # uploads live on the primary unless static/img is a shared volume
+    if request.path.startswith("/static/img/") and not os.path.exists(
+            os.path.join(app.static_folder, request.path[len("/static/"):])):
+        return redirect(PRIMARY_URL + request.path)
+    return None
+
+
+@app.after_request
+def expose_journal_cursor(response):
+    cursor = g.get("journal_cursor")
+    if cursor:
+        response.headers["X-Muniverse-Cursor"] = cursor
+    return response
+
+# -----------------------------------------------------------------------------
+# Snapshots (content-addressed chunks) + point-in-time restore
+# -----------------------------------------------------------------------------
+# A snapshot is a manifest listing every data file as a list of chunk hashes;
+# chunks are zlib-compressed and stored once under chunks/<aa>/<sha256>.z, so a
+# collection that didn't change since the last snapshot costs nothing.
+# Writers are never blocked: rewritten files are swapped in with os.replace, so
+# each read sees one whole version, and append-only files are read only up to
+# the length they had when the journal position was pinned. Replaying the
+# journal from that position over the restored files brings them to any
+# moment after the snapshot finished. A rewritten file may have been copied
+# at a version newer than the pin, so the manifest keeps the version it saw
+# ("v", matching the journal line that wrote it) and replay skips the changes
+# that copy already holds; patches must never be applied twice.
+SNAPSHOT_DIR = os.environ.get("MUNIVERSE_SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_CHUNK_BYTES = 1024 * 1024
+APPEND_ONLY_SUFFIXES = (".ndjson", ".idx")
+
+
+def _data_files(data_dir=DATA_DIR):
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = _journal_rel(path, data_dir)
+            if rel is not None:
+                yield rel, path
+
+
+def _chunk_path(dest, digest):
+    return os.path.join(dest, "chunks", digest[:2], f"{digest}.z")
+
+
+def _store_chunk(dest, data, stats) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(dest, digest)
+    stats["chunks"] += 1
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        packed = zlib.compress(data, 6)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(packed)
+        os.replace(f"{path}.tmp", path)
+        stats["new_chunks"] += 1
+        stats["new_bytes"] += len(packed)
+    return digest
+
+
+def create_snapshot(dest=SNAPSHOT_DIR) -> dict:
+    t0 = time.perf_counter()
+    # pin the journal position and the append-only file lengths together (a few stats)
+    with file_lock(JOURNAL_LOCK):
+        start = journal_head()
+        files = list(_data_files())
+        pinned = {rel: os.path.getsize(path) for rel, path in files if rel.endswith(APPEND_ONLY_SUFFIXES)}
+    stats = {"files": 0, "bytes": 0, "chunks": 0, "new_chunks": 0, "new_bytes": 0}
+    entries = {}
+    for rel, path in files:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:  # dropped since; the journal replays that
+            continue
+        with f:
+            st = os.fstat(f.fileno())
+            limit, size, chunks = pinned.get(rel), 0, []
+            while limit is None or size < limit:
+                want = SNAPSHOT_CHUNK_BYTES if limit is None else min(SNAPSHOT_CHUNK_BYTES, limit - size)
+                data = f.read(want)
+                if not data:
+                    break
+                chunks.append(_store_chunk(dest, data, stats))
+                size += len(data)
+        entries[rel] = {"size": size, "chunks": chunks}
+        if limit is None:
+            entries[rel]["v"] = [st.st_ino, st.st_mtime_ns]
+        stats["files"] += 1
+        stats["bytes"] += size
+    with file_lock(JOURNAL_LOCK):  # every version read above has its journal line by now
+        end = journal_head()
+    now = time.time()
+    manifest = {
+        "id": time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"-{int(now * 1000) % 1000:03d}",
+        "created": now,
+        "journal_start": start if JOURNAL_ENABLED else None,
+        "journal_end": end if JOURNAL_ENABLED else None,
+        "files": entries,
+        "stats": {**stats, "seconds": round(time.perf_counter() - t0, 3)},
+    }
+    os.makedirs(os.path.join(dest, "manifests"), exist_ok=True)
+    save_json(os.path.join(dest, "manifests", f"{manifest['id']}.json"), manifest)
+    return manifest
+
+
+def list_snapshots(dest=SNAPSHOT_DIR) -> list:
+    folder = os.path.join(dest, "manifests")
+    if not os.path.isdir(folder):
+        return []
+    return sorted(n[:-len(".json")] for n in os.listdir(folder) if n.endswith(".json"))
+
+
+def load_manifest(snap_id, dest=SNAPSHOT_DIR) -> dict:
+    ids = list_snapshots(dest)
+    if snap_id == "latest" and ids:
+        snap_id = ids[-1]
+    if snap_id not in ids:
+        raise ValueError(f"no snapshot {snap_id!r} in {dest}")
+    return load_json(os.path.join(dest, "manifests", f"{snap_id}.json"))
+
+
+def restore_snapshot(snap_id, target, dest=SNAPSHOT_DIR, until=None, replay=True,
+                     journal_dir=JOURNAL_DIR) -> dict:
+    """Materialize a snapshot into `target`, then replay the journal up to `until` (epoch)."""
+    manifest = load_manifest(snap_id, dest)
+    real_target, real_data = os.path.realpath(target), os.path.realpath(DATA_DIR)
+    if real_target == real_data or real_target.startswith(real_data + os.sep):
+        raise ValueError("restore into an empty directory outside data/, then swap it in")
+    if os.path.isdir(target) and os.listdir(target):
+        raise ValueError(f"{target} is not empty")
+    if until is not None and until < manifest["created"]:
+        raise ValueError("--until is before this snapshot finished; restore an older snapshot")
+    t0 = time.perf_counter()
+    for rel, entry in manifest["files"].items():
+        path = os.path.join(target, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as out:
+            for digest in entry["chunks"]:
+                with open(_chunk_path(dest, digest), "rb") as f:
+                    out.write(zlib.decompress(f.read()))
+        os.replace(f"{path}.tmp", path)
+    replayed, cursor = 0, manifest.get("journal_start")
+    if replay and cursor is not None and until is not None:
+        segs = journal_segments(journal_dir)
+        if segs and parse_cursor(cursor)[0] < segs[0]:
+            raise ValueError("the journal after this snapshot was compacted away; "
+                             "restore a newer snapshot or drop --until")
+    if replay and cursor is not None:
+        skip = _replay_skips(manifest, journal_dir)
+        for next_cursor, change in read_changes(cursor, None, journal_dir=journal_dir):
+            if until is not None and change.get("ts", 0) > until:
+                break
+            cursor = next_cursor
+            if _already_restored(change, skip):
+                continue
+            apply_change(change, data_dir=target)
+            replayed += 1
+    return {"snapshot": manifest["id"], "files": len(manifest["files"]), "replayed": replayed,
+            "cursor": cursor, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def _replay_skips(manifest, journal_dir=JOURNAL_DIR) -> dict:
+    """rel -> version, for files copied at a version written after the pinned cursor.
+
+    Changes to those files up to and including that version are already in
+    the copy. Versions only appear between journal_start and journal_end.
+    """
+    wanted = {rel: entry["v"] for rel, entry in manifest["files"].items() if "v" in entry}
+    end = parse_cursor(manifest.get("journal_end") or manifest["journal_start"])
+    skip = {}
+    for cursor, change in read_changes(manifest["journal_start"], None, journal_dir=journal_dir):
+        if parse_cursor(cursor) > end:
+            break
+        rel = change.get("path")
+        if rel in wanted and change.get("v") == wanted[rel]:
+            skip[rel] = wanted[rel]
+    return skip
+
+
+def _already_restored(change, skip) -> bool:
+    """True if the restored copy already holds `change`; updates `skip` as replay moves on."""
+    if not skip:
+        return False
+    rel, op = change.get("path"), change.get("op")
+    if op in ("rmtree", "reset"):
+        # what was copied under this path gets recreated by the changes that follow
+        for other in [r for r in skip if op == "reset" or r == rel or r.startswith(rel + "/")]:
+            del skip[other]
+        return False
+    if rel not in skip or op not in ("put", "patch"):
+        return False
+    if change.get("v") == skip[rel]:
+        del skip[rel]  # the version that was copied; newer changes apply
+    return True
+
+
+def prune_snapshots(keep, dest=SNAPSHOT_DIR, journal=False) -> dict:
+    """Keep the newest `keep` snapshots; drop unreferenced chunks (and older journal segments)."""
+    ids = list_snapshots(dest)
+    drop, kept = ids[:-keep] if keep else ids, ids[-keep:] if keep else []
+    for snap_id in drop:
+        os.remove(os.path.join(dest, "manifests", f"{snap_id}.json"))
+    live = set()
+    for snap_id in kept:
+        for entry in load_manifest(snap_id, dest)["files"].values():
+            live.update(entry["chunks"])
+    removed = 0
+    for root, _dirs, files in os.walk(os.path.join(dest, "chunks")):
+        for name in files:
+            if name.endswith(".z") and name[:-2] not in live:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    segments = 0
+    if journal and kept:
+        first = load_manifest(kept[0], dest).get("journal_start")
+        oldest_needed = parse_cursor(first)[0] if first else 0
+        # the oldest segment left must be a checkpoint, for readers that land on it
+        cut = max((s for s in journal_segments() if s <= oldest_needed and is_checkpoint(s)), default=0)
+        for seg in journal_segments():
+            if seg < cut:
+                os.remove(_segment_path(seg))
+                segments += 1
+    return {"snapshots_removed": len(drop), "chunks_removed": removed, "segments_removed": segments}
+
+
+def _parse_until(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        stamp = datetime.fromisoformat(value)
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=timezone.utc)
+        return stamp.timestamp()
+
+
+snapshot_cli = AppGroup("snapshot", help="Back up and restore the data directory.")
+app.cli.add_command(snapshot_cli)
+
+
+@snapshot_cli.command("create")
+@click.option("--dest", default=SNAPSHOT_DIR, show_default=True)
+def snapshot_create_cmd(dest):
+    """Take an incremental snapshot of data/."""
+    m = create_snapshot(dest)
+    st = m["stats"]
+    click.echo(f"{m['id']}: {st['files']} files, {st['bytes']:,} bytes, "
+               f"{st['new_chunks']}/{st['chunks']} new chunks ({st['new_bytes']:,} bytes) in {st['seconds']}s")
+
+
+@snapshot_cli.command("list")
+@click.option("--dest", default=SNAPSHOT_DIR, show_default=True)
+def snapshot_list_cmd(dest):
+    """List snapshots, oldest first."""
+    for snap_id in list_snapshots(dest):
+        m = load_manifest(snap_id, dest)
+        click.echo(f"{snap_id}  {m['stats']['files']:>5} files  {m['stats']['bytes']:>12,} bytes  "
+                   f"journal {m.get('journal_start')}")
+
+
+@snapshot_cli.command("restore")
+@click.argument("snapshot_id")
+@click.argument("target")
+@click.option("--dest", default=SNAPSHOT_DIR, show_default=True)
+@click.option("--until", help="Replay the journal up to this time (ISO 8601 or epoch seconds).")
+@click.option("--no-replay", is_flag=True, help="Restore the snapshot exactly, without the journal.")
+@click.option("--journal", "journal_dir", default=JOURNAL_DIR, show_default=True)
+def snapshot_restore_cmd(snapshot_id, target, dest, until, no_replay, journal_dir):
+    """Restore SNAPSHOT_ID (or 'latest') into the empty directory TARGET."""
+    try:
+        result = restore_snapshot(snapshot_id, target, dest, _parse_until(until), not no_replay, journal_dir)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restored {result['snapshot']} ({result['files']} files) + {result['replayed']} journal "
+               f"changes up to {result['cursor']} into {target} in {result['seconds']}s")
+
+
+@snapshot_cli.command("prune")
+@click.option("--keep", default=7, show_default=True, type=int)
+@click.option("--dest", default=SNAPSHOT_DIR, show_default=True)
+@click.option("--journal", is_flag=True, help="Also delete journal segments older than the oldest kept snapshot.")
+def snapshot_prune_cmd(keep, dest, journal):
+    """Delete old snapshots and the chunks only they used."""
+    click.echo(prune_snapshots(keep, dest, journal))
+
+# -----------------------------------------------------------------------------
+# Bulk export / import (NDJSON, streamed)
+# -----------------------------------------------------------------------------
+# Exports walk the cached copy of a collection (or one comment/reply page at a
+# time) and yield records one by one. Imports read records one line at a time,
+# validate them and upsert a batch per write, reporting progress as they go.
+IMPORT_BATCH = 500
+_STR, _INT, _LIST = (str,), (int,), (list,)
+# collection -> {field: (types, required)}
+RECORD_SCHEMAS = {
+    "users": {"username": (_STR, True), "name": (_STR, False), "school": (_STR, False),
+              "bio": (_STR, False), "profile_pic": (_STR, False), "role": (_STR, False),
+              "password_hash": (_STR, False), "followers": (_LIST, False), "following": (_LIST, False)},
+    "posts": {"id": (_INT, True), "username": (_STR, True), "caption": (_STR, False),
+              "image": (_STR, True), "comment_count": (_INT, False)},
+    "threads": {"id": (_INT, True), "title": (_STR, True), "body": (_STR, True), "author": (_STR, True),
+                "slug": (_STR, False), "tags": (_LIST, False), "created_ts": (_INT, False),
+                "replies": (_INT, False)},
+    "conferences": {"id": (_INT, True), "name": (_STR, True), "date": (_STR, True),
+                    "location": (_STR, True), "description": (_STR, False), "banner": (_STR, False),
+                    "tags": (_LIST, False)},
+    "comments": {"post_id": (_INT, True), "id": (_INT, True), "username": (_STR, True),
+                 "text": (_STR, True), "ts": (_STR, False)},
+    "replies": {"thread_id": (_INT, True), "id": (_INT, True), "author": (_STR, True),
+                "text": (_STR, True), "created_ts": (_INT, False)},
+}
+# list-shaped collections: file, key field, id sequence
+LIST_COLLECTIONS = {
+    "users": (USERS_FILE, "username", None),
+    "posts": (POSTS_FILE, "id", "posts"),
+    "threads": (FORUM_THREADS, "id", "threads"),
+    "conferences": (CONF_FILE, "id", "conferences"),
+}
+# paged children: pages dir, per page, parent key field, parent file, parent counter
+PAGED_COLLECTIONS = {
+    "comments": (COMMENTS_DIR, COMMENTS_PER_PAGE, "post_id", POSTS_FILE, "comment_count"),
+    "replies": (REPLIES_DIR, REPLIES_PER_PAGE, "thread_id", FORUM_THREADS, "replies"),
+}
+
+
+def export_records(collection, secrets=False):
+    """Lazily yield every record of `collection`."""
+    if collection in LIST_COLLECTIONS:
+        for item in cached_json(LIST_COLLECTIONS[collection][0]):
+            if not isinstance(item, dict):
+                continue
+            if collection == "users" and not secrets:
+                item = {k: v for k, v in item.items() if k != "password_hash"}
+            yield item
+        return
+    base_dir, per_page, parent_key, parent_file, counter = PAGED_COLLECTIONS[collection]
+    for parent in list(cached_json(parent_file, index_by_id).values()):
+        for page in range(1, page_count(parent.get(counter, 0), per_page) + 1):
+            for item in load_page(base_dir, parent.get("id"), page):
+                yield {parent_key: parent.get("id"), **item}
+
+
+def validate_record(collection, record):
+    """Error message for a bad record, or None."""
+    if not isinstance(record, dict):
+        return "not an object"
+    for field, (types, required) in RECORD_SCHEMAS[collection].items():
+        if field not in record:
+            if required:
+                return f"missing {field}"
+        elif not isinstance(record[field], types) or isinstance(record[field], bool):
+            return f"{field} must be {types[0].__name__}"
+    if collection == "users" and record["username"] == DELETED_USER:
+        return f"{DELETED_USER} is reserved"
+    return None
+
+
+def _upsert_list(collection, batch):
+    path, key, sequence = LIST_COLLECTIONS[collection]
+    rejected = []
+    with file_lock(path):
+        items = load_json(path)
+        pos = {item.get(key): i for i, item in enumerate(items)}
+        for record in batch:
+            i = pos.get(record[key])
+            if i is None:
+                if collection == "users" and not record.get("password_hash"):
+                    rejected.append((record[key], "new users need a password_hash"))
+                    continue
+                pos[record[key]] = len(items)
+                items.append(record)
+            else:
+                items[i] = {**items[i], **record}
+        save_json(path, items)
+    if sequence:
+        bump_sequence(sequence, max(r[key] for r in batch))
+    return rejected
+
+
+def _upsert_paged(collection, batch):
+    base_dir, per_page, parent_key, parent_file, counter = PAGED_COLLECTIONS[collection]
+    rejected = []
+    by_page = {}
+    with file_lock(parent_file):
+        parents = load_json(parent_file)
+        by_id = index_by_id(parents)
+        for record in batch:
+            parent = by_id.get(record[parent_key])
+            if parent is None:
+                rejected.append((record["id"], f"unknown {parent_key}"))
+                continue
+            item = {k: v for k, v in record.items() if k != parent_key}
+            page = (item["id"] - 1) // per_page + 1
+            by_page.setdefault((parent["id"], page), []).append(item)
+            parent[counter] = max(int(parent.get(counter, 0)), item["id"])
+        for (pid, page), items in by_page.items():
+            path = page_path(base_dir, pid, page)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            merged = {c.get("id"): c for c in load_json(path)}
+            merged.update({c["id"]: c for c in items})
+            save_json(path, sorted(merged.values(), key=lambda c: c.get("id", 0)))
+        save_json(parent_file, parents)
+    return rejected
+
+
+def import_records(collection, lines, batch_size=IMPORT_BATCH):
+    """Upsert NDJSON `lines` into `collection`; yields a progress dict per batch."""
+    upsert = _upsert_list if collection in LIST_COLLECTIONS else _upsert_paged
+    totals = {"collection": collection, "read": 0, "upserted": 0, "rejected": 0, "batches": 0}
+
+    def flush(batch, errors):
+        rejected = upsert(collection, batch) if batch else []
+        errors.extend(f"{key}: {why}" for key, why in rejected)
+        totals["batches"] += 1
+        totals["upserted"] += len(batch) - len(rejected)
+        totals["rejected"] += len(errors)
+        return {**totals, "errors": errors[:20]}
+
+    batch, errors = [], []
+    for n, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        totals["read"] += 1
+        try:
+            record = loads_json(line)
+        except ValueError:
+            record = None
+        problem = validate_record(collection, record) if record is not None else "invalid JSON"
+        if problem:
+            errors.append(f"line {n}: {problem}")
+        else:
+            batch.append(record)
+        if len(batch) >= batch_size:
+            yield flush(batch, errors)
+            batch, errors = [], []
+    if batch or errors or not totals["batches"]:
+        yield flush(batch, errors)
+    if collection in ("posts", "threads", "conferences"):
+        rebuild_tag_index()
+    if collection in ("posts", "comments", "threads", "replies"):
+        rebuild_mention_index()
+    if collection in ("comments", "threads", "replies"):
+        rebuild_authored_index()
+
+
+data_cli = AppGroup("data", help="Stream collections in and out as NDJSON.")
+app.cli.add_command(data_cli)
+
+
+@data_cli.command("export")
+@click.argument("collection", type=click.Choice(sorted(RECORD_SCHEMAS)))
+@click.option("-o", "--output", type=click.File("wb"), default="-")
+@click.option("--secrets", is_flag=True, help="Include password hashes (users).")
+def data_export_cmd(collection, output, secrets):
+    """Write COLLECTION as NDJSON (stdout by default)."""
+    n = 0
+    for record in export_records(collection, secrets):
+        output.write(dumps_json(record) + b"\n")
+        n += 1
+    click.echo(f"exported {n} {collection}", err=True)
+
+
+@data_cli.command("import")
+@click.argument("collection", type=click.Choice(sorted(RECORD_SCHEMAS)))
+@click.argument("source", type=click.File("rb"), default="-")
+@click.option("--batch", "batch_size", default=IMPORT_BATCH, show_default=True)
+def data_import_cmd(collection, source, batch_size):
+    """Upsert NDJSON records from SOURCE (stdin by default) into COLLECTION."""
+    startup()
+    for progress in import_records(collection, source, batch_size):
+        click.echo(f"batch {progress['batches']}: read {progress['read']}, "
+                   f"upserted {progress['upserted']}, rejected {progress['rejected']}", err=True)
+        for err in progress["errors"]:
+            click.echo(f"  {err}", err=True)
+
+# -----------------------------------------------------------------------------
+# Integrity checks (flask fsck)
+# -----------------------------------------------------------------------------
+# Nothing enforces the references between collections (likes and comments name
+# users, replies name threads, records name image files), so crashes and racing
+# writers can leave them dangling and let counters drift. fsck walks the data a
+# file or page at a time, keeping only names, ids and counters in memory, and
+# yields one finding per problem. With repair=True fixable findings are applied first, batch_size
+# at a time with one locked rewrite per file, and only if the value it saw is
+# still there.
+FSCK_BATCH = 200
+# files every other check reads whole; if one of these is corrupt fsck stops
+FSCK_CORE = (USERS_FILE, POSTS_FILE, FORUM_THREADS, CONF_FILE, CONF_PENDING_FILE,
+             LIKES_FILE, ATTENDANCE_FILE)
+# paged children: pages dir, parent file, parent counter, author field,
+# parent id field, mention ref prefix
+FSCK_PAGED = {
+    "comments": (COMMENTS_DIR, POSTS_FILE, "comment_count", "username", None, "post"),
+    "replies": (REPLIES_DIR, FORUM_THREADS, "replies", "author", "thread_id", "thread"),
+}
+
+
+def _finding(check, where, problem, fix=None):
+    return {"check": check, "where": where, "problem": problem,
+            "fixable": fix is not None, "fixed": False}, fix
+
+
+def _numbered(path):
+    """Numeric names in a directory, ascending (page files and parent dirs)."""
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    out = []
+    for name in names:
+        stem = name[:-5] if name.endswith(".json") else name
+        if stem.isdigit():
+            out.append(int(stem))
+    return sorted(out)
+
+
+def _fsck_walk(path):
+    """Records of a list-shaped file, for one pass that keeps only what it needs."""
+    for item in load_json(path):
+        if isinstance(item, dict):
+            yield item
+
+
+def _fsck_users(names):
+    """Follow lists: unknown or repeated names, and one-sided edges.
+
+    `following` is what users chose, so `followers` is rebuilt from it. Two
+    passes over users.json; only the follow edges are held in between.
+    """
+    expected = {}
+    for u in _fsck_walk(USERS_FILE):
+        me, raw = u.get("username"), u.get("following")
+        clean = list(dict.fromkeys(x for x in raw or () if x in names and x != me))
+        for other in clean:
+            expected.setdefault(other, set()).add(me)
+        if clean != (raw or []):
+            yield _finding("follows", f"@{me}.following", f"{len(raw) - len(clean)} unknown or repeated",
+                           ("field", USERS_FILE, "username", me, "following", raw, clean))
+    for u in _fsck_walk(USERS_FILE):
+        me, raw = u.get("username"), u.get("followers")
+        want = expected.get(me, set())
+        clean = [x for x in dict.fromkeys(raw or ()) if x in want]
+        clean += sorted(want.difference(clean))
+        if clean != (raw or []):
+            yield _finding("follows", f"@{me}.followers", f"{len(raw or ())} listed, {len(want)} actually follow",
+                           ("field", USERS_FILE, "username", me, "followers", raw, clean))
+
+
+def _fsck_members(path, check, item_ids, names):
+    """Membership store entries naming deleted items or users."""
+    raw = load_json(path)
+    unknown_users = set()
+    for key, members in (raw.items() if isinstance(raw, dict) else ()):
+        try:
+            item_id = int(key)
+        except (ValueError, TypeError):
+            item_id = key  # never loaded; any rewrite of the store drops it
+        if item_id not in item_ids:
+            yield _finding(check, f"{os.path.basename(path)}[{key}]", "item no longer exists",
+                           ("members", path, item_id, None))
+            continue
+        unknown_users.update(x for x in members or () if x not in names)
+    for uname in sorted(unknown_users):
+        yield _finding(check, f"{os.path.basename(path)} @{uname}", "user no longer exists",
+                       ("members", path, None, uname))
+
+
+def _fsck_pages(kind, counters, names, corrupt):
+    """Orphaned page dirs, unknown authors, wrong parent ids and counter drift.
+
+    `counters` maps each parent id to its counter. Entries by unknown users
+    are blanked rather than removed (see blank_entry), so repairs never move
+    an entry off its page or change a count.
+    """
+    base_dir, parent_file, counter, author, parent_field, _prefix = FSCK_PAGED[kind]
+    for key in _numbered(base_dir):
+        if key not in counters:
+            yield _finding(kind, f"{kind}/{key}", "parent no longer exists",
+                           ("rmtree", base_dir, parent_file, key))
+            continue
+        top = 0
+        for page in _numbered(os.path.join(base_dir, str(key))):
+            path = page_path(base_dir, key, page)
+            if path in corrupt:
+                continue
+            blank, retarget = {}, False
+            for item in load_json(path):
+                top = max(top, int(item.get("id", 0) or 0))
+                if item.get(author) not in names:
+                    blank[item.get("id")] = item.get(author)
+                if parent_field and item.get(parent_field) != key:
+                    retarget = True
+            if blank or retarget:
+                problem = ", ".join(filter(None, [
+                    blank and f"{len(blank)} by unknown users",
+                    retarget and f"entries with the wrong {parent_field}",
+                ]))
+                yield _finding(kind, f"{kind}/{key}/{page}.json", problem,
+                               ("page", base_dir, kind, key, page, blank))
+        # the counter is also the id sequence: behind the newest entry means reused ids
+        seen = counters[key]
+        if (seen or 0) < top:
+            yield _finding(kind, f"#{key}.{counter}", f"is {seen or 0}, newest entry is {top}",
+                           ("field", parent_file, "id", key, counter, seen, top))
+
+
+def _fsck_posts(names, corrupt):
+    """Posts whose owner is gone, then their likes and comments."""
+    counters = {}
+    for p in _fsck_walk(POSTS_FILE):
+        counters[p.get("id")] = p.get("comment_count")
+        if p.get("username") not in names:
+            yield _finding("posts", f"post #{p.get('id')}", f"owner @{p.get('username')} no longer exists")
+    yield from _fsck_members(LIKES_FILE, "likes", set(counters), names)
+    yield from _fsck_pages("comments", counters, names, corrupt)
+
+
+def _fsck_images():
+    """Records pointing at image files that aren't on disk."""
+    def missing(rel):
+        return bool(rel) and not os.path.isfile(os.path.join(app.static_folder, rel))
+
+    default_pic = "img/users/default.png"
+    for u in _fsck_walk(USERS_FILE):
+        pic = u.get("profile_pic")
+        if pic != default_pic and missing(pic):
+            yield _finding("images", f"@{u.get('username')}.profile_pic", f"{pic} is missing",
+                           ("field", USERS_FILE, "username", u.get("username"), "profile_pic", pic, default_pic))
+    for label, path, field in (("post", POSTS_FILE, "image"), ("conference", CONF_FILE, "banner"),
+                               ("pending", CONF_PENDING_FILE, "banner")):
+        for item in _fsck_walk(path):
+            if missing(item.get(field)):
+                yield _finding("images", f"{label} #{item.get('id')}.{field}", f"{item.get(field)} is missing")
+
+
+def _fsck_apply(fixes):
+    """Apply one batch of fixes, one locked rewrite per file."""
+    applied, refs = set(), []
+    by_file = {}
+    for i, fix in enumerate(fixes):
+        by_file.setdefault((fix[0], fix[1]), []).append((i, fix))
+    for (kind, path), group in by_file.items():
+        if kind == "field":
+            with file_lock(path):
+                items = load_json(path)
+                key_field = group[0][1][2]
+                index = {item.get(key_field): item for item in items if isinstance(item, dict)}
+                for i, (_k, _p, _key_field, key, field, old, new) in group:
+                    item = index.get(key)
+                    if item is not None and item.get(field) == old:
+                        item[field] = new
+                        applied.add(i)
+                save_json(path, items)
+        elif kind == "members":
+            drop_membership(path, item_ids=[f[2] for _i, f in group if f[2] is not None],
+                            usernames=[f[3] for _i, f in group if f[3] is not None])
+            applied.update(i for i, _f in group)
+        elif kind == "rmtree":
+            for i, (_k, _p, parent_file, key) in group:
+                with file_lock(parent_file):
+                    if key not in index_by_id(load_json(parent_file)):
+                        drop_paged(path, key)
+                        applied.add(i)
+        else:
+            for i, (_k, _p, paged, key, page, blank) in group:
+                _dir, parent_file, _counter, author, parent_field, prefix = FSCK_PAGED[paged]
+                page_file = page_path(path, key, page)
+                with file_lock(parent_file):
+                    items = load_json(page_file)
+                    for j, c in enumerate(items):
+                        if c.get("id") in blank and c.get(author) == blank[c.get("id")]:
+                            refs.append(f"{prefix}:{key}:{c.get('id')}")
+                            items[j] = c = blank_entry(c, author)
+                        if parent_field:
+                            c[parent_field] = key
+                    if items:
+                        save_json(page_file, items)
+                    applied.add(i)
+    update_mentions(refs=refs)
+    return applied
+
+
+def _fsck_batches(findings, repair, batch_size):
+    batch = []
+    for finding in findings:
+        batch.append(finding)
+        if len(batch) >= batch_size:
+            yield from _fsck_flush(batch, repair)
+            batch = []
+    yield from _fsck_flush(batch, repair)
+
+
+def _fsck_flush(batch, repair):
+    fixable = [(report, fix) for report, fix in batch if fix is not None]
+    if repair and fixable:
+        for i in _fsck_apply([fix for _report, fix in fixable]):
+            fixable[i][0]["fixed"] = True
+    for report, _fix in batch:
+        yield report
+
+
+def fsck(repair=False, batch_size=FSCK_BATCH):
+    """Check every data file and cross-reference; yields one finding dict per problem."""
+    corrupt = set()
+    for rel, path in _data_files():
+        if not rel.endswith((".json", ".ndjson")):
+            continue
+        try:
+            if rel.endswith(".ndjson"):
+                for _record in iter_records(path):
+                    pass
+            else:
+                load_json(path)
+        except CorruptDataFile as e:
+            corrupt.add(path)
+            yield _finding("corrupt", rel, f"does not decode ({e.__cause__}); restore it from a snapshot")[0]
+    if corrupt.intersection(FSCK_CORE):
+        return  # every other check needs these; fix them first
+
+    names = {u.get("username") for u in _fsck_walk(USERS_FILE)} | {DELETED_USER}
+
+    def findings():
+        yield from _fsck_users(names)
+        yield from _fsck_posts(names, corrupt)
+        conf_ids = {c.get("id") for c in _fsck_walk(CONF_FILE)}
+        yield from _fsck_members(ATTENDANCE_FILE, "attendance", conf_ids, names)
+        threads = {t.get("id"): t.get("replies") for t in _fsck_walk(FORUM_THREADS)}
+        yield from _fsck_pages("replies", threads, names, corrupt)
+        yield from _fsck_images()
+
+    yield from _fsck_batches(findings(), repair, batch_size)
+
+
+@app.cli.command("fsck")
+@click.option("--repair", is_flag=True, help="Fix what can be fixed safely.")
+@click.option("--batch", "batch_size", default=FSCK_BATCH, show_default=True)
+def fsck_cmd(repair, batch_size):
+    """Report dangling references, counter drift and corrupt files."""
+    if repair and ROLE == "replica":
+        raise click.UsageError("repairs have to run on the primary")
+    problems = fixed = 0
+    for finding in fsck(repair, batch_size):
+        problems += 1
+        fixed += finding["fixed"]
+        state = "fixed" if finding["fixed"] else "fixable" if finding["fixable"] else "manual"
+        click.echo(f"[{state}] {finding['check']}: {finding['where']}: {finding['problem']}")
+    click.echo(f"{problems} problem(s), {fixed} fixed", err=True)
+    if problems > fixed:
+        raise SystemExit(1)
+
+# -----------------------------------------------------------------------------
+# Legacy data migrations (cheap no-ops once the data is in the new layout)
+# -----------------------------------------------------------------------------
+def migrate_inline_comments():
+    """Move comments embedded in posts.json into the paged comment store."""
+    posts = load_json(POSTS_FILE)
+    moved = False
+    for p in posts:
+        if "comments" not in p:
+            continue
+        comments = p.pop("comments") or []
+        save_paged(COMMENTS_DIR, p.get("id"), comments, COMMENTS_PER_PAGE)
+        p["comment_count"] = len(comments)
+        moved = True
+    if moved:
+        save_posts(posts)
+
+
+def migrate_inline_likes():
+    """Move `liked_by` lists out of posts.json into the like index.
+
+    Also drops stored `likes` counters, which older code wrote back with
+    the post and which go stale as soon as the like store changes.
+    """
+    posts = load_json(POSTS_FILE)
+    legacy = {p.get("id"): p.pop("liked_by") for p in posts if "liked_by" in p}
+    stale = [p.pop("likes") for p in posts if "likes" in p]
+    if not legacy and not stale:
+        return
+    if legacy:
+        with file_lock(LIKES_FILE):
+            idx = membership(LIKES_FILE)
+            for pid, users in legacy.items():
+                for uname in users or []:
+                    idx["by_item"].setdefault(pid, set()).add(uname)
+                    idx["by_user"].setdefault(uname, set()).add(pid)
+            _save_membership(LIKES_FILE, idx)
+    save_posts(posts)
+
+
+def migrate_user_attendance():
+    """Fold users' attendingConferences lists into the attendance store."""
+    users = load_json(USERS_FILE)
+    legacy = {u.get("username"): u.pop("attendingConferences") for u in users
+              if "attendingConferences" in u}
+    if not legacy:
+        return
+    with file_lock(ATTENDANCE_FILE):
+        idx = membership(ATTENDANCE_FILE)
+        for uname, conf_ids in legacy.items():
+            for cid in conf_ids or []:
+                try:
+                    cid = int(cid)
+                except (ValueError, TypeError):
+                    continue
+                idx["by_item"].setdefault(cid, set()).add(uname)
+                idx["by_user"].setdefault(uname, set()).add(cid)
+        _save_membership(ATTENDANCE_FILE, idx)
+    save_json(USERS_FILE, users)
+
+
+def migrate_global_replies():
+    """Split the legacy global forum_replies.json into per-thread pages."""
+    legacy = load_json(FORUM_REPLIES)
+    if not legacy:
+        return
+    by_thread = {}
+    for r in sorted(legacy, key=lambda r: r.get("created_ts", 0)):
+        by_thread.setdefault(r.get("thread_id"), []).append(r)
+    with file_lock(FORUM_THREADS):
+        threads = load_json(FORUM_THREADS)
+        for t in threads:
+            replies = by_thread.get(t.get("id"), [])
+            for seq, r in enumerate(replies, 1):
+                r["id"] = seq
+            save_paged(REPLIES_DIR, t.get("id"), replies, REPLIES_PER_PAGE)
+            t["replies"] = len(replies)
+        save_json(FORUM_THREADS, threads)
+    save_json(FORUM_REPLIES, [])
+
+
+def migrate_notifications():
+    """Replay admin_notifications.json into the append-only log (oldest first)."""
+    legacy = load_json(NOTIFS_FILE)
+    if not legacy:
+        return
+    for n in sorted(legacy, key=lambda n: (n.get("ts", 0), n.get("id", 0))):
+        add_notification(n.get("kind"), n.get("payload") or {})
+    save_json(NOTIFS_FILE, [])
+
+
+def migrate_thread_views():
+    """Fold the old per-GET `views` counters of threads into the raw hit counts.
+
+    They counted reloads and bots alike, so they can't seed unique viewers.
+    """
+    with file_lock(FORUM_THREADS):
+        threads = load_json(FORUM_THREADS)
+        legacy = {str(t.get("id")): t.pop("views") for t in threads if "views" in t}
+        if not legacy:
+            return
+        os.makedirs(VIEWS_DIR, exist_ok=True)
+        with file_lock(views_path("threads")):
+            stats = build_view_stats(load_json(views_path("threads")))
+            for key, hits in legacy.items():
+                row = stats.setdefault(key, {"views": 0, "hits": 0, "bots": 0})
+                row["hits"] = row.get("hits", 0) + int(hits or 0)
+            save_json(views_path("threads"), stats)
+        save_json(FORUM_THREADS, threads)
+
+
+def migrate_media_catalog():
+    """Catalog files uploaded before the media catalog existed (runs once)."""
+    if os.path.exists(MEDIA_FILE):
+        return
+    refs, owners = {}, {}
+    for p in load_json(POSTS_FILE):
+        refs.setdefault(p.get("image"), []).append(f"post:{p.get('id')}")
+        owners.setdefault(p.get("image"), p.get("username"))
+    for u in load_json(USERS_FILE):
+        refs.setdefault(u.get("profile_pic"), []).append(f"user:{u.get('username')}")
+        owners.setdefault(u.get("profile_pic"), u.get("username"))
+    for c in load_json(CONF_FILE):
+        refs.setdefault(c.get("banner"), []).append(f"conf:{c.get('id')}")
+    for c in load_json(CONF_PENDING_FILE):
+        refs.setdefault(c.get("banner"), []).append(f"pending:{c.get('id')}")
+        owners.setdefault(c.get("banner"), c.get("submitted_by"))
+    now = int(time.time())
+    catalog = {}
+    for kind, folder in MEDIA_DIRS.items():
+        for entry in os.scandir(folder):
+            rel = _media_rel(entry.path)
+            if not entry.is_file() or not allowed_file(entry.name) or rel in MEDIA_PROTECTED:
+                continue
+            digest = hashlib.sha256()
+            with open(entry.path, "rb") as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b""):
+                    digest.update(chunk)
+            used_by = refs.get(rel, [])
+            catalog[rel] = {"kind": kind, "owner": owners.get(rel), "size": entry.stat().st_size,
+                            "sha256": digest.hexdigest(), "refs": used_by,
+                            "ts": int(entry.stat().st_mtime), "orphaned": None if used_by else now}
+    with file_lock(MEDIA_FILE):
+        _save_media(catalog)
+
+
+# -----------------------------------------------------------------------------
+# Startup (directories + migrations), run once before the first request
+# -----------------------------------------------------------------------------
+# Kept out of module import so build steps and CLI commands can import the app
+# without touching data/. A preloading gunicorn master runs it once (through
+# warm_caches) and workers inherit the flag; otherwise the first request does.
+_started = False
+_startup_lock = threading.Lock()
+
+
+def startup():
+    global _started
+    if _started:
+        return
+    with _startup_lock:
+        if _started:
+            return
+        t0 = time.perf_counter()
+        for d in (DATA_DIR, RUNTIME_DIR, COMMENTS_DIR, REPLIES_DIR, VIEWS_DIR,
+                  POST_UPLOAD_DIR, USER_UPLOAD_DIR, CONF_UPLOAD_DIR, PENDING_UPLOAD_DIR):
+            os.makedirs(d, exist_ok=True)
+        if ROLE == "replica":
+            # the primary migrates; its change feed brings the results here
+            _started = True
+            BOOT_TIMES["startup"] = round(time.perf_counter() - t0, 3)
+            return
+        # workers started without preload race here; one migrates, the rest no-op
+        with file_lock(os.path.join(DATA_DIR, "startup")):
+            journal_baseline()
+            migrate_inline_comments()
+            migrate_inline_likes()
+            migrate_global_replies()
+            migrate_user_attendance()
+            migrate_media_catalog()
+            migrate_notifications()
+            migrate_thread_views()
+            # built from the data once, including for kinds added by a later deploy
+            if not os.path.exists(TAG_INDEX_FILE) or set(TAG_KINDS) - set(load_json(TAG_INDEX_FILE)):
+                rebuild_tag_index()
+            if not os.path.isdir(MENTIONS_DIR):
+                rebuild_mention_index()
+            if not os.path.isdir(AUTHORED_DIR):
+                rebuild_authored_index()
+        BOOT_TIMES["startup"] = round(time.perf_counter() - t0, 3)
+        app.logger.info(f"Startup finished in {BOOT_TIMES['startup']}s")
+        _started = True
+
+
+@app.before_request
+def ensure_started():
+    if not _started:
+        startup()
+
+# -----------------------------------------------------------------------------
+# Password hashing (bounded executor) + login throttling
+# -----------------------------------------------------------------------------
+# Hashes are deliberately slow. They run on a small per-worker pool (hashlib
+# releases the GIL, so other request threads keep serving) and a worker
+# refuses new hashes once HASH_MAX_QUEUE are waiting instead of piling up.
+PASSWORD_METHOD = os.environ.get("MUNIVERSE_PASSWORD_METHOD", "scrypt")
+HASH_THREADS    = int(os.environ.get("MUNIVERSE_HASH_THREADS", "2"))
+HASH_MAX_QUEUE  = int(os.environ.get("MUNIVERSE_HASH_MAX_QUEUE", "8"))
+
+
+class HashQueueFull(Exception):
+    """This worker already has HASH_MAX_QUEUE password hashes waiting."""
+
+
+_hash_pool = {"pid": None, "executor": None, "slots": None}
+_hash_pool_lock = threading.Lock()
+
+
+def _hash_executor():
+    with _hash_pool_lock:
+        if _hash_pool["pid"] != os.getpid():  # pools don't survive fork
+            _hash_pool.update(
+                pid=os.getpid(),
+                executor=ThreadPoolExecutor(HASH_THREADS, thread_name_prefix="pwhash"),
+                slots=threading.BoundedSemaphore(HASH_THREADS + HASH_MAX_QUEUE),
+            )
+        return _hash_pool["executor"], _hash_pool["slots"]
+
+
+def _run_hash(fn, *args):
+    executor, slots = _hash_executor()
+    if not slots.acquire(blocking=False):
+        raise HashQueueFull()
+    future = executor.submit(fn, *args)
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+def hash_password(password: str) -> str:
+    return _run_hash(generate_password_hash, password, PASSWORD_METHOD)
+
+
+def verify_password(pwhash: str, password: str) -> bool:
+    return bool(pwhash) and _run_hash(check_password_hash, pwhash, password)
+
+
+@functools.lru_cache(maxsize=1)
+def _hash_params() -> str:
+    return generate_password_hash("", PASSWORD_METHOD).split("$", 1)[0]
+
+
+def needs_rehash(pwhash: str) -> bool:
+    """True when a stored hash was made with other method/cost parameters."""
+    return pwhash.split("$", 1)[0] != _hash_params()
+
+
+# Token buckets live in a fixed-size mmap'd table in RUNTIME_DIR, so every
+# worker on the host shares them. Slots are found by hashing the key and
+# probing a few neighbours; the stalest probed slot is reused when all are taken.
+THROTTLE_FILE  = os.path.join(RUNTIME_DIR, "throttle.bin")
+THROTTLE_SLOTS = 4096
+THROTTLE_PROBE = 8
+_BUCKET = struct.Struct("<Qdd")  # key hash, tokens, last update
+# rule -> (burst capacity, tokens refilled per second)
+THROTTLE_RULES = {
+    "login-ip": (20, 20 / 60),
+    "login-user": (10, 10 / 300),
+    "signup-ip": (5, 5 / 600),
+    "events-ip": (30, 30 / 60),
+}
+
+_throttle = {"pid": None, "fd": None, "map": None}
+_throttle_lock = threading.Lock()
+
+
+def _throttle_table():
+    if _throttle["pid"] != os.getpid():  # flock needs our own descriptor
+        size = THROTTLE_SLOTS * _BUCKET.size
+        fd = os.open(THROTTLE_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        _throttle.update(pid=os.getpid(), fd=fd, map=mmap.mmap(fd, size))
+    return _throttle["fd"], _throttle["map"]
+
+
+def take_token(rule: str, key: str) -> float:
+    """Spend one token from key's bucket.
+
+    Returns 0 when allowed, otherwise the seconds until a token frees up.
+    """
+    capacity, rate = THROTTLE_RULES[rule]
+    digest = hashlib.blake2b(f"{rule}|{key}".encode("utf-8"), digest_size=8).digest()
+    khash = int.from_bytes(digest, "little") or 1
+    now = time.time()
+    try:
+        with _throttle_lock:
+            fd, table = _throttle_table()
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                slot, tokens = None, float(capacity)
+                stalest = None
+                for i in range(THROTTLE_PROBE):
+                    off = ((khash + i) % THROTTLE_SLOTS) * _BUCKET.size
+                    h, t, last = _BUCKET.unpack_from(table, off)
+                    if h == khash:
+                        slot, tokens = off, min(capacity, t + (now - last) * rate)
+                        break
+                    if stalest is None or last < stalest[1]:
+                        stalest = (off, last)
+                if slot is None:
+                    slot = stalest[0]
+                if tokens < 1:
+                    _BUCKET.pack_into(table, slot, khash, tokens, now)
+                    return (1 - tokens) / rate
+                _BUCKET.pack_into(table, slot, khash, tokens - 1, now)
+                return 0.0
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+    except OSError as e:  # never lock people out because /dev/shm misbehaves
+        app.logger.warning(f"Throttle unavailable: {e}")
+        return 0.0
+
+
+def too_many_requests(wait: float, body="Too many attempts. Please try again shortly.", status=429):
+    resp = make_response(body, status)
+    resp.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+    return resp
+
 # -----------------------------------------------------------------------------
 # Auth helpers
 # -----------------------------------------------------------------------------
@@ -191,9 +3118,25 @@ def is_admin_verified() -> bool:
     return bool(u and u.get("role") == "admin" and session.get("admin_verified") is True)
 
 
-@app.context_processor
-def inject_user():
-    return {"current_user": get_current_user()}
+@app.context_processor
+def inject_user():
+    return {"current_user": get_current_user()}
+
+
+RICHTEXT_RE = re.compile(f"{HASHTAG_RE.pattern}|{MENTION_RE.pattern}")
+
+
+@app.template_filter("richtext")
+def richtext(text):
+    """Escape user text and link its #hashtags and @mentions."""
+    def link(m):
+        if m.group(1):
+            return f'<a href="{url_for("tag_page", name=norm_tag(m.group(1)))}">#{m.group(1)}</a>'
+        name = m.group(2).rstrip(".-")
+        if not name:
+            return m.group(0)
+        return f'<a href="{url_for("profile", username=name)}">@{name}</a>{m.group(2)[len(name):]}'
+    return Markup(RICHTEXT_RE.sub(link, str(escape(text or ""))))
 
 # -----------------------------------------------------------------------------
 # Insights helper for Admin
@@ -217,7 +3160,7 @@ def build_insights(users, posts, limit=10):
         p = normalize_post(p)
         likes = int(p.get("likes", 0))
         total_likes += likes
-        total_comments += len(p.get("comments", []))
+        total_comments += int(p.get("comment_count", 0))
         uname = p.get("username")
         if uname in by_user:
             by_user[uname]["likes"] += likes
@@ -243,14 +3186,13 @@ def build_insights(users, posts, limit=10):
             "followers": u.get("followers", []),
             "following": u.get("following", [])
         })
-    top_users.sort(key=lambda x: x["likes"], reverse=True)
-    top_users = top_users[:limit]
+    top_users = heapq.nlargest(limit, top_users, key=lambda x: x["likes"])
 
-    top_posts = sorted(
-        [normalize_post(p) for p in posts],
-        key=lambda x: x.get("likes", 0),
-        reverse=True
-    )[:limit]
+    top_posts = heapq.nlargest(
+        limit,
+        (normalize_post(p) for p in posts),
+        key=lambda x: x.get("likes", 0)
+    )
 
     stats = {
         "total_users": len(users),
@@ -286,6 +3228,434 @@ def add_global_headers(response):
     )
     return response
 
+# -----------------------------------------------------------------------------
+# View counting (unique viewers via HyperLogLog, raw hits, bots)
+# -----------------------------------------------------------------------------
+# Each worker counts post/thread views in memory and merges them into
+# data/views/<kind>.json every VIEWS_FLUSH_SECONDS. Hits add up, and unique
+# viewers are HyperLogLog sketches (HLL_M one-byte registers, ~3% error) that
+# merge by keeping the larger register, so workers never double count a
+# viewer. Sketches are stored sparse until they fill up (at most ~1.4 KB).
+HLL_P = 10
+HLL_M = 1 << HLL_P
+_HLL_ALPHA = 0.7213 / (1 + 1.079 / HLL_M)
+_HLL_SPARSE = struct.Struct("<HB")  # register index, value
+# kind -> (endpoint, how to find the item id from the view args)
+VIEW_ENDPOINTS = {
+    "post": ("posts", lambda args: args.get("post_id")),
+    "forum_thread": ("threads", lambda args: (find_thread(cached_json(FORUM_THREADS), args.get("slug")) or {}).get("id")),
+}
+BOT_UA_RE = re.compile(
+    r"bot|crawl|spider|slurp|archiver|facebookexternalhit|embedly|preview|monitor|"
+    r"curl|wget|python-|httpclient|okhttp|go-http|headless|lighthouse", re.I)
+
+# (kind, id) -> [hits, bot hits, registers, trending delta from new viewers or None]
+_views_pending = {}
+_views_lock = threading.Lock()
+_views_pid = None
+
+
+def views_path(kind):
+    return os.path.join(VIEWS_DIR, f"{kind}.json")
+
+
+def build_view_stats(raw) -> dict:
+    return raw if isinstance(raw, dict) else {}
+
+
+def hll_decode(text) -> bytearray:
+    regs = bytearray(HLL_M)
+    if text:
+        raw = base64.b64decode(text[1:])
+        if text[0] == "d":
+            regs[:] = raw
+        else:
+            for i, r in _HLL_SPARSE.iter_unpack(raw):
+                regs[i] = r
+    return regs
+
+
+def hll_encode(regs) -> str:
+    used = [(i, r) for i, r in enumerate(regs) if r]
+    if len(used) * _HLL_SPARSE.size < HLL_M:
+        return "s" + base64.b64encode(b"".join(_HLL_SPARSE.pack(i, r) for i, r in used)).decode("ascii")
+    return "d" + base64.b64encode(bytes(regs)).decode("ascii")
+
+
+def hll_add(regs, digest: bytes) -> bool:
+    """Fold one 64-bit hash into the sketch; True if a register grew."""
+    h = int.from_bytes(digest, "big")
+    idx, rest = h >> (64 - HLL_P), h & ((1 << (64 - HLL_P)) - 1)
+    rank = (64 - HLL_P) - rest.bit_length() + 1
+    if rank > regs[idx]:
+        regs[idx] = rank
+        return True
+    return False
+
+
+def hll_count(regs) -> int:
+    est = _HLL_ALPHA * HLL_M * HLL_M / sum(2.0 ** -r for r in regs)
+    zeros = regs.count(0)
+    if est <= 2.5 * HLL_M and zeros:
+        est = HLL_M * math.log(HLL_M / zeros)  # linear counting for small sets
+    return round(est)
+
+
+def _viewer_digest() -> bytes:
+    """Keyed hash of who is looking: the account, else IP + user agent."""
+    uname = session.get("username")
+    who = f"u:{uname}" if uname else f"a:{request.remote_addr}|{request.user_agent.string}"
+    salt = hashlib.sha256(str(app.secret_key).encode("utf-8")).digest()[:32]
+    return hashlib.blake2b(who.encode("utf-8"), digest_size=8, key=salt).digest()
+
+
+def record_view(kind, item_id) -> bool:
+    """Count one view of an item; True if it (probably) came from a new viewer."""
+    _start_view_flusher()
+    agent = request.user_agent.string or ""
+    with _views_lock:
+        entry = _views_pending.get((kind, item_id))
+        if entry is None:
+            # start from the stored sketch so returning viewers aren't "new"
+            row = cached_json(views_path(kind), build_view_stats).get(str(item_id)) or {}
+            entry = _views_pending[(kind, item_id)] = [0, 0, hll_decode(row.get("hll")), None]
+        if not agent or BOT_UA_RE.search(agent):
+            entry[1] += 1
+            return False
+        entry[0] += 1
+        if not hll_add(entry[2], _viewer_digest()):
+            return False
+        # new viewers reach trending at the next flush, not one board write each
+        delta = trending_delta("view")
+        entry[3] = delta if entry[3] is None else _logaddexp(entry[3], delta)
+        return True
+
+
+def flush_views() -> int:
+    """Merge this worker's pending counts into the view files and trending; returns items flushed."""
+    with _views_lock:
+        pending = dict(_views_pending)
+        _views_pending.clear()
+    by_kind = {}
+    for (kind, item_id), entry in pending.items():
+        by_kind.setdefault(kind, {})[str(item_id)] = entry
+    for kind, entries in by_kind.items():
+        path = views_path(kind)
+        os.makedirs(VIEWS_DIR, exist_ok=True)
+        with file_lock(path):
+            stats = build_view_stats(load_json(path))
+            for key, (hits, bots, regs, _delta) in entries.items():
+                row = stats.setdefault(key, {"views": 0, "hits": 0, "bots": 0})
+                row["hits"] = row.get("hits", 0) + hits
+                row["bots"] = row.get("bots", 0) + bots
+                if hits:
+                    merged = bytearray(map(max, hll_decode(row.get("hll")), regs))
+                    row["hll"] = hll_encode(merged)
+                    row["views"] = hll_count(merged)
+            save_json(path, stats)
+            cache_put(path, build_view_stats, stats)
+    fold_trending({key: entry[3] for key, entry in pending.items() if entry[3] is not None})
+    return len(pending)
+
+
+def view_stats(kind, item_id) -> dict:
+    """{"views": unique viewers, "hits": human hits, "bots": bot hits} as last flushed."""
+    row = cached_json(views_path(kind), build_view_stats).get(str(item_id)) or {}
+    return {"views": row.get("views", 0), "hits": row.get("hits", 0), "bots": row.get("bots", 0)}
+
+
+def drop_views(kind, item_ids):
+    item_ids = {str(i) for i in item_ids}
+    path = views_path(kind)
+    if not item_ids or not os.path.exists(path):
+        return
+    with file_lock(path):
+        stats = build_view_stats(load_json(path))
+        if item_ids & set(stats):
+            for key in item_ids:
+                stats.pop(key, None)
+            save_json(path, stats)
+            cache_put(path, build_view_stats, stats)
+
+
+def _flush_views_forever():
+    while True:
+        time.sleep(VIEWS_FLUSH_SECONDS)
+        try:
+            flush_views()
+        except Exception as e:
+            app.logger.error(f"View flush failed: {e}")
+
+
+def _start_view_flusher():
+    # threads don't survive fork, so each worker process starts its own
+    global _views_pid
+    if _views_pid == os.getpid():
+        return
+    with _views_lock:
+        if _views_pid != os.getpid():
+            _views_pending.clear()  # counted by the parent, not by us
+            threading.Thread(target=_flush_views_forever, name="view-flusher", daemon=True).start()
+            atexit.register(flush_views)
+            _views_pid = os.getpid()
+
+
+@app.before_request
+def count_view():
+    """Runs ahead of the page cache so cached pages still count their views."""
+    target = VIEW_ENDPOINTS.get(request.endpoint)
+    if target is None or request.method != "GET" or ROLE == "replica":
+        return
+    kind, find_id = target
+    item_id = find_id(request.view_args or {})
+    if item_id is not None:
+        record_view(kind, item_id)
+
+# -----------------------------------------------------------------------------
+# Anonymous full-page cache
+# -----------------------------------------------------------------------------
+# Logged-out visitors all get the same HTML, so rendered public pages are kept
+# in a directory shared by every worker on the host (under RUNTIME_DIR).
+# An entry is valid while the data files the page depends on keep the version
+# (mtime + size) they had when it was rendered; any save_json bumps it.
+PAGE_CACHE_ENABLED = os.environ.get("MUNIVERSE_PAGE_CACHE", "1") != "0"
+PAGE_CACHE_DIR = os.environ.get("MUNIVERSE_PAGE_CACHE_DIR") or os.path.join(RUNTIME_DIR, "pages")
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get("MUNIVERSE_PAGE_CACHE_MAX_ENTRIES", "2000"))
+
+# endpoint -> data files whose version is part of the cache key (a callable
+# picks the file from the view args)
+PAGE_CACHE_DEPS = {
+    "onboarding": (),
+    "feed": (POSTS_FILE, LIKES_FILE),
+    "explore": (POSTS_FILE, TRENDING_FILE, TAG_INDEX_FILE),
+    "tag_page": (POSTS_FILE, TAG_INDEX_FILE),
+    "user_mentions": (USERS_FILE, lambda args: mentions_path(args["username"])),
+    "post": (POSTS_FILE, LIKES_FILE, os.path.join(VIEWS_DIR, "posts.json")),
+    "profile": (USERS_FILE, POSTS_FILE, LIKES_FILE, CONF_FILE, ATTENDANCE_FILE),
+    "forums": (FORUM_THREADS, TAG_INDEX_FILE, TRENDING_FILE, os.path.join(VIEWS_DIR, "threads.json")),
+    "conferences": (CONF_FILE, TAG_INDEX_FILE, ATTENDANCE_FILE),
+    "conference": (CONF_FILE, ATTENDANCE_FILE),
+}
+_page_cache_writes = 0
+# Entries rendered by an older deploy (different code/templates) never match
+_PAGE_CACHE_BUILD = max(
+    [os.path.getmtime(__file__)] +
+    [os.path.getmtime(os.path.join(app.root_path, app.template_folder, name))
+     for name in os.listdir(os.path.join(app.root_path, app.template_folder))]
+)
+
+
+def _page_cache_entry():
+    """(path, version) for this request, or None if it must not be cached."""
+    if not PAGE_CACHE_ENABLED or request.method != "GET" or session:
+        return None
+    deps = PAGE_CACHE_DEPS.get(request.endpoint)
+    if deps is None:
+        return None
+    key = f"{_PAGE_CACHE_BUILD}|{request.host}|{request.full_path}"
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    paths = [p(request.view_args or {}) if callable(p) else p for p in deps]
+    version = json.dumps([file_version(p) for p in paths]).encode("utf-8")
+    return os.path.join(PAGE_CACHE_DIR, f"{name}.html"), version
+
+
+def _trim_page_cache():
+    try:
+        entries = [e for e in os.scandir(PAGE_CACHE_DIR) if e.name.endswith(".html")]
+    except OSError:
+        return
+    if len(entries) <= PAGE_CACHE_MAX_ENTRIES:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for e in entries[:len(entries) - PAGE_CACHE_MAX_ENTRIES // 2]:
+        with contextlib.suppress(OSError):
+            os.remove(e.path)
+
+
+@app.before_request
+def serve_cached_page():
+    entry = _page_cache_entry()
+    if entry is None:
+        return None
+    path, version = entry
+    try:
+        with open(path, "rb") as f:
+            if f.readline().rstrip(b"\n") == version:
+                g.page_cache = "hit"
+                resp = Response(f.read(), mimetype="text/html")
+                resp.headers["X-Page-Cache"] = "HIT"
+                return resp
+    except OSError:
+        pass
+    g.page_cache = entry
+    return None
+
+
+@app.after_request
+def store_cached_page(response):
+    global _page_cache_writes
+    entry = g.pop("page_cache", None)
+    if not isinstance(entry, tuple):
+        return response
+    # a view may have flashed or logged someone in while rendering
+    if response.status_code != 200 or response.mimetype != "text/html" or session:
+        return response
+    path, version = entry
+    try:
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(version + b"\n" + response.get_data())
+        os.replace(tmp, path)
+    except OSError as e:
+        app.logger.warning(f"Page cache write failed: {e}")
+        return response
+    response.headers["X-Page-Cache"] = "MISS"
+    _page_cache_writes += 1
+    if _page_cache_writes % 256 == 0:
+        _trim_page_cache()
+    return response
+
+# -----------------------------------------------------------------------------
+# Live events (pub/sub behind /events)
+# -----------------------------------------------------------------------------
+# publish_event() appends to a small NDJSON log in RUNTIME_DIR. One tailer
+# thread per worker follows that log and hands each event to the in-process
+# subscriber queues, so a like on worker A reaches a stream held by worker B.
+EVENTS_FILE = os.path.join(RUNTIME_DIR, "events.ndjson")
+EVENTS_MAX_BYTES = 1024 * 1024
+EVENTS_POLL_SECONDS = 0.25
+SSE_MAX_STREAMS = int(os.environ.get("MUNIVERSE_SSE_MAX_STREAMS", "50"))
+SSE_STREAM_SECONDS = 300  # clients reconnect (EventSource retry) after this
+
+_subscribers = set()
+_subscribers_lock = threading.Lock()
+_tailer_pid = None
+
+
+def publish_event(kind: str, topic: str, data: dict):
+    """Broadcast an event to every /events stream subscribed to `topic`."""
+    record = {"kind": kind, "topic": topic, "data": data, "ts": time.time()}
+    try:
+        with file_lock(EVENTS_FILE):
+            if file_version(EVENTS_FILE) and os.path.getsize(EVENTS_FILE) > EVENTS_MAX_BYTES:
+                # rotate by replacing the inode; tailers notice and start over
+                open(f"{EVENTS_FILE}.tmp", "wb").close()
+                os.replace(f"{EVENTS_FILE}.tmp", EVENTS_FILE)
+            append_record(EVENTS_FILE, record)
+    except OSError as e:
+        app.logger.warning(f"Could not publish {kind} event: {e}")
+
+
+def _tail_events():
+    ino, offset = None, 0
+    try:
+        st = os.stat(EVENTS_FILE)
+        ino, offset = st.st_ino, st.st_size
+    except OSError:
+        pass
+    while True:
+        time.sleep(EVENTS_POLL_SECONDS)
+        try:
+            st = os.stat(EVENTS_FILE)
+        except OSError:
+            continue
+        if st.st_ino != ino or st.st_size < offset:
+            ino, offset = st.st_ino, 0
+        if st.st_size == offset:
+            continue
+        try:
+            with open(EVENTS_FILE, "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+        except OSError:
+            continue
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        offset += len(complete)
+        for line in complete.splitlines():
+            try:
+                event = loads_json(line)
+            except ValueError:
+                continue
+            with _subscribers_lock:
+                targets = list(_subscribers)
+            for q in targets:
+                with contextlib.suppress(queue.Full):
+                    q.put_nowait(event)
+
+
+def subscribe_events():
+    """Register a bounded queue for this worker; None if the worker is full."""
+    global _tailer_pid
+    with _subscribers_lock:
+        if len(_subscribers) >= SSE_MAX_STREAMS:
+            return None
+        # threads don't survive fork, so each worker process starts its own
+        if _tailer_pid != os.getpid():
+            threading.Thread(target=_tail_events, name="events-tailer", daemon=True).start()
+            _tailer_pid = os.getpid()
+        q = queue.Queue(maxsize=256)
+        _subscribers.add(q)
+        return q
+
+
+def unsubscribe_events(q):
+    with _subscribers_lock:
+        _subscribers.discard(q)
+
+# -----------------------------------------------------------------------------
+# Cache warm-up (gunicorn.conf.py calls this in the master and in each worker)
+# -----------------------------------------------------------------------------
+_warm_pid = None
+_warm_lock = threading.Lock()
+
+
+def warm_caches():
+    """Parse the hot data files and compile every template.
+
+    Run once in the preloading master, the parsed copies are inherited by
+    forked workers; run again in a worker it only revalidates file versions.
+    """
+    global _warm_pid
+    startup()
+    with _warm_lock:
+        t0 = time.perf_counter()
+        for path, build in (
+            (POSTS_FILE, index_by_id),
+            (CONF_FILE, index_by_id),
+            (CONF_FILE, build_conf_catalog),
+            (FORUM_THREADS, index_by_id),
+            (TAG_INDEX_FILE, build_tag_sets),
+            (TRENDING_FILE, build_rankings),
+            (LIKES_FILE, build_membership),
+            (ATTENDANCE_FILE, build_membership),
+            (MEDIA_FILE, build_media),
+        ):
+            cached_json(path, build)
+        for kind in TAG_KINDS:
+            cached_json(TAG_KINDS[kind], build_term_index)
+        for name in app.jinja_env.list_templates():
+            if name.endswith(".html"):
+                app.jinja_env.get_template(name)
+        BOOT_TIMES["warm"] = round(time.perf_counter() - t0, 3)
+        _warm_pid = os.getpid()
+    return BOOT_TIMES["warm"]
+
+
+def caches_warm() -> bool:
+    return _warm_pid == os.getpid()
+
+
+@app.cli.command("precompile-templates")
+def precompile_templates():
+    """Compile every template into the Jinja bytecode cache."""
+    t0 = time.perf_counter()
+    names = [n for n in app.jinja_env.list_templates() if n.endswith(".html")]
+    for name in names:
+        app.jinja_env.get_template(name)
+    print(f"Compiled {len(names)} templates into {JINJA_CACHE_DIR} "
+          f"in {time.perf_counter() - t0:.3f}s")
+
 # -----------------------------------------------------------------------------
 # Routes
 # -----------------------------------------------------------------------------
@@ -299,11 +3669,26 @@ def login():
     if request.method == "POST":
         username = (request.form.get("username") or "").strip()
         password = (request.form.get("password") or "").strip()
+        wait = max(take_token("login-ip", request.remote_addr or ""),
+                   take_token("login-user", username.lower()))
+        if wait:
+            flash("Too many sign-in attempts. Please wait a moment and try again.", "error")
+            return too_many_requests(wait, render_template("login.html"))
+
         users = load_json(USERS_FILE)
         user = find_user(users, username)
-        if not user or not user.get("password_hash") or not check_password_hash(user["password_hash"], password):
+        try:
+            ok = bool(user) and verify_password(user.get("password_hash"), password)
+        except HashQueueFull:
+            flash("Sign-in is busy right now. Please try again in a moment.", "warn")
+            return too_many_requests(1, render_template("login.html"), status=503)
+        if not ok:
             flash("Invalid username or password.", "error")
             return redirect(url_for("login"))
+        if needs_rehash(user["password_hash"]):
+            with contextlib.suppress(HashQueueFull):
+                user["password_hash"] = hash_password(password)
+                save_user(users, user)
         session["username"] = username
         # Reset admin verification on login (safer)
         session["admin_verified"] = False
@@ -466,12 +3851,15 @@ def sitemap_forums():
 @app.route("/signup", methods=["GET", "POST"])
 def signup():
     if request.method == "POST":
+        wait = take_token("signup-ip", request.remote_addr or "")
+        if wait:
+            return too_many_requests(wait, "Too many sign-ups from this network. Please try again later.")
         users = load_json(USERS_FILE)
         username = (request.form.get("username") or "").strip()
         if not username:
             flash("Username is required.", "error")
             return redirect(url_for("signup"))
-        if find_user(users, username):
+        if username == DELETED_USER or find_user(users, username):
             flash("Username already taken.", "error")
             return redirect(url_for("signup"))
 
@@ -484,17 +3872,18 @@ def signup():
             flash("Passwords do not match.", "error")
             return redirect(url_for("signup"))
 
+        try:
+            password_hash = hash_password(pw)
+        except HashQueueFull:
+            return too_many_requests(1, "Sign-up is busy right now. Please try again in a moment.", 503)
+
         photo_path = "img/users/default.png"
         file = request.files.get("profile_photo")
         if file and file.filename:
             if not allowed_file(file.filename):
                 flash("Invalid profile photo type.", "error")
                 return redirect(url_for("signup"))
-            filename = secure_filename(file.filename)
-            ext = filename.rsplit(".", 1)[1].lower()
-            final_name = f"{username}.{ext}"
-            file.save(os.path.join(USER_UPLOAD_DIR, final_name))
-            photo_path = f"img/users/{final_name}"
+            photo_path = store_upload(file, "users", username)
 
         new_user = {
             "name": name,
@@ -502,13 +3891,13 @@ def signup():
             "school": school,
             "bio": bio,
             "profile_pic": photo_path,
-            "password_hash": generate_password_hash(pw),
-            "attendingConferences": [],
+            "password_hash": password_hash,
             "followers": [],
             "following": []
         }
         users.append(new_user)
         save_json(USERS_FILE, users)
+        link_media(f"user:{username}", add=[photo_path])
 
         session["username"] = username
         session["admin_verified"] = False
@@ -529,13 +3918,19 @@ def settings_password():
         old = (request.form.get("old_password") or "").strip()
         new = (request.form.get("new_password") or "").strip()
         conf = (request.form.get("confirm_password") or "").strip()
-        if not me.get("password_hash") or not check_password_hash(me["password_hash"], old):
-            flash("Current password is incorrect.", "error")
-            return redirect(url_for("settings_password"))
-        if not new or new != conf:
-            flash("New passwords do not match.", "error")
-            return redirect(url_for("settings_password"))
-        me["password_hash"] = generate_password_hash(new)
+        wait = take_token("login-user", me["username"].lower())
+        if wait:
+            return too_many_requests(wait)
+        try:
+            if not verify_password(me.get("password_hash"), old):
+                flash("Current password is incorrect.", "error")
+                return redirect(url_for("settings_password"))
+            if not new or new != conf:
+                flash("New passwords do not match.", "error")
+                return redirect(url_for("settings_password"))
+            me["password_hash"] = hash_password(new)
+        except HashQueueFull:
+            return too_many_requests(1, "Busy right now. Please try again in a moment.", 503)
         save_user(users, me)
         flash("Password updated.", "ok")
         return redirect(url_for("profile", username=me["username"]))
@@ -563,15 +3958,13 @@ def settings_profile():
                 return redirect(url_for("settings_profile"))
 
             old_pic_path = me.get("profile_pic")
-            filename = secure_filename(file.filename)
-            ext = filename.rsplit(".", 1)[1].lower()
-            final_name = f"{me['username']}.{ext}"
-            save_path = os.path.join(USER_UPLOAD_DIR, final_name)
-            file.save(save_path)
-            me["profile_pic"] = f"img/users/{final_name}"
-            delete_static_file(old_pic_path)
+            me["profile_pic"] = store_upload(file, "users", me["username"])
+        else:
+            old_pic_path = None
 
         save_user(users, me)
+        if old_pic_path is not None:
+            link_media(f"user:{me['username']}", add=[me["profile_pic"]], remove=[old_pic_path])
         flash("Profile updated.", "ok")
         return redirect(url_for("profile", username=me["username"]))
 
@@ -580,25 +3973,40 @@ def settings_profile():
 # -------------------- Explore / Feed / Post pages --------------------
 @app.route("/explore")
 def explore():
-    posts = load_json(POSTS_FILE)
-    q = (request.args.get("q") or "").strip().lower()
-    if q:
-        def hit(p):
-            cap = (p.get("caption") or "").lower()
-            user = (p.get("username") or "").lower()
-            return q in cap or q in user
-        posts = [p for p in posts if hit(p)]
-    posts = [normalize_post(p) for p in posts]
-    posts.sort(key=lambda x: x.get("id", 0), reverse=True)
-    return render_template("explore.html", posts=posts, q=q)
+    """First page of the grid; explore.js fetches the rest from /api/search/posts."""
+    sort = "trending" if request.args.get("sort") == "trending" else "latest"
+    q = (request.args.get("q") or "").strip()
+    ids, cursor, total = search_posts(q, sort, request.args.get("cursor", type=int))
+    by_id = cached_json(POSTS_FILE, index_by_id)
+    posts = [normalize_post(dict(by_id[i])) for i in ids]
+    return render_template("explore.html", posts=posts, q=q, sort=sort,
+                           next_cursor=cursor, total=total)
+
+
+@app.route("/tag/<name>")
+def tag_page(name):
+    """Posts carrying #name, newest first, paged straight off the tag index."""
+    tag = norm_tag(name)
+    if not tag:
+        abort(404)
+    if tag != name:
+        return redirect(url_for("tag_page", name=tag, page=request.args.get("page", type=int)), 301)
+    ids = sorted(tag_index("posts").get(tag, ()), reverse=True)
+    pages = page_count(len(ids), TAG_PER_PAGE)
+    page = min(max(request.args.get("page", 1, type=int), 1), pages)
+    by_id = cached_json(POSTS_FILE, index_by_id)
+    posts = [by_id[i] for i in ids[(page - 1) * TAG_PER_PAGE:page * TAG_PER_PAGE] if i in by_id]
+    return render_template("tag.html", tag=tag, posts=posts, total=len(ids), page=page, pages=pages,
+                           threads=len(tag_index("forums").get(tag, ())))
 
 
 @app.route("/feed")
 def feed():
     posts = load_json(POSTS_FILE)
-    posts = [normalize_post(p) for p in posts]
+    posts = with_like_counts([normalize_post(p) for p in posts])
     posts.sort(key=lambda x: x.get("id", 0), reverse=True)
-    return render_template("feed.html", posts=posts)
+    return render_template("feed.html", posts=posts,
+                           liked_ids=liked_post_ids(session.get("username")))
 
 
 @app.route("/post/<int:post_id>")
@@ -607,8 +4015,11 @@ def post(post_id):
     item = next((p for p in posts if p.get("id") == post_id), None)
     if not item:
         abort(404, "Post not found")
-    normalize_post(item)
-    return render_template("post.html", post=item)
+    with_like_counts([normalize_post(item)])
+    comments, page, pages = load_comments(item, request.args.get("page", 1, type=int))
+    return render_template("post.html", post=item, comments=comments, page=page, pages=pages,
+                           liked_ids=liked_post_ids(session.get("username")),
+                           views=view_stats("posts", post_id))
 
 # Edit & Delete Post
 @app.route("/post/<int:post_id>/edit", methods=["GET", "POST"])
@@ -632,12 +4043,17 @@ def post_edit(post_id):
                 return redirect(url_for("post_edit", post_id=post_id))
 
             old_image_path = post.get("image")
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(POST_UPLOAD_DIR, filename))
-            post["image"] = f"img/posts/{filename}"
-            delete_static_file(old_image_path)
+            post["image"] = store_upload(file, "posts", post.get("username"))
+        else:
+            old_image_path = None
 
         save_json(POSTS_FILE, posts)
+        if old_image_path is not None:
+            link_media(f"post:{post_id}", add=[post["image"]], remove=[old_image_path])
+        index_item_tags("posts", post)
+        update_mentions(refs=[f"post:{post_id}"],
+                        add=[(mention_entry(f"post:{post_id}", post["username"], post["caption"]),
+                              post["caption"])])
         flash("Post updated.", "ok")
         return redirect(url_for("profile", username=session["username"]))
 
@@ -656,9 +4072,7 @@ def post_delete(post_id):
     if post_to_delete.get("username") != session["username"]:
         abort(403)
 
-    delete_static_file(post_to_delete.get("image"))
-    posts.pop(idx)
-    save_json(POSTS_FILE, posts)
+    delete_posts([post_id])
     flash("Post deleted.", "ok")
     return redirect(url_for("profile", username=session["username"]))
 
@@ -668,7 +4082,6 @@ def post_delete(post_id):
 def addpost():
     if request.method == "POST":
         user = get_current_user()
-        posts = load_json(POSTS_FILE)
 
         caption = (request.form.get("caption") or "").strip()
         file = request.files.get("image_file")
@@ -679,21 +4092,23 @@ def addpost():
             flash("Invalid image type. Allowed: png, jpg, jpeg, gif, webp.", "error")
             return redirect(url_for("addpost"))
 
-        filename = secure_filename(file.filename)
-        file.save(os.path.join(POST_UPLOAD_DIR, filename))
-        image_path = f"img/posts/{filename}"
+        image_path = store_upload(file, "posts", user["username"])
 
         new_post = {
-            "id": next_id(posts),
+            "id": allocate_id("posts"),
             "username": user["username"],
             "caption": caption,
             "image": image_path,
-            "likes": 0,
-            "liked_by": [],
-            "comments": []
+            "comment_count": 0
         }
-        posts.append(new_post)
-        save_json(POSTS_FILE, posts)
+        with file_lock(POSTS_FILE):
+            posts = load_json(POSTS_FILE)
+            posts.append(new_post)
+            save_json(POSTS_FILE, posts)
+        link_media(f"post:{new_post['id']}", add=[image_path])
+        index_item_tags("posts", new_post)
+        update_mentions(add=[(mention_entry(f"post:{new_post['id']}", user["username"], caption), caption)])
+        bump_trending("posts", new_post["id"], "create")
         return redirect(url_for("feed"))
 
     return render_template("addpost.html")
@@ -702,20 +4117,31 @@ def addpost():
 @app.route("/post/<int:post_id>/like", methods=["POST"])
 @login_required
 def like_post(post_id):
-    user = get_current_user()
-    posts, post = get_post_by_id(post_id)
-    if not post:
+    if post_id not in cached_json(POSTS_FILE, index_by_id):
         return jsonify({"ok": False, "error": "post_not_found"}), 404
 
-    post = normalize_post(post)
-    u = user["username"]
-    if u in post["liked_by"]:
-        post["liked_by"].remove(u)
-    else:
-        post["liked_by"].append(u)
-    post["likes"] = len(post["liked_by"])
-    save_posts(posts)
-    return jsonify({"ok": True, "liked": (u in post["liked_by"]), "likes": post["likes"]})
+    liked, likes = toggle_membership(LIKES_FILE, post_id, session["username"])
+    if liked:
+        bump_trending("posts", post_id, "like")
+    publish_event("like", f"post:{post_id}", {"post_id": post_id, "likes": likes})
+    return jsonify({"ok": True, "liked": liked, "likes": likes})
+
+
+@app.route("/api/likes")
+def like_state():
+    """Batch like lookup for a page of posts: ?ids=1,2,3."""
+    ids = []
+    for raw in (request.args.get("ids") or "").split(",")[:200]:
+        try:
+            ids.append(int(raw))
+        except ValueError:
+            continue
+    mine = liked_post_ids(session.get("username"))
+    return jsonify({
+        "ok": True,
+        "liked": [pid for pid in ids if pid in mine],
+        "counts": {pid: member_count(LIKES_FILE, pid) for pid in ids}
+    })
 
 
 @app.route("/post/<int:post_id>/comment", methods=["POST"])
@@ -728,38 +4154,124 @@ def comment_post(post_id):
     if len(text) > 1000:
         return jsonify({"ok": False, "error": "too_long"}), 400
 
+    # comment ids are a per-post sequence kept in comment_count
+    with file_lock(POSTS_FILE):
+        posts, post = get_post_by_id(post_id)
+        if not post:
+            return jsonify({"ok": False, "error": "post_not_found"}), 404
+
+        post = normalize_post(post)
+        new_id = int(post["comment_count"]) + 1
+        ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+        comment_data = {
+            "id": new_id,
+            "username": user["username"],
+            "text": text,
+            "ts": ts
+        }
+        append_paged(COMMENTS_DIR, post_id, comment_data, new_id, COMMENTS_PER_PAGE)
+        post["comment_count"] = new_id
+        save_posts(posts)
+    update_mentions(add=[(mention_entry(f"post:{post_id}:{new_id}", user["username"], text, ts), text)])
+    note_authored(user["username"], f"post:{post_id}:{new_id}")
+    bump_trending("posts", post_id, "comment")
+    publish_event("comment", f"post:{post_id}",
+                  {"post_id": post_id, "comment": comment_data, "count": new_id})
+    return jsonify({"ok": True, "comment": comment_data, "count": new_id})
+
+
+@app.route("/post/<int:post_id>/comments")
+def post_comments(post_id):
     posts, post = get_post_by_id(post_id)
     if not post:
         return jsonify({"ok": False, "error": "post_not_found"}), 404
+    normalize_post(post)
+    comments, page, pages = load_comments(post, request.args.get("page", 1, type=int))
+    return jsonify({
+        "ok": True,
+        "comments": comments,
+        "page": page,
+        "pages": pages,
+        "count": post["comment_count"]
+    })
 
-    post = normalize_post(post)
-    new_id = next_id(post["comments"])
-    ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
-
-    comment_data = {
-        "id": new_id,
-        "username": user["username"],
-        "text": text,
-        "ts": ts
-    }
-    post["comments"].append(comment_data)
-    save_posts(posts)
-    return jsonify({"ok": True, "comment": comment_data, "count": len(post["comments"])})
+# -------------------- Live updates (SSE) --------------------
+@app.route("/events")
+def events():
+    """Server-sent events; ?topics=post:1,thread:2 limits what is sent."""
+    if not session.get("username"):
+        return Response(status=204)  # tells EventSource not to reconnect
+    wait = take_token("events-ip", request.remote_addr or "")
+    if wait:
+        return too_many_requests(wait)
+    topics = {t for t in (request.args.get("topics") or "").split(",") if t}
+    q = subscribe_events()
+    if q is None:
+        return Response("retry: 15000\n\n", status=503, mimetype="text/event-stream")
+
+    def stream():
+        deadline = time.time() + SSE_STREAM_SECONDS
+        try:
+            yield "retry: 3000\n\n"
+            while time.time() < deadline:
+                try:
+                    event = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if topics and event.get("topic") not in topics:
+                    continue
+                payload = json.dumps(event.get("data"), ensure_ascii=False)
+                yield f"event: {event.get('kind')}\ndata: {payload}\n\n"
+        finally:
+            unsubscribe_events(q)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 # -------------------- Conferences --------------------
 @app.route("/conferences")
 def conferences():
-    confs = load_json(CONF_FILE)
-    return render_template("conferences.html", conferences=confs)
+    when = "past" if request.args.get("when") == "past" else "upcoming"
+    q = (request.args.get("q") or "").strip()
+    tag = (request.args.get("tag") or "").strip()
+    location = (request.args.get("location") or "").strip()
+
+    ids = conference_ids(when, q=q, tag=tag, location=location)
+    pages = page_count(len(ids), CONFS_PER_PAGE)
+    page = min(max(request.args.get("page", 1, type=int), 1), pages)
+    by_id = cached_json(CONF_FILE, index_by_id)
+    confs = [
+        dict(by_id[cid], attendees=member_count(ATTENDANCE_FILE, cid))
+        for cid in ids[(page - 1) * CONFS_PER_PAGE:page * CONFS_PER_PAGE]
+    ]
+    return render_template("conferences.html", conferences=confs, when=when, q=q,
+                           tag=tag, location=location, page=page, pages=pages,
+                           total=len(ids))
 
 
 @app.route("/conference/<int:conf_id>")
 def conference(conf_id):
-    confs = load_json(CONF_FILE)
-    conf = next((c for c in confs if c.get("id") == conf_id), None)
+    conf = cached_json(CONF_FILE, index_by_id).get(conf_id)
     if not conf:
         abort(404, "Conference not found")
-    return render_template("conference.html", conference=conf)
+    return render_template(
+        "conference.html", conference=conf,
+        attendees=member_count(ATTENDANCE_FILE, conf_id),
+        attending=conf_id in member_items(ATTENDANCE_FILE, session.get("username"))
+    )
+
+
+@app.route("/conference/<int:conf_id>/attend", methods=["POST"])
+@login_required
+def conference_attend(conf_id):
+    if conf_id not in cached_json(CONF_FILE, index_by_id):
+        return jsonify({"ok": False, "error": "conference_not_found"}), 404
+    attending, count = toggle_membership(ATTENDANCE_FILE, conf_id, session["username"])
+    return jsonify({"ok": True, "attending": attending, "attendees": count})
 
 # Submit-for-approval flow (stores to pending list + pending banner folder)
 @app.route("/addconference", methods=["GET", "POST"])
@@ -785,14 +4297,10 @@ def addconference():
             flash("Invalid banner type. Allowed: png, jpg, jpeg, gif, webp.", "error")
             return redirect(url_for("addconference"))
 
-        filename = secure_filename(file.filename)
-        filename = f"{int(time.time())}_{filename}"
-        file.save(os.path.join(PENDING_UPLOAD_DIR, filename))
-        pending_banner_path = f"img/conferences/pending/{filename}"
+        pending_banner_path = store_upload(file, "pending", session.get("username"))
 
-        pendings = load_json(CONF_PENDING_FILE)
         pending_item = {
-            "id": next_id(pendings),
+            "id": allocate_id("pending_conferences"),
             "slug": slug_id,
             "name": name,
             "date": date,
@@ -804,8 +4312,11 @@ def addconference():
             "submitted_ts": int(time.time()),
             "status": "pending"
         }
-        pendings.append(pending_item)
-        save_json(CONF_PENDING_FILE, pendings)
+        with file_lock(CONF_PENDING_FILE):
+            pendings = load_json(CONF_PENDING_FILE)
+            pendings.append(pending_item)
+            save_json(CONF_PENDING_FILE, pendings)
+        link_media(f"pending:{pending_item['id']}", add=[pending_banner_path])
 
         add_notification("conference_submission", {
             "pending_id": pending_item["id"],
@@ -868,35 +4379,149 @@ def profile(username):
 
     user.setdefault("followers", [])
     user.setdefault("following", [])
-    user_posts = [normalize_post(p) for p in posts if p.get("username") == username]
+    user_posts = with_like_counts([normalize_post(p) for p in posts if p.get("username") == username])
     user_posts.sort(key=lambda p: p.get("id", 0), reverse=True)
-    return render_template("profile.html", user=user, posts=user_posts)
+    confs = cached_json(CONF_FILE, index_by_id)
+    attending = [confs[cid] for cid in sorted(member_items(ATTENDANCE_FILE, username)) if cid in confs]
+    return render_template("profile.html", user=user, posts=user_posts, attending=attending)
+
+
+def mention_target(ref):
+    """("post" | "comment" | "thread" | "reply", link to the page it is on)."""
+    kind, item_id, *seq = ref.split(":")
+    if kind == "post":
+        page = page_count(int(seq[0]), COMMENTS_PER_PAGE) if seq else None
+        return ("comment" if seq else "post"), url_for("post", post_id=int(item_id), page=page)
+    page = page_count(int(seq[0]), REPLIES_PER_PAGE) if seq else None
+    return ("reply" if seq else "thread"), url_for("forum_thread", slug=item_id, page=page)
+
+
+@app.route("/profile/<username>/mentions")
+def user_mentions(username):
+    """Where @username was mentioned, newest first, from the mention index."""
+    user = user_index()["users"].get(username)
+    if not user:
+        abort(404, "User not found")
+    entries = mentions_of(username)
+    pages = page_count(len(entries), MENTIONS_PER_PAGE)
+    page = min(max(request.args.get("page", 1, type=int), 1), pages)
+    end = len(entries) - (page - 1) * MENTIONS_PER_PAGE
+    mentions = [
+        dict(e, where=where, url=url)
+        for e in reversed(entries[max(end - MENTIONS_PER_PAGE, 0):end])
+        for where, url in [mention_target(e["ref"])]
+    ]
+    return render_template("mentions.html", user=user, mentions=mentions, total=len(entries),
+                           page=page, pages=pages)
 
 # -------------------- Forums --------------------
 @app.route("/forums")
 def forums():
-    threads = load_json(FORUM_THREADS)
     q = (request.args.get("q") or "").strip().lower()
     tag = (request.args.get("tag") or "").strip().lower()
 
-    filtered_threads = threads
+    def hit(t):
+        content = " ".join([
+            t.get("title", ""),
+            t.get("body", ""),
+            " ".join(t.get("tags", []))
+        ]).lower()
+        return q in content
+
+    # Index intersection narrows the candidates; the substring check keeps
+    # multi-word queries matching as a phrase.
+    sort = request.args.get("sort") or "latest"
+    if sort == "trending":
+        # only the top-K board's threads can show, so filter those K, not every thread
+        by_id = cached_json(FORUM_THREADS, index_by_id)
+        allowed = filter_ids("forums", q, tag)
+        filtered_threads = [by_id[tid] for tid in trending_ids("threads")
+                            if tid in by_id and (allowed is None or tid in allowed)]
+    else:
+        filtered_threads = filter_items("forums", q, tag)
+        filtered_threads.sort(key=lambda t: t.get("created_ts", 0), reverse=True)
     if q:
-        def hit(t):
-            content = " ".join([
-                t.get("title", ""),
-                t.get("body", ""),
-                " ".join(t.get("tags", []))
-            ]).lower()
-            return q in content
         filtered_threads = [t for t in filtered_threads if hit(t)]
-    if tag:
-        filtered_threads = [
-            t for t in filtered_threads
-            if tag in [x.lower() for x in t.get("tags", [])]
-        ]
-
-    filtered_threads.sort(key=lambda t: t.get("created_ts", 0), reverse=True)
-    return render_template("forums.html", threads=filtered_threads, q=q, tag=tag)
+    views = {t.get("id"): view_stats("threads", t.get("id"))["views"] for t in filtered_threads}
+    return render_template("forums.html", threads=filtered_threads, q=q, tag=tag,
+                           sort=sort, cloud=tag_cloud("forums", 20), views=views)
+
+
+@app.route("/api/users/suggest")
+def users_suggest():
+    """Autocomplete: ?q=ja -> the most followed users with a word starting "ja"."""
+    limit = min(max(request.args.get("limit", USER_SUGGEST_LIMIT, type=int), 1), 25)
+    by_name = user_index()["users"]
+    users = []
+    for uname in suggest_users(request.args.get("q", ""), limit):
+        u = by_name[uname]
+        users.append({
+            "username": uname,
+            "name": u.get("name", ""),
+            "school": u.get("school", ""),
+            "profile_pic": u.get("profile_pic", "img/users/default.png"),
+            "followers": len(u.get("followers") or ()),
+        })
+    return jsonify({"ok": True, "users": users})
+
+
+def _search_limit():
+    return min(max(request.args.get("limit", EXPLORE_PER_PAGE, type=int), 1), SEARCH_MAX_LIMIT)
+
+
+@app.route("/api/search/posts")
+def search_posts_api():
+    """?q=&sort=latest|trending&cursor=&limit= -> one page of posts plus `next`."""
+    sort = "trending" if request.args.get("sort") == "trending" else "latest"
+    ids, cursor, total = search_posts(request.args.get("q", ""), sort,
+                                      request.args.get("cursor", type=int), _search_limit())
+    by_id = cached_json(POSTS_FILE, index_by_id)
+    items = with_like_counts([normalize_post(dict(by_id[i])) for i in ids])
+    for p in items:
+        p["url"] = url_for("post", post_id=p["id"])
+        p["image_url"] = url_for("static", filename=p.get("image") or "")
+    return jsonify({"ok": True, "items": items, "next": cursor, "total": total})
+
+
+@app.route("/api/search/conferences")
+def search_conferences_api():
+    """?q=&tag=&location=&when=upcoming|past&cursor=&limit= -> one page plus `next`."""
+    when = "past" if request.args.get("when") == "past" else "upcoming"
+    ids = conference_ids(when, q=(request.args.get("q") or "").strip(),
+                         tag=(request.args.get("tag") or "").strip(),
+                         location=(request.args.get("location") or "").strip())
+    start = max(request.args.get("cursor", 0, type=int), 0)
+    end = start + _search_limit()
+    by_id = cached_json(CONF_FILE, index_by_id)
+    items = []
+    for cid in ids[start:end]:
+        c = dict(by_id[cid], attendees=member_count(ATTENDANCE_FILE, cid))
+        c["url"] = url_for("conference", conf_id=cid)
+        c["banner_url"] = url_for("static", filename=c["banner"]) if c.get("banner") else None
+        items.append(c)
+    return jsonify({"ok": True, "items": items, "next": end if end < len(ids) else None,
+                    "total": len(ids)})
+
+
+@app.route("/api/tags/<kind>")
+def tags_cloud(kind):
+    if kind not in TAG_KINDS:
+        abort(404)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    return jsonify({"ok": True, "kind": kind, "tags": tag_cloud(kind, limit)})
+
+
+@app.route("/api/tags/<kind>/<tag>")
+def tags_filter(kind, tag):
+    """Items carrying `tag`, optionally narrowed by ?q= (index intersection)."""
+    if kind not in TAG_KINDS:
+        abort(404)
+    q = (request.args.get("q") or "").strip()
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    items = filter_items(kind, q, tag)
+    items.sort(key=lambda x: x.get("id", 0), reverse=True)
+    return jsonify({"ok": True, "kind": kind, "tag": norm_tag(tag),
+                    "count": len(items), "items": items[:limit]})
 
 
 @app.route("/forums/new", methods=["GET", "POST"])
@@ -912,8 +4537,7 @@ def forum_new():
             flash("Title and body are required.", "error")
             return redirect(url_for("forum_new"))
 
-        threads = load_json(FORUM_THREADS)
-        tid = next_id(threads)
+        tid = allocate_id("threads")
         slug = f"{slugify(title)}-{tid}"
         thread = {
             "id": tid,
@@ -923,31 +4547,34 @@ def forum_new():
             "tags": [t.strip() for t in tags_raw.split(",") if t.strip()],
             "author": me["username"],
             "created_ts": int(time.time()),
-            "replies": 0,
-            "views": 0
+            "replies": 0
         }
-        threads.append(thread)
-        save_json(FORUM_THREADS, threads)
+        with file_lock(FORUM_THREADS):
+            threads = load_json(FORUM_THREADS)
+            threads.append(thread)
+            save_json(FORUM_THREADS, threads)
+        index_item_tags("forums", thread)
+        update_mentions(add=[(mention_entry(f"thread:{tid}", me["username"], body), body)])
+        note_authored(me["username"], f"thread:{tid}")
+        bump_trending("threads", tid, "create")
         flash("Thread created.", "ok")
         return redirect(url_for("forum_thread", slug=slug))
     return render_template("forum_new.html")
 
 
-@app.route("/forums/<slug>", methods=["GET", "POST"])
-def forum_thread(slug):
-    threads = load_json(FORUM_THREADS)
-    thread_idx = next(
-        (i for i, t in enumerate(threads)
-         if t.get("slug") == slug or str(t.get("id")) == slug),
+def find_thread(threads, slug):
+    return next(
+        (t for t in threads if t.get("slug") == slug or str(t.get("id")) == slug),
         None
     )
-    if thread_idx is None:
-        abort(404, "Thread not found")
-    thread = threads[thread_idx]
 
-    # Increment views and save immediately
-    thread["views"] = int(thread.get("views", 0)) + 1
-    save_json(FORUM_THREADS, threads)
+
+@app.route("/forums/<slug>", methods=["GET", "POST"])
+def forum_thread(slug):
+    # views are counted by count_view(); reading the thread writes nothing
+    thread = find_thread(cached_json(FORUM_THREADS), slug)
+    if thread is None:
+        abort(404, "Thread not found")
 
     if request.method == "POST":
         if not session.get("username"):
@@ -960,27 +4587,37 @@ def forum_thread(slug):
             flash("Reply cannot be empty.", "error")
             return redirect(url_for("forum_thread", slug=slug))
 
-        replies = load_json(FORUM_REPLIES)
-        reply = {
-            "id": next_id(replies),
-            "thread_id": thread["id"],
-            "author": me["username"],
-            "text": text,
-            "created_ts": int(time.time())
-        }
-        replies.append(reply)
-        save_json(FORUM_REPLIES, replies)
-
-        thread["replies"] = int(thread.get("replies", 0)) + 1
-        save_json(FORUM_THREADS, threads)
+        # Re-read under the lock so concurrent replies get distinct sequence numbers
+        with file_lock(FORUM_THREADS):
+            threads = load_json(FORUM_THREADS)
+            thread = find_thread(threads, slug)
+            seq = int(thread.get("replies", 0)) + 1
+            reply = {
+                "id": seq,
+                "thread_id": thread["id"],
+                "author": me["username"],
+                "text": text,
+                "created_ts": int(time.time())
+            }
+            append_paged(REPLIES_DIR, thread["id"], reply, seq, REPLIES_PER_PAGE)
+            thread["replies"] = seq
+            save_json(FORUM_THREADS, threads)
+        update_mentions(add=[(mention_entry(f"thread:{thread['id']}:{seq}", me["username"], text,
+                                            reply["created_ts"]), text)])
+        note_authored(me["username"], f"thread:{thread['id']}:{seq}")
+        bump_trending("threads", thread["id"], "reply")
+        publish_event("reply", f"thread:{thread['id']}",
+                      {"thread_id": thread["id"], "reply": reply, "count": seq})
 
         flash("Reply posted.", "ok")
-        return redirect(url_for("forum_thread", slug=slug))
+        return redirect(url_for("forum_thread", slug=slug,
+                                page=page_count(seq, REPLIES_PER_PAGE)))
 
-    all_replies = load_json(FORUM_REPLIES)
-    thread_replies = [r for r in all_replies if r.get("thread_id") == thread["id"]]
-    thread_replies.sort(key=lambda r: r.get("created_ts", 0))
-    return render_template("forum_thread.html", thread=thread, replies=thread_replies)
+    pages = page_count(thread.get("replies", 0), REPLIES_PER_PAGE)
+    page = min(max(request.args.get("page", 1, type=int), 1), pages)
+    thread_replies = load_page(REPLIES_DIR, thread["id"], page)
+    return render_template("forum_thread.html", thread=thread, replies=thread_replies,
+                           page=page, pages=pages, views=view_stats("threads", thread["id"]))
 
 # -------------------- Static Pages --------------------
 @app.route("/about")
@@ -992,6 +4629,167 @@ def about():
 def privacypolicy():
     return render_template("privacypolicy.html")
 
+# -------------------- Moderation (batched) --------------------
+# Each helper takes a list of ids and rewrites every collection it touches
+# once, however many items go, so clearing a spam wave costs one write per
+# file. Media is released or moved in a single catalog write and the files
+# themselves are left to the media sweeper.
+def _forget(posts, users=(), refs=()):
+    """Drop what hangs off deleted posts and users from the side indexes.
+
+    `refs` are mentions made in content that stays behind (blanked comments).
+    """
+    ids = [p.get("id") for p in posts]
+    unames = [u["username"] for u in users]
+    for p in posts:
+        delete_post_data(p)
+    unlink_media([(f"user:{u['username']}", u.get("profile_pic")) for u in users]
+                 + [(f"post:{p.get('id')}", p.get("image")) for p in posts])
+    drop_membership(LIKES_FILE, item_ids=ids, usernames=unames)
+    drop_membership(ATTENDANCE_FILE, usernames=unames)
+    drop_trending("posts", ids)
+    drop_views("posts", ids)
+    index_tags_many("posts", [(i, ()) for i in ids])
+    update_mentions(refs=refs, items=[f"post:{i}" for i in ids], usernames=unames)
+
+
+def _blank_authors(usernames) -> list:
+    """Blank the threads, comments and replies `usernames` wrote; returns their mention refs.
+
+    Other users' replies and comments stay where they are, so nothing is
+    removed and no counter changes. Only the pages listed in the authors'
+    authored index are rewritten, each once under its parent's lock.
+    """
+    thread_ids, pages = set(), {}
+    for uname in usernames:
+        for ref in authored_refs(uname):
+            kind, key, *seq = ref.split(":")
+            if not seq:
+                thread_ids.add(int(key))
+                continue
+            paged = "comments" if kind == "post" else "replies"
+            per_page = PAGED_COLLECTIONS[paged][1]
+            pages.setdefault((paged, int(key), (int(seq[0]) - 1) // per_page + 1), set()).add(int(seq[0]))
+    refs, mine = [], []
+    if thread_ids:
+        with file_lock(FORUM_THREADS):
+            threads = load_json(FORUM_THREADS)
+            mine = [t for t in threads if t.get("id") in thread_ids and t.get("author") in usernames]
+            for t in mine:
+                t.update(author=DELETED_USER, body=DELETED_USER)
+                refs.append(f"thread:{t.get('id')}")
+            if mine:
+                save_json(FORUM_THREADS, threads)
+    index_tags_many("forums", [(t.get("id"), item_tags("forums", t)) for t in mine])
+    for (paged, key, page), ids in sorted(pages.items()):
+        base_dir, parent_file, _counter, author, _parent_field, prefix = FSCK_PAGED[paged]
+        path = page_path(base_dir, key, page)
+        with file_lock(parent_file):
+            items = load_json(path)
+            hits = [i for i, item in enumerate(items)
+                    if item.get("id") in ids and item.get(author) in usernames]
+            for i in hits:
+                refs.append(f"{prefix}:{key}:{items[i].get('id')}")
+                items[i] = blank_entry(items[i], author)
+            if hits:
+                save_json(path, items)
+    for uname in usernames:
+        remove_path(authored_path(uname))
+    return refs
+
+
+def _drop_posts(keep) -> list:
+    """Remove the posts for which keep(post) is false; returns them."""
+    with file_lock(POSTS_FILE):
+        posts = load_json(POSTS_FILE)
+        gone = [p for p in posts if not keep(p)]
+        if gone:
+            save_json(POSTS_FILE, [p for p in posts if keep(p)])
+    return gone
+
+
+def delete_posts(post_ids) -> list:
+    """Delete posts by id; returns the posts that existed."""
+    post_ids = set(post_ids)
+    if not post_ids:
+        return []
+    gone = _drop_posts(lambda p: p.get("id") not in post_ids)
+    _forget(gone)
+    return gone
+
+
+def delete_users(usernames):
+    """Delete users, their posts and their follow edges; returns (users, posts).
+
+    Their threads, comments and replies stay as DELETED_USER placeholders.
+    """
+    usernames = set(usernames)
+    if not usernames:
+        return [], []
+    with file_lock(USERS_FILE):
+        users = load_json(USERS_FILE)
+        gone = [u for u in users if u.get("username") in usernames]
+        if gone:
+            users = [u for u in users if u.get("username") not in usernames]
+            for u in users:
+                u["followers"] = [x for x in u.get("followers", []) if x not in usernames]
+                u["following"] = [x for x in u.get("following", []) if x not in usernames]
+            save_json(USERS_FILE, users)
+    if not gone:
+        return [], []
+    usernames = {u["username"] for u in gone}
+    posts = _drop_posts(lambda p: p.get("username") not in usernames)
+    _forget(posts, gone, _blank_authors(usernames))
+    return gone, posts
+
+
+def _take_pending(pending_ids) -> list:
+    """Remove pending submissions by id (one write); returns them."""
+    pending_ids = set(pending_ids)
+    if not pending_ids:
+        return []
+    with file_lock(CONF_PENDING_FILE):
+        pendings = load_json(CONF_PENDING_FILE)
+        taken = [p for p in pendings if int(p.get("id", 0)) in pending_ids]
+        if taken:
+            save_json(CONF_PENDING_FILE, [p for p in pendings if p not in taken])
+    return taken
+
+
+def approve_pending(pending_ids) -> list:
+    """Publish pending conferences; returns the new conference records."""
+    taken = _take_pending(pending_ids)
+    if not taken:
+        return []
+    conf_ids = [allocate_id("conferences") for _ in taken]
+    # move every banner from pending to the live folder in one catalog write
+    banners = move_media([
+        (item["banner"], "conferences", f"conf:{conf_id}", f"pending:{item['id']}")
+        for item, conf_id in zip(taken, conf_ids)
+    ])
+    new = [{
+        "id": conf_id,
+        "name": item["name"],
+        "date": item["date"],
+        "location": item["location"],
+        "description": item["description"],
+        "banner": banner,
+        "tags": item.get("tags", []),
+    } for item, conf_id, banner in zip(taken, conf_ids, banners)]
+    with file_lock(CONF_FILE):
+        confs = load_json(CONF_FILE)
+        confs.extend(new)
+        save_json(CONF_FILE, confs)
+    index_tags_many("conferences", [(c["id"], c["tags"]) for c in new])
+    return new
+
+
+def reject_pending(pending_ids) -> list:
+    """Drop pending conferences; their banners become orphans for the sweeper."""
+    taken = _take_pending(pending_ids)
+    unlink_media([(f"pending:{p['id']}", p.get("banner")) for p in taken])
+    return taken
+
 # -------------------- Admin Gate + Portal + Actions --------------------
 @app.route("/admin/verify", methods=["POST"])
 @login_required
@@ -1015,7 +4813,7 @@ def admin_portal():
 
     uq = (request.args.get("uq") or "").strip().lower()
     users = load_json(USERS_FILE)
-    posts = [normalize_post(p) for p in load_json(POSTS_FILE)]
+    posts = with_like_counts([normalize_post(p) for p in load_json(POSTS_FILE)])
 
     stats, insights = build_insights(users, posts, limit=10)
 
@@ -1034,52 +4832,69 @@ def admin_portal():
 
     # filter users if query
     if uq:
-        def hit(u):
-            src = f"{u.get('username','').lower()} {u.get('name','').lower()}"
-            return uq in src
-        users = [u for u in users if hit(u)]
+        matched = search_users(uq)
+        users = [u for u in users if u.get("username") in matched]
 
     posts = sorted(posts, key=lambda x: x.get("id", 0), reverse=True)
 
     pendings = []
+    notifs, npage, npages = [], 1, 1
     if verified:
         pendings = sorted(
             load_json(CONF_PENDING_FILE),
             key=lambda x: x.get("submitted_ts", 0),
             reverse=True
         )
+        notifs, npage, npages = load_notifications(request.args.get("npage", 1, type=int))
+        for n in notifs:
+            n["when"] = datetime.fromtimestamp(n.get("ts", 0), timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
 
+    me = session["username"]
     return render_template(
         "adminportal.html",
         verified=verified,
         users=users, posts=posts,
         stats=stats, insights=insights, uq=uq,
-        pendings=pendings
+        pendings=pendings,
+        notifs=notifs, npage=npage, npages=npages,
+        read_upto=notif_cursor(me), unread=unread_notifications(me)
     )
 
 
+def _form_ids(name, cast=int):
+    """All values of a repeated form field, skipping ones that don't parse."""
+    out = []
+    for raw in request.form.getlist(name):
+        with contextlib.suppress(ValueError):
+            value = cast(raw.strip())
+            if value not in out and value != "":
+                out.append(value)
+    return out
+
+
+def _plural(n, word):
+    return f"{n} {word}" + ("" if n == 1 else "s")
+
+
 @app.route("/admin/delete_post", methods=["POST"])
 @login_required
 @admin_required
 def admin_delete_post():
+    """Delete one or more posts (repeat `post_id` for a batch)."""
     if not is_admin_verified():
         abort(403)
-    try:
-        pid = int(request.form.get("post_id"))
-    except Exception:
+    ids = _form_ids("post_id")
+    if not ids:
         flash("Invalid post id.", "error")
         return redirect(url_for("admin_portal"))
 
-    posts = load_json(POSTS_FILE)
-    target = next((p for p in posts if p.get("id") == pid), None)
-    if not target:
-        flash(f"Post #{pid} not found.", "warn")
-        return redirect(url_for("admin_portal"))
-
-    delete_static_file(target.get("image"))
-    posts = [p for p in posts if p.get("id") != pid]
-    save_json(POSTS_FILE, posts)
-    flash(f"Deleted post #{pid}.", "ok")
+    gone = delete_posts(ids)
+    if not gone:
+        flash("Post not found." if len(ids) == 1 else "None of those posts exist.", "warn")
+    elif len(ids) == 1:
+        flash(f"Deleted post #{ids[0]}.", "ok")
+    else:
+        flash(f"Deleted {_plural(len(gone), 'post')}.", "ok")
     return redirect(url_for("admin_portal"))
 
 
@@ -1087,41 +4902,25 @@ def admin_delete_post():
 @login_required
 @admin_required
 def admin_delete_user():
+    """Delete one or more users and their posts (repeat `username` for a batch)."""
     if not is_admin_verified():
         abort(403)
-    uname = (request.form.get("username") or "").strip()
-    if not uname:
+    unames = _form_ids("username", cast=str)
+    if not unames:
         flash("Missing username.", "error")
         return redirect(url_for("admin_portal"))
-
-    users = load_json(USERS_FILE)
-    posts = load_json(POSTS_FILE)
-
-    user = find_user(users, uname)
-    if not user:
-        flash(f"User @{uname} not found.", "warn")
-        return redirect(url_for("admin_portal"))
-
-    # Remove user's uploaded avatar (if not default)
-    delete_static_file(user.get("profile_pic"))
-
-    # Remove user's posts & images
-    deleted = 0
-    for p in list(posts):
-        if p.get("username") == uname:
-            delete_static_file(p.get("image"))
-            posts.remove(p)
-            deleted += 1
-    save_json(POSTS_FILE, posts)
-
-    # Remove user & cleanup follow relationships
-    users = [u for u in users if u.get("username") != uname]
-    for u in users:
-        u["followers"] = [x for x in u.get("followers", []) if x != uname]
-        u["following"] = [x for x in u.get("following", []) if x != uname]
-    save_json(USERS_FILE, users)
-
-    flash(f"Deleted user @{uname} and {deleted} posts.", "ok")
+    if session["username"] in unames:
+        unames.remove(session["username"])
+        flash("You can't delete your own account from the portal.", "warn")
+
+    users, posts = delete_users(unames)
+    if not users:
+        if unames:
+            flash("User not found." if len(unames) == 1 else "None of those users exist.", "warn")
+    elif len(users) == 1:
+        flash(f"Deleted user @{users[0]['username']} and {_plural(len(posts), 'post')}.", "ok")
+    else:
+        flash(f"Deleted {_plural(len(users), 'user')} and {_plural(len(posts), 'post')}.", "ok")
     return redirect(url_for("admin_portal"))
 
 
@@ -1147,49 +4946,55 @@ def admin_toggle_admin():
     flash(f"@{uname} role is now: {user['role']}.", "ok")
     return redirect(url_for("admin_portal"))
 
+# ---- Notifications inbox (admin verified only) ----
+@app.route("/admin/notifications")
+@login_required
+@admin_required
+def admin_notifications():
+    if not is_admin_verified():
+        abort(403)
+    items, page, pages = load_notifications(request.args.get("page", 1, type=int))
+    me = session["username"]
+    return jsonify({"ok": True, "items": items, "page": page, "pages": pages,
+                    "read_upto": notif_cursor(me), "unread": unread_notifications(me)})
+
+
+@app.route("/admin/notifications/unread")
+@login_required
+@admin_required
+def admin_notifications_unread():
+    if not is_admin_verified():
+        abort(403)
+    return jsonify({"ok": True, "unread": unread_notifications(session["username"])})
+
+
+@app.route("/admin/notifications/read", methods=["POST"])
+@login_required
+@admin_required
+def admin_notifications_read():
+    if not is_admin_verified():
+        abort(403)
+    up_to = request.form.get("up_to", type=int)
+    mark_notifications_read(session["username"], up_to)
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"ok": True, "unread": unread_notifications(session["username"])})
+    return redirect(url_for("admin_portal"))
+
 # ---- Approve / Reject conference submissions (admin verified only) ----
 @app.route("/admin/conf/approve", methods=["POST"])
 @login_required
 @admin_required
 def admin_conf_approve():
+    """Publish one or more pending conferences (repeat `pending_id`)."""
     if not is_admin_verified():
         abort(403)
-    pid = int(request.form.get("pending_id", 0))
-    pendings = load_json(CONF_PENDING_FILE)
-    idx = next((i for i, p in enumerate(pendings) if int(p.get("id", 0)) == pid), None)
-    if idx is None:
+    done = approve_pending(_form_ids("pending_id"))
+    if not done:
         flash("Pending item not found.", "error")
-        return redirect(url_for("admin_portal"))
-
-    item = pendings[idx]
-    # move banner from pending to live folder
-    src_rel = item["banner"]  # "img/conferences/pending/xxx"
-    src_abs = os.path.join(app.static_folder, src_rel)
-    live_dir = os.path.join(app.static_folder, "img", "conferences")
-    os.makedirs(live_dir, exist_ok=True)
-    final_name = f"{int(time.time())}_{os.path.basename(src_abs)}"
-    dst_abs = os.path.join(live_dir, final_name)
-    shutil.move(src_abs, dst_abs)
-    item["banner"] = f"img/conferences/{final_name}"
-
-    # write to approved conferences
-    confs = load_json(CONF_FILE)
-    confs.append({
-        "id": next_id(confs),
-        "name": item["name"],
-        "date": item["date"],
-        "location": item["location"],
-        "description": item["description"],
-        "banner": item["banner"],
-        "tags": item.get("tags", []),
-    })
-    save_json(CONF_FILE, confs)
-
-    # remove pending
-    pendings.pop(idx)
-    save_json(CONF_PENDING_FILE, pendings)
-
-    flash("Conference approved & published.", "ok")
+    elif len(done) == 1:
+        flash("Conference approved & published.", "ok")
+    else:
+        flash(f"{_plural(len(done), 'conference')} approved & published.", "ok")
     return redirect(url_for("admin_portal"))
 
 
@@ -1197,52 +5002,190 @@ def admin_conf_approve():
 @login_required
 @admin_required
 def admin_conf_reject():
+    """Reject one or more pending conferences (repeat `pending_id`)."""
     if not is_admin_verified():
         abort(403)
-    pid = int(request.form.get("pending_id", 0))
-    pendings = load_json(CONF_PENDING_FILE)
-    idx = next((i for i, p in enumerate(pendings) if int(p.get("id", 0)) == pid), None)
-    if idx is None:
+    done = reject_pending(_form_ids("pending_id"))
+    if not done:
         flash("Pending item not found.", "error")
-        return redirect(url_for("admin_portal"))
-
-    item = pendings[idx]
-    # delete the pending banner file
-    delete_static_file(item.get("banner"))
-    pendings.pop(idx)
-    save_json(CONF_PENDING_FILE, pendings)
-    flash("Conference submission rejected.", "ok")
+    elif len(done) == 1:
+        flash("Conference submission rejected.", "ok")
+    else:
+        flash(f"{_plural(len(done), 'conference submission')} rejected.", "ok")
     return redirect(url_for("admin_portal"))
 
-# -------------------- Debug uploads --------------------
-@app.route("/_uploads")
-def _uploads():
-    info = {
-        "static_folder": app.static_folder,
-        "POST_UPLOAD_DIR": POST_UPLOAD_DIR,
-        "USER_UPLOAD_DIR": USER_UPLOAD_DIR,
-        "CONF_UPLOAD_DIR": CONF_UPLOAD_DIR,
-        "post_files": [], "user_files": [], "conference_files": []
-    }
-    try:
-        info["post_files"] = sorted(os.listdir(POST_UPLOAD_DIR))
-    except Exception as e:
-        info["post_files"] = [f"<error: {e}>"]
-    try:
-        info["user_files"] = sorted(os.listdir(USER_UPLOAD_DIR))
-    except Exception as e:
-        info["user_files"] = [f"<error: {e}>"]
-    try:
-        info["conference_files"] = sorted(os.listdir(CONF_UPLOAD_DIR))
-    except Exception as e:
-        info["conference_files"] = [f"<error: {e}>"]
-    return info
+# -------------------- Media catalog (admin verified only) --------------------
+@app.route("/admin/media")
+@login_required
+@admin_required
+def admin_media():
+    if not is_admin_verified():
+        abort(403)
+    page = request.args.get("page", 1, type=int)
+    kind = (request.args.get("kind") or "").strip() or None
+    owner = (request.args.get("owner") or "").strip() or None
+    orphans = request.args.get("orphans") == "1"
+    items, page, pages, total = media_page(page, kind, owner, orphans)
+    return jsonify({"ok": True, "items": items, "page": page, "pages": pages, "total": total,
+                    "bytes": sum(e.get("size") or 0 for e in media_catalog().values())})
+
+
+@app.route("/admin/media/sweep", methods=["POST"])
+@login_required
+@admin_required
+def admin_media_sweep():
+    if not is_admin_verified():
+        abort(403)
+    return jsonify({"ok": True, "removed": sweep_media()})
+
+# -------------------- Profiles (admin verified only) --------------------
+@app.route("/admin/profiles")
+@login_required
+@admin_required
+def admin_profiles():
+    if not is_admin_verified():
+        abort(403)
+    flush_profiles()
+    routes = {}
+    for endpoint, files in profile_files().items():
+        _stats, _stacks, requests, wall = merged_profile(endpoint)
+        routes[endpoint] = {
+            "requests": requests,
+            "mean_ms": round(wall / requests * 1000, 3) if requests else None,
+            "workers": [pid for pid, _ in files],
+            "pstats": url_for("admin_profile_download", route=endpoint, fmt="pstats"),
+            "collapsed": url_for("admin_profile_download", route=endpoint, fmt="collapsed"),
+        }
+    return jsonify({"ok": True, "rate": PROFILE_RATE, "routes": routes,
+                    "only": sorted(PROFILE_ROUTES) or None})
+
+
+@app.route("/admin/profiles/<route>.<fmt>")
+@login_required
+@admin_required
+def admin_profile_download(route, fmt):
+    if not is_admin_verified():
+        abort(403)
+    if fmt not in ("pstats", "collapsed"):
+        abort(404)
+    flush_profiles()
+    stats, stacks, requests, _wall = merged_profile(route)
+    if not requests:
+        abort(404)
+    if fmt == "collapsed":
+        # flamegraph.pl / speedscope input: "frame;frame;frame count"
+        body = "".join(f"{key} {n}\n" for key, n in sorted(stacks.items()))
+        mimetype = "text/plain"
+    else:
+        if stats is None:
+            abort(404)
+        body = marshal.dumps(stats.stats)  # same bytes as Stats.dump_stats()
+        mimetype = "application/octet-stream"
+    resp = Response(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f"attachment; filename={route}.{fmt}"
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/admin/profiles/reset", methods=["POST"])
+@login_required
+@admin_required
+def admin_profiles_reset():
+    if not is_admin_verified():
+        abort(403)
+    with _profiles_lock:
+        _profiles.clear()
+    shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+    return jsonify({"ok": True})
+
+# -------------------- Change feed (replicas) --------------------
+@app.route("/_changes")
+def changes_feed():
+    """NDJSON page of the change feed after ?after=<cursor>, for replicas."""
+    if not REPLICATION_TOKEN or request.headers.get("X-Muniverse-Replication-Token") != REPLICATION_TOKEN:
+        abort(404)
+    after = request.args.get("after") or None
+    limit = min(max(request.args.get("limit", REPLICA_BATCH, type=int), 1), 5000)
+
+    def generate():
+        for cursor, change in read_changes(after, limit):
+            yield dumps_json({"cursor": cursor, "change": change}) + b"\n"
+
+    resp = Response(generate(), mimetype="application/x-ndjson")
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Muniverse-Head"] = journal_head()
+    return resp
+
+# -------------------- Bulk export / import (admin verified only) --------------------
+@app.route("/admin/export/<collection>.ndjson")
+@login_required
+@admin_required
+def admin_export(collection):
+    if not is_admin_verified():
+        abort(403)
+    if collection not in RECORD_SCHEMAS:
+        abort(404)
+    secrets = request.args.get("secrets") == "1"
+
+    def generate():
+        for record in export_records(collection, secrets):
+            yield dumps_json(record) + b"\n"
+
+    resp = Response(generate(), mimetype="application/x-ndjson")
+    resp.headers["Content-Disposition"] = f"attachment; filename={collection}.ndjson"
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/admin/import/<collection>", methods=["POST"])
+@login_required
+@admin_required
+def admin_import(collection):
+    if not is_admin_verified():
+        abort(403)
+    if collection not in RECORD_SCHEMAS:
+        abort(404)
+    batch_size = min(max(request.args.get("batch", IMPORT_BATCH, type=int), 1), 5000)
+    request.max_content_length = None  # dumps are streamed, not buffered; the upload cap doesn't apply
+    lines = iter(request.stream.readline, b"")
+
+    def generate():
+        for progress in import_records(collection, lines, batch_size):
+            yield dumps_json(progress) + b"\n"
+
+    # progress lines go out while the upload is still being read
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# -------------------- Health checks --------------------
+@app.route("/healthz")
+def healthz():
+    """Liveness: the worker is up and answering."""
+    resp = jsonify({"ok": True, "pid": os.getpid()})
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: only passes once this worker's caches are warm (and a replica has synced)."""
+    if caches_warm() and (ROLE != "replica" or replica_cursor()):
+        resp = jsonify({"ok": True, "pid": os.getpid(), "boot_seconds": BOOT_TIMES})
+    else:
+        # outside gunicorn nothing warms us up front; start it and report not-ready
+        if not _warm_lock.locked():
+            threading.Thread(target=warm_caches, name="warm-caches", daemon=True).start()
+        resp = jsonify({"ok": False, "pid": os.getpid()})
+        resp.status_code = 503
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 # -------------------- 404 handler --------------------
 @app.errorhandler(404)
 def not_found(e):
     return render_template("404.html"), 404
 
+BOOT_TIMES["import"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+
 # -----------------------------------------------------------------------------
 # Run
 # -----------------------------------------------------------------------------
@@ -0,0 +1,122 @@
+"""Compare the data-file codecs on Muniverse-shaped data.
+
+    python benchmarks/bench_codecs.py                 # synthetic data
+    python benchmarks/bench_codecs.py --data data     # your real data/ files
+    python benchmarks/bench_codecs.py --scale 5000    # bigger synthetic set
+
+For every collection and codec it prints the encoded size and the mean
+time to encode and decode. The "ndjson" row writes one record per line
+with the default codec, which is how append-only logs are stored.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CWD = os.getcwd()
+sys.path.insert(0, ROOT)
+# app.py resolves data/ against the cwd; keep that away from the real tree
+os.chdir(tempfile.mkdtemp(prefix="muniverse-bench-"))
+import app  # noqa: E402
+
+
+def _words(n):
+    return " ".join(
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9)))
+        for _ in range(n)
+    )
+
+
+def synthetic(scale):
+    users = [{
+        "name": _words(2).title(),
+        "username": f"delegate{i}",
+        "school": _words(3).title(),
+        "bio": _words(12),
+        "profile_pic": "img/users/default.png",
+        "password_hash": "scrypt:32768:8:1$" + "".join(random.choices(string.hexdigits, k=144)),
+        "attendingConferences": [],
+        "followers": [f"delegate{random.randrange(scale)}" for _ in range(random.randint(0, 30))],
+        "following": [f"delegate{random.randrange(scale)}" for _ in range(random.randint(0, 30))],
+    } for i in range(scale)]
+    posts = [{
+        "id": i,
+        "username": f"delegate{random.randrange(scale)}",
+        "caption": _words(random.randint(3, 40)),
+        "image": f"img/posts/{i}.jpg",
+        "comment_count": random.randint(0, 60),
+    } for i in range(1, scale * 2)]
+    comments = [{
+        "id": i,
+        "username": f"delegate{random.randrange(scale)}",
+        "text": _words(random.randint(2, 30)),
+        "ts": "2025-11-12T10:15:00+00:00",
+    } for i in range(1, app.COMMENTS_PER_PAGE + 1)]
+    threads = [{
+        "id": i,
+        "slug": f"topic-{i}",
+        "title": _words(6),
+        "body": _words(80),
+        "tags": random.sample(["GA", "UNSC", "ECOSOC", "HRC", "Crisis"], 2),
+        "author": f"delegate{random.randrange(scale)}",
+        "created_ts": 1762960961 + i,
+        "replies": random.randint(0, 200),
+        "views": random.randint(0, 5000),
+    } for i in range(1, scale // 2)]
+    likes = {
+        str(p["id"]): [f"delegate{random.randrange(scale)}" for _ in range(random.randint(0, 80))]
+        for p in posts
+    }
+    return {"users": users, "posts": posts, "comment page": comments,
+            "threads": threads, "likes": likes}
+
+
+def real(data_dir):
+    out = {}
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith(".json"):
+            out[name] = app.load_json(os.path.join(data_dir, name))
+    return out
+
+
+def bench(label, data, number):
+    rows = []
+    for name, (dumps, _loads) in sorted(app.CODECS.items()):
+        raw = dumps(data)
+        enc = timeit.timeit(lambda: dumps(data), number=number) / number
+        dec = timeit.timeit(lambda: app.decode_json(raw), number=number) / number
+        rows.append((name, len(raw), enc, dec))
+    if isinstance(data, list) and data:
+        dumps = app.dumps_json
+        raw = b"".join(dumps(r) + b"\n" for r in data)
+        enc = timeit.timeit(lambda: b"".join(dumps(r) + b"\n" for r in data), number=number) / number
+        dec = timeit.timeit(lambda: [app.loads_json(line) for line in raw.splitlines()],
+                            number=number) / number
+        rows.append(("ndjson", len(raw), enc, dec))
+
+    print(f"\n{label}")
+    print(f"  {'codec':<8} {'bytes':>12} {'encode ms':>10} {'decode ms':>10}")
+    for name, size, enc, dec in rows:
+        print(f"  {name:<8} {size:>12,} {enc * 1000:>10.3f} {dec * 1000:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", help="benchmark the JSON files in this directory")
+    parser.add_argument("--scale", type=int, default=1000, help="synthetic user count")
+    parser.add_argument("--number", type=int, default=20, help="iterations per measurement")
+    args = parser.parse_args()
+
+    random.seed(1)
+    datasets = real(os.path.join(CWD, args.data)) if args.data else synthetic(args.scale)
+    print(f"default codec: {app.JSON_CODEC}; available: {', '.join(sorted(app.CODECS))}")
+    for label, data in datasets.items():
+        bench(label, data, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Measure snapshot and restore time against data size.
+
+    python benchmarks/bench_snapshot.py                    # 1k, 5k, 20k users
+    python benchmarks/bench_snapshot.py --scales 50000     # one bigger run
+
+For each scale it builds a synthetic data/ directory in a temp dir and
+times a full snapshot, an unchanged re-snapshot, a re-snapshot after one
+collection changed, and a restore with journal replay. It then takes a
+snapshot while another thread keeps writing and checks that restoring it
+and replaying the journal gives back exactly the live data ("live ok").
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app.py resolves data/ against the cwd; keep that away from the real tree
+os.chdir(tempfile.mkdtemp(prefix="muniverse-bench-"))
+import app  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_codecs import synthetic  # noqa: E402
+
+
+def build(scale):
+    shutil.rmtree(app.DATA_DIR, ignore_errors=True)
+    shutil.rmtree(app.SNAPSHOT_DIR, ignore_errors=True)
+    os.makedirs(app.DATA_DIR)
+    data = synthetic(scale)
+    app.save_json(app.USERS_FILE, data["users"])
+    app.save_json(app.POSTS_FILE, data["posts"])
+    app.save_json(app.FORUM_THREADS, data["threads"])
+    app.save_json(app.LIKES_FILE, data["likes"])
+    for p in data["posts"][: scale // 2]:
+        app.save_paged(app.COMMENTS_DIR, p["id"], data["comment page"], app.COMMENTS_PER_PAGE)
+    app.journal_baseline()
+    return sum(os.path.getsize(path) for _rel, path in app._data_files())
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def run(scale):
+    size = build(scale)
+    full, t_full = timed(app.create_snapshot)
+    _same, t_same = timed(app.create_snapshot)
+    posts = app.load_json(app.POSTS_FILE)
+    posts.append({**posts[-1], "id": posts[-1]["id"] + 1})
+    app.save_json(app.POSTS_FILE, posts)
+    delta, t_delta = timed(app.create_snapshot)
+    for _ in range(100):
+        app.add_notification("bench", {"n": random.random()})
+    target = tempfile.mkdtemp(prefix="muniverse-restore-")
+    shutil.rmtree(target)
+    restored, t_restore = timed(app.restore_snapshot, "latest", target)
+    shutil.rmtree(target)
+    print(f"  {scale:>7,} {size / 1e6:>9.1f} {full['stats']['new_bytes'] / 1e6:>9.1f} "
+          f"{t_full * 1000:>9.0f} {t_same * 1000:>9.0f} {t_delta * 1000:>9.0f} "
+          f"{delta['stats']['new_bytes'] / 1e3:>9.1f} {t_restore * 1000:>9.0f} {restored['replayed']:>7} "
+          f"{'yes' if restore_matches_live() else 'NO':>7}")
+
+
+def write_during_snapshot(stop):
+    n = 0
+    while not stop.is_set():
+        with app.file_lock(app.POSTS_FILE):
+            posts = app.load_json(app.POSTS_FILE)
+            posts.append({**posts[-1], "id": posts[-1]["id"] + 1})
+            if n % 3 == 0:
+                posts[n % len(posts)]["caption"] = f"edited {n}"
+            app.save_json(app.POSTS_FILE, posts)
+        app.append_paged(app.COMMENTS_DIR, 1, {"id": n + 1, "text": f"c{n}"}, n + 1, app.COMMENTS_PER_PAGE)
+        app.add_notification("bench", {"n": n})
+        n += 1
+
+
+def restore_matches_live() -> bool:
+    """Snapshot while another thread writes; restore + replay must equal the live files."""
+    stop = threading.Event()
+    writer = threading.Thread(target=write_during_snapshot, args=(stop,))
+    writer.start()
+    try:
+        time.sleep(0.05)
+        app.create_snapshot()
+        time.sleep(0.05)
+    finally:
+        stop.set()
+        writer.join()
+    target = tempfile.mkdtemp(prefix="muniverse-restore-")
+    shutil.rmtree(target)
+    app.restore_snapshot("latest", target)
+    live = {rel: open(path, "rb").read() for rel, path in app._data_files()}
+    back = {rel: open(path, "rb").read() for rel, path in app._data_files(target)}
+    shutil.rmtree(target)
+    return live == back
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1000,5000,20000", help="comma-separated user counts")
+    args = parser.parse_args()
+
+    random.seed(1)
+    print(f"  {'users':>7} {'data MB':>9} {'snap MB':>9} {'full ms':>9} {'same ms':>9} "
+          f"{'delta ms':>9} {'delta KB':>9} {'restore':>9} {'replay':>7} {'live ok':>7}")
+    for scale in (int(s) for s in args.scales.split(",")):
+        run(scale)
+
+
+if __name__ == "__main__":
+    main()
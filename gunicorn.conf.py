@@ -0,0 +1,47 @@
+"""Gunicorn settings for Muniverse.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload) and its data/template
+caches are warmed there, so forked workers start with them already parsed
+and share the pages copy-on-write. Workers are threaded: uploads, SSE
+streams and password hashing wait on I/O or release the GIL, so a few
+threads per process beat many single-threaded processes on memory.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+worker_class = "gthread"
+# Live /events streams each hold a thread for minutes, so they get a pool of
+# their own on top of the page threads instead of eating into them
+page_threads = int(os.environ.get("MUNIVERSE_THREADS", "8"))
+sse_streams = int(os.environ.setdefault("MUNIVERSE_SSE_MAX_STREAMS", "8"))
+threads = page_threads + sse_streams
+preload_app = True
+
+# Uploads are capped at 25MB; give slow clients time to send them
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """Master, after preload: warm caches once for every worker to inherit."""
+    import app
+    app.warm_caches()
+    server.log.info(f"Master boot times (s): {app.BOOT_TIMES}")
+    # keep the warmed objects out of the collector so workers don't touch
+    # (and un-share) their pages during GC passes
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Worker: revalidate the inherited caches and mark this pid ready."""
+    import app
+    server.log.info(f"Worker {worker.pid} ready in {app.warm_caches()}s")
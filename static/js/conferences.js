@@ -1,66 +1,139 @@
 (() => {
   document.addEventListener('DOMContentLoaded', () => {
     const search = document.getElementById('q');
-    const confCards = Array.from(document.querySelectorAll('.conf.card'));
+    const grid = document.getElementById('confGrid');
     const attendBtn = document.getElementById('attendBtn');
 
-    // 1) Conferences list page (filtering)
-    if (search && confCards.length) {
-      function filter(val) {
-        const s = (val || '').trim().toLowerCase();
-        confCards.forEach(c => {
-          const hit = (c.dataset.search || '').includes(s);
-          c.style.display = hit ? '' : 'none';
-        });
+    // 1) Conferences list page: the server renders one page; typing in the
+    //    filters fetches matching pages from /api/search/conferences instead
+    //    of hiding cards that were all shipped up front.
+    if (search && grid) {
+      const form = search.form;
+      const more = document.getElementById('confMore');
+      const pager = document.getElementById('confPager');
+      const empty = document.getElementById('confEmpty');
+      const DEBOUNCE_MS = 200;
+      let next = null, inflight = null, timer = 0, last = '';
+
+      function params() {
+        const p = new URLSearchParams(new FormData(form));
+        for (const [k, v] of [...p]) if (!v.trim()) p.delete(k);
+        return p;
+      }
+
+      function card(c) {
+        const el = document.createElement('article');
+        el.className = 'conf card';
+        el.innerHTML =
+          '<a class="conf-media"></a><div class="conf-body">' +
+          '<h3 class="conf-title"><a></a></h3><p class="muted"></p><p class="desc"></p></div>';
+        const media = el.querySelector('.conf-media');
+        media.href = c.url;
+        if (c.banner_url) {
+          const img = document.createElement('img');
+          img.src = c.banner_url; img.alt = c.name; img.loading = 'lazy';
+          media.appendChild(img);
+        } else {
+          media.innerHTML = '<div style="width:100%;aspect-ratio:16/9;display:grid;place-items:center;' +
+            'background:#111;border-bottom:1px solid #262626;"><span class="muted" style="padding:8px 12px;"></span></div>';
+          media.querySelector('span').textContent = c.name;
+        }
+        const title = el.querySelector('.conf-title a');
+        title.href = c.url; title.textContent = c.name;
+        el.querySelector('p.muted').textContent = `${c.date} • ${c.location} • ${c.attendees} attending`;
+        el.querySelector('p.desc').textContent = c.description || '';
+        if ((c.tags || []).length) {
+          const tags = document.createElement('div');
+          tags.className = 'tags';
+          c.tags.forEach(t => {
+            const a = document.createElement('a');
+            a.className = 'tag';
+            a.href = '/conferences?' + new URLSearchParams({ when: grid.dataset.when, tag: t });
+            a.textContent = t;
+            tags.appendChild(a);
+          });
+          el.querySelector('.conf-body').appendChild(tags);
+        }
+        return el;
       }
 
-      search.addEventListener('input', () => filter(search.value));
+      async function load(replace) {
+        if (inflight) inflight.abort();   // only the latest filter matters
+        inflight = new AbortController();
+        const p = params();
+        if (!replace && next !== null) p.set('cursor', next);
+        try {
+          const res = await fetch('/api/search/conferences?' + p, { signal: inflight.signal });
+          const data = await res.json();
+          const frag = document.createDocumentFragment();
+          data.items.forEach(c => frag.appendChild(card(c)));
+          if (replace) grid.replaceChildren(frag);
+          else grid.appendChild(frag);
+          next = data.next;
+          grid.hidden = !grid.children.length;
+          if (empty) empty.hidden = !grid.hidden;
+          if (pager) pager.hidden = true;   // page links no longer match what is shown
+          if (more) more.hidden = next === null;
+        } catch (err) {
+          if (err.name !== 'AbortError') console.error(err);
+        }
+      }
+
+      last = params().toString();
+      form.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+          const p = params().toString();
+          if (p === last) return;
+          last = p;
+          history.replaceState(null, '', '?' + p);
+          load(true);
+        }, DEBOUNCE_MS);
+      });
+      if (more) more.addEventListener('click', () => load(false));
 
       document.addEventListener('keydown', (e) => {
         if (e.key === '/' && !e.target.closest('input,textarea')) {
           e.preventDefault(); search.focus();
         } else if (e.key === 'Escape' && document.activeElement === search) {
-          search.value = ''; filter('');
+          search.value = ''; form.dispatchEvent(new Event('input'));
           search.blur();
         }
       });
     }
 
-    // 2) Conference detail page (attending toggle via localStorage)
+    // 2) Conference detail page (attendance stored server-side)
     if (attendBtn) {
-      const KEY = 'muniverse_attending';
-
-      function readList() {
-        try { return JSON.parse(localStorage.getItem(KEY)) || []; }
-        catch { return []; }
-      }
-      function writeList(arr) {
-        localStorage.setItem(KEY, JSON.stringify(arr));
-      }
+      const cid = attendBtn.dataset.conf;
+      const countEl = document.getElementById('attendCount');
 
-      // Derive conf id from URL: /conference/<id>
-      let cid = '';
-      const m = location.pathname.match(/\/conference\/([^/]+)/);
-      if (m) cid = decodeURIComponent(m[1]);
-
-      function sync() {
-        const list = readList();
-        const isIn = list.includes(cid);
+      function paint(isIn) {
+        attendBtn.dataset.attending = isIn ? '1' : '';
         attendBtn.textContent = isIn ? 'Attending ✓' : "I'm Attending";
         attendBtn.classList.toggle('btn-secondary', isIn);
         attendBtn.classList.toggle('btn-primary', !isIn);
       }
 
-      attendBtn.addEventListener('click', () => {
-        const list = readList();
-        const i = list.indexOf(cid);
-        if (i >= 0) list.splice(i, 1);
-        else list.push(cid);
-        writeList(list);
-        sync();
+      attendBtn.addEventListener('click', async () => {
+        attendBtn.disabled = true;
+        try {
+          const res = await fetch(`/conference/${cid}/attend`, { method: 'POST', credentials: 'same-origin' });
+          // login_required answers anonymous users with a redirect to /login
+          if (res.redirected || !(res.headers.get('content-type') || '').includes('json')) {
+            location.href = '/login?next=' + encodeURIComponent(location.pathname);
+            return;
+          }
+          const data = await res.json();
+          if (data.ok) {
+            paint(data.attending);
+            if (countEl) countEl.textContent = data.attendees;
+          }
+        } catch (err) {
+          console.error(err);
+        } finally {
+          attendBtn.disabled = false;
+        }
       });
-
-      sync();
     }
   });
 })();
@@ -2,30 +2,17 @@
   document.addEventListener('DOMContentLoaded', () => {
     const grid = document.getElementById('grid') || document.querySelector('.masonry');
     const search = document.getElementById('q');
+    const more = document.getElementById('more');
+    const empty = document.getElementById('gridEmpty');
     if (!grid) return; // not on explore
 
-    const tiles = Array.from(grid.querySelectorAll('.tile'));
-
-    function filter(val) {
-      const s = (val || '').trim().toLowerCase();
-      tiles.forEach(t => {
-        const hit = (t.dataset.search || '').includes(s);
-        t.style.display = hit ? '' : 'none';
-      });
-    }
-
-    if (search) {
-      search.addEventListener('input', () => filter(search.value));
-      // Shortcuts
-      document.addEventListener('keydown', (e) => {
-        if (e.key === '/' && !e.target.closest('input,textarea')) {
-          e.preventDefault(); search.focus();
-        } else if (e.key === 'Escape' && document.activeElement === search) {
-          search.value = ''; filter('');
-          search.blur();
-        }
-      });
-    }
+    // The server renders the first page; search and "Load more" fetch further
+    // pages from /api/search/posts, so the full catalog never ships at once.
+    const DEBOUNCE_MS = 200;
+    const sort = grid.dataset.sort || 'latest';
+    let query = search ? search.value.trim() : '';
+    let next = more && more.dataset.next !== '' ? more.dataset.next : null;
+    let inflight = null, timer = 0;
 
     // Subtle load-in effect
     const io = 'IntersectionObserver' in window ? new IntersectionObserver((ents) => {
@@ -38,12 +25,81 @@
       });
     }, { rootMargin: '100px' }) : null;
 
-    tiles.forEach(t => {
+    function reveal(t) {
       t.style.transform = 'translateY(6px)';
       t.style.opacity = '0';
       t.style.transition = 'opacity .3s ease, transform .3s ease';
       if (io) io.observe(t);
       else { t.style.opacity = '1'; t.style.transform = 'none'; }
-    });
+    }
+
+    function tile(p) {
+      const a = document.createElement('a');
+      a.className = 'tile';
+      a.href = p.url;
+      a.innerHTML = '<img alt="Post" loading="lazy" /><div class="tile-overlay"><span></span></div>';
+      a.querySelector('img').src = p.image_url;
+      a.querySelector('span').textContent = '@' + p.username;
+      reveal(a);
+      return a;
+    }
+
+    function paintMore() {
+      if (!more) return;
+      more.hidden = next === null;
+      const params = new URLSearchParams({ q: query, sort, cursor: next ?? '' });
+      more.href = '?' + params;
+    }
+
+    async function load(replace) {
+      if (inflight) inflight.abort();   // a newer search supersedes the old one
+      inflight = new AbortController();
+      const params = new URLSearchParams({ q: query, sort });
+      if (!replace && next !== null) params.set('cursor', next);
+      try {
+        const res = await fetch('/api/search/posts?' + params, { signal: inflight.signal });
+        const data = await res.json();
+        const frag = document.createDocumentFragment();
+        data.items.forEach(p => frag.appendChild(tile(p)));
+        if (replace) grid.replaceChildren(frag);
+        else grid.appendChild(frag);
+        next = data.next;
+        if (empty) empty.hidden = grid.children.length > 0;
+        paintMore();
+      } catch (err) {
+        if (err.name !== 'AbortError') console.error(err);
+      }
+    }
+
+    if (search) {
+      search.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+          const val = search.value.trim();
+          if (val === query) return;
+          query = val;
+          history.replaceState(null, '', '?' + new URLSearchParams(sort === 'trending' ? { q: query, sort } : { q: query }));
+          load(true);
+        }, DEBOUNCE_MS);
+      });
+      // Shortcuts
+      document.addEventListener('keydown', (e) => {
+        if (e.key === '/' && !e.target.closest('input,textarea')) {
+          e.preventDefault(); search.focus();
+        } else if (e.key === 'Escape' && document.activeElement === search) {
+          search.value = ''; search.dispatchEvent(new Event('input'));
+          search.blur();
+        }
+      });
+    }
+
+    if (more) {
+      more.addEventListener('click', (e) => {
+        e.preventDefault();
+        load(false);
+      });
+    }
+
+    grid.querySelectorAll('.tile').forEach(reveal);
   });
 })();
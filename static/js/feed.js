@@ -1,92 +1,80 @@
 (() => {
+  // pages rendered for a signed-in user already carry their like state
+  const signedIn = (document.currentScript || {}).dataset?.signedIn === '1';
+  const LIKES_PER_REQUEST = 200; // what /api/likes answers per call
+
   document.addEventListener('DOMContentLoaded', () => {
-    const likeKey = 'muniverse_likes'; // map: { [postId]: true/false }
-    const root = document.querySelector('.feed-list') || document.querySelector('.container');
-    if (!root) return; // not on feed/post page
+    const buttons = Array.from(document.querySelectorAll('.like-btn[data-post]'));
+    if (!buttons.length) return; // not on feed/post page
 
-    function readLikes() {
-      try { return JSON.parse(localStorage.getItem(likeKey)) || {}; }
-      catch { return {}; }
-    }
-    function writeLikes(map) {
-      localStorage.setItem(likeKey, JSON.stringify(map));
-    }
+    const ids = [...new Set(buttons.map(b => b.dataset.post))];
 
-    function parseNum(str) {
-      const n = parseInt(String(str).replace(/[^\d]/g, ''), 10);
-      return Number.isFinite(n) ? n : 0;
+    function paint(id, liked, likes) {
+      document.querySelectorAll(`.like-btn[data-post="${id}"]`).forEach(b => {
+        b.textContent = liked ? '❤️' : '🤍';
+        b.dataset.liked = liked ? '1' : '';
+      });
+      if (likes === undefined) return;
+      const countEl = document.querySelector(`.like-count[data-post="${id}"]`);
+      if (countEl) countEl.textContent = likes;
     }
 
-    function enhanceArticle(article) {
-      if (!article.classList.contains('post')) return;
-
-      const meta = article.querySelector('.meta');
-      const media = article.querySelector('.post-media img');
-      const idNode = article.querySelector('a[href*="/post/"]') || article.querySelector('.post-media img');
-
-      // Determine post id from link href (/post/<id>) or from dataset if present
-      let pid = null;
-      if (idNode && idNode.getAttribute('href')) {
-        const m = idNode.getAttribute('href').match(/\/post\/(\d+)/);
-        if (m) pid = m[1];
-      }
-      // Fallback: try to find strong numeric in page title if on post page
-      if (!pid) {
-        const h = document.title.match(/#(\d+)/);
-        if (h) pid = h[1];
-      }
-      if (!pid) return; // cannot enhance without id
-
-      // First <span> in meta is the likes display "❤️ N"
-      const likeSpan = meta ? meta.querySelector('span') : null;
-      const baseLikes = likeSpan ? parseNum(likeSpan.textContent) : 0;
+    function toLogin() {
+      location.href = '/login?next=' + encodeURIComponent(location.pathname);
+    }
 
-      // Inject like button if missing
-      let likeBtn = meta ? meta.querySelector('button[data-like]') : null;
-      if (!likeBtn && meta) {
-        likeBtn = document.createElement('button');
-        likeBtn.type = 'button';
-        likeBtn.dataset.like = pid;
-        likeBtn.className = 'btn btn-secondary';
-        likeBtn.textContent = 'Like';
-        meta.prepend(likeBtn);
+    // Which of these posts have I liked? One request per 200 posts; only
+    // posts the server answered for are repainted.
+    async function refresh() {
+      for (let i = 0; i < ids.length; i += LIKES_PER_REQUEST) {
+        const chunk = ids.slice(i, i + LIKES_PER_REQUEST);
+        try {
+          const res = await fetch('/api/likes?ids=' + chunk.join(','), { credentials: 'same-origin' });
+          const data = await res.json();
+          if (!data.ok) return;
+          const liked = new Set(data.liked.map(String));
+          chunk.filter(id => id in data.counts).forEach(id => paint(id, liked.has(id), data.counts[id]));
+        } catch (err) {
+          console.error(err);
+          return;
+        }
       }
+    }
 
-      function sync() {
-        const likes = readLikes();
-        const liked = !!likes[pid];
-        if (likeBtn) {
-          likeBtn.textContent = liked ? 'Liked ✓' : 'Like';
-          likeBtn.classList.toggle('btn-primary', liked);
-          likeBtn.classList.toggle('btn-secondary', !liked);
-        }
-        if (likeSpan) {
-          const adjusted = baseLikes + (liked ? 1 : 0);
-          likeSpan.textContent = `❤️ ${adjusted}`;
+    async function toggle(id) {
+      try {
+        const res = await fetch(`/post/${id}/like`, { method: 'POST', credentials: 'same-origin' });
+        // login_required answers anonymous users with a redirect to /login
+        if (res.redirected || !(res.headers.get('content-type') || '').includes('json')) {
+          toLogin();
+          return;
         }
+        const data = await res.json();
+        if (data.ok) paint(id, data.liked, data.likes);
+        else if (data.error === 'auth') toLogin();
+      } catch (err) {
+        console.error(err);
       }
+    }
 
-      function toggle() {
-        const likes = readLikes();
-        likes[pid] = !likes[pid];
-        writeLikes(likes);
-        sync();
-      }
+    buttons.forEach(btn => {
+      btn.addEventListener('click', (e) => {
+        e.preventDefault();
+        toggle(btn.dataset.post);
+      });
+    });
 
-      if (likeBtn) likeBtn.addEventListener('click', toggle);
-      if (media) {
-        // Double-tap/dblclick to like
-        let lastTap = 0;
-        media.addEventListener('click', () => {
-          const now = Date.now();
-          if (now - lastTap < 350) toggle();
-          lastTap = now;
-        });
-        media.addEventListener('dblclick', (e) => { e.preventDefault(); toggle(); });
-      }
-      sync();
-    }
+    // Double-tap/dblclick on a feed image likes it (never un-likes)
+    document.querySelectorAll('article.post').forEach(article => {
+      const media = article.querySelector('.post-media img');
+      const btn = article.querySelector('.like-btn[data-post]');
+      if (!media || !btn) return;
+      media.addEventListener('dblclick', (e) => {
+        e.preventDefault();
+        if (!btn.dataset.liked) toggle(btn.dataset.post);
+      });
+    });
 
-    document.querySelectorAll('article.post').forEach(enhanceArticle);
+    if (!signedIn) refresh();
   });
 })();
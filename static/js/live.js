@@ -0,0 +1,58 @@
+(() => {
+  // Streams hold a server thread each, so only signed-in readers get one;
+  // logged-out pages come from the page cache and stay static
+  const signedIn = (document.currentScript || {}).dataset?.signedIn === '1';
+
+  document.addEventListener('DOMContentLoaded', () => {
+    if (!signedIn || !('EventSource' in window)) return;
+
+    // Subscribe only to the posts/threads shown on this page
+    const topics = new Set();
+    document.querySelectorAll('[data-post]').forEach(el => topics.add('post:' + el.dataset.post));
+    document.querySelectorAll('[data-thread]').forEach(el => topics.add('thread:' + el.dataset.thread));
+    if (!topics.size) return;
+
+    // Very long pages just take every event instead of a huge URL
+    const query = topics.size <= 100 ? '?topics=' + encodeURIComponent([...topics].join(',')) : '';
+    const es = new EventSource('/events' + query);
+
+    function setText(selector, value) {
+      document.querySelectorAll(selector).forEach(el => { el.textContent = value; });
+    }
+
+    // Lists only grow live when they show the newest page (data-live="1")
+    function append(list, id, who, when, text) {
+      if (!list || list.dataset.live !== '1') return;
+      if (list.querySelector(`li[data-id="${id}"]`)) return;
+      const li = document.createElement('li');
+      li.dataset.id = id;
+      li.innerHTML = '<strong></strong> <small class="muted"></small><div></div>';
+      li.querySelector('strong').textContent = '@' + who;
+      li.querySelector('small').textContent = when;
+      li.querySelector('div').textContent = text;
+      list.appendChild(li);
+      list.hidden = false;
+      const empty = document.getElementById(list.dataset.empty || '');
+      if (empty) empty.remove();
+    }
+
+    es.addEventListener('like', (e) => {
+      const d = JSON.parse(e.data);
+      setText(`.like-count[data-post="${d.post_id}"]`, d.likes);
+    });
+
+    es.addEventListener('comment', (e) => {
+      const d = JSON.parse(e.data);
+      setText(`.comment-count[data-post="${d.post_id}"]`, d.count);
+      const c = d.comment;
+      append(document.querySelector(`#commentList[data-post="${d.post_id}"]`), c.id, c.username, c.ts, c.text);
+    });
+
+    es.addEventListener('reply', (e) => {
+      const d = JSON.parse(e.data);
+      setText(`.reply-count[data-thread="${d.thread_id}"]`, d.count);
+      const r = d.reply;
+      append(document.querySelector(`#replyList[data-thread="${d.thread_id}"]`), r.id, r.author, r.created_ts, r.text);
+    });
+  });
+})();
@@ -0,0 +1,103 @@
+(() => {
+  document.addEventListener('DOMContentLoaded', () => {
+    // [data-mentions]: suggest users for the "@word" being typed
+    // [data-user-suggest]: suggest users for the whole value (admin user filter)
+    const fields = document.querySelectorAll('[data-mentions], [data-user-suggest]');
+    if (!fields.length) return;
+
+    const DEBOUNCE_MS = 150;
+    const cache = new Map();   // query -> users, for this page view
+    const list = document.createElement('ul');
+    list.className = 'suggest';
+    list.hidden = true;
+    document.body.appendChild(list);
+
+    let field = null, users = [], active = 0, timer = 0, inflight = null;
+
+    function query(el) {
+      if (el.hasAttribute('data-user-suggest')) return el.value.trim().replace(/^@/, '');
+      const before = el.value.slice(0, el.selectionStart);
+      const m = before.match(/(?:^|\s)@([\w.-]{1,30})$/);
+      return m ? m[1] : '';
+    }
+
+    function close() {
+      list.hidden = true;
+      users = [];
+      if (inflight) { inflight.abort(); inflight = null; }
+    }
+
+    function render() {
+      list.innerHTML = '';
+      if (!users.length) { list.hidden = true; return; }
+      users.forEach((u, i) => {
+        const li = document.createElement('li');
+        li.className = i === active ? 'active' : '';
+        li.innerHTML = '<strong></strong> <small class="muted"></small>';
+        li.querySelector('strong').textContent = '@' + u.username;
+        li.querySelector('small').textContent = [u.name, u.school].filter(Boolean).join(' · ');
+        li.addEventListener('mousedown', (e) => { e.preventDefault(); pick(i); });
+        list.appendChild(li);
+      });
+      const r = field.getBoundingClientRect();
+      list.style.left = (r.left + window.scrollX) + 'px';
+      list.style.top = (r.bottom + window.scrollY + 4) + 'px';
+      list.style.minWidth = Math.min(r.width, 320) + 'px';
+      list.hidden = false;
+    }
+
+    function pick(i) {
+      const u = users[i];
+      if (!u || !field) return;
+      if (field.hasAttribute('data-user-suggest')) {
+        field.value = u.username;
+      } else {
+        const at = field.selectionStart;
+        const before = field.value.slice(0, at).replace(/@[\w.-]*$/, '@' + u.username + ' ');
+        field.value = before + field.value.slice(at);
+        field.setSelectionRange(before.length, before.length);
+      }
+      close();
+      field.focus();
+    }
+
+    async function lookup(el, q) {
+      if (cache.has(q)) { users = cache.get(q); active = 0; render(); return; }
+      if (inflight) inflight.abort();   // only the latest keystroke matters
+      inflight = new AbortController();
+      try {
+        const res = await fetch('/api/users/suggest?q=' + encodeURIComponent(q),
+                                { signal: inflight.signal, credentials: 'same-origin' });
+        const data = await res.json();
+        cache.set(q, data.users || []);
+        if (field === el && query(el) === q) { users = cache.get(q); active = 0; render(); }
+      } catch (err) {
+        if (err.name !== 'AbortError') console.error(err);
+      }
+    }
+
+    fields.forEach(el => {
+      el.setAttribute('autocomplete', 'off');
+      el.addEventListener('input', () => {
+        field = el;
+        clearTimeout(timer);
+        const q = query(el);
+        if (!q) { close(); return; }
+        timer = setTimeout(() => lookup(el, q), DEBOUNCE_MS);
+      });
+      el.addEventListener('keydown', (e) => {
+        if (list.hidden || field !== el) return;
+        if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+          e.preventDefault();
+          active = (active + (e.key === 'ArrowDown' ? 1 : users.length - 1)) % users.length;
+          render();
+        } else if (e.key === 'Enter' || e.key === 'Tab') {
+          e.preventDefault(); pick(active);
+        } else if (e.key === 'Escape') {
+          close();
+        }
+      });
+      el.addEventListener('blur', () => setTimeout(close, 100));
+    });
+  });
+})();